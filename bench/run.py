@@ -0,0 +1,368 @@
+""" 协议的吞吐量和延迟的基准测试
+
+- `encode`生成命令的速率(`make_param_order`、`make_params_order`和只编码的`_param_order`)
+- `typecheck``zyf.assist.type_check`每次调用增加的耗时
+- `config`不同参数个数下`Config.load`(不使用和使用解析缓存)、格式检查(不使用缓存)和`Config.dump`的耗时
+- `coding`不同参数个数下生成全部C代码的耗时(不使用缓存)
+- `parser`接收数据解析的吞吐量
+- `roundtrip`通过模拟固件的串口(sim://)发送命令并等待回显的延迟和吞吐量
+- `reliable`可靠模式下停等(窗口为1)与流水线发送的吞吐量
+- `startup`主窗口的启动耗时(见startup.py，需要PyQt6，只在指定时运行)
+
+结果保存为json，`--compare`与之前保存的结果对比，找出变慢的指标。
+
+>>> python bench/run.py --json bench.json
+>>> python bench/run.py parser roundtrip --compare bench.json
+"""
+
+import io
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+import contextlib
+import timeit as _timeit
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import yaml  # noqa: E402
+from zyf.console import Console, CodingFiles, protocol, schema, SERIAL_READBUFF_SIZE  # noqa: E402
+from zyf.console.config import Config, clear_cache  # noqa: E402
+from zyf.console.parser import FrameParser  # noqa: E402
+
+BENCHMARKS: dict[str, Callable[[argparse.Namespace], dict[str, float]]] = {}
+""" 名称 -> 基准测试，返回{指标: 数值} """
+
+DEFAULT_SKIP = ('startup',)
+""" 未指定名称时不运行的基准测试 """
+
+HIGHER_IS_BETTER = ('_per_s', '_mb_s')
+""" 以这些后缀结尾的指标越大越好，其余(耗时)越小越好 """
+
+PARAM_COUNTS = (10, 100, 1000)
+""" `config`和`coding`测试的参数个数 """
+
+TEST_YAML = ROOT / 'data' / 'test.yaml'
+
+
+def benchmark(name: str):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def per_call(func: Callable[[], object], *, repeat: int = 5, min_time: float = 0.2) -> float:
+    """ 单次调用耗时(s)的中位数，每轮至少运行`min_time`秒 """
+    timer = _timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2 if number < 4 else 4
+    return statistics.median(timer.repeat(repeat, number)) / number
+
+
+@contextlib.contextmanager
+def quiet():
+    """ 屏蔽被测代码中的print """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def temp_console(n_params: int = None, **setting):
+    """ 在临时文件夹中加载配置，`n_params`缺省时使用data/test.yaml """
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / 'bench.yaml'
+        if n_params is None:
+            shutil.copyfile(TEST_YAML, path)
+        else:
+            write_config(path, n_params)
+        console = Console()
+        with quiet():
+            console.data.load(str(path))
+            for k, v in setting.items():
+                console.data['setting', k] = v
+            try:
+                yield console
+            finally:
+                console.data.flush()
+
+
+def write_config(path: Path, n_params: int, n_groups: int = 4):
+    """ 以data/test.yaml为模板写入含有`n_params`个参数的配置 """
+    with open(TEST_YAML, encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    data['parameter']['infos'] = [
+        {'title': f'变量{i}', 'description': f'用于测试的变量{i}', 'extern': f'float value_{i};',
+         'define': f'value_{i}', 'alias': f'P{i}'} for i in range(n_params)]
+    rnd = random.Random(n_params)
+    data['parameter']['values'] = [
+        {'title': f'参数组{g}', 'description': 'None', 'details': [round(rnd.uniform(-100, 100), 3)
+                                                                  for _ in range(n_params)]}
+        for g in range(n_groups)]
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(data, f, allow_unicode=True)
+
+
+@benchmark('encode')
+def bench_encode(args) -> dict[str, float]:
+    result = {}
+    for mode in ('ascii', 'binary'):
+        with temp_console(protocol=mode) as console:
+            values = {'ABC': 1.5, 'DEF': -2.25}
+            result[f'{mode}_param_order_per_s'] = 1 / per_call(
+                lambda: console.make_param_order('DEF', 2.5, do_send=False), min_time=args.min_time)
+            result[f'{mode}_params_order_per_s'] = 1 / per_call(
+                lambda: console.make_params_order(values, do_send=False), min_time=args.min_time)
+            result[f'{mode}_encode_only_per_s'] = 1 / per_call(
+                lambda: console._param_order([(1, 2.5)]), min_time=args.min_time)
+    return result
+
+
+@benchmark('typecheck')
+def bench_typecheck(args) -> dict[str, float]:
+    from zyf.assist import type_check, set_type_check
+
+    def bare(self, alias: str, v: float | int, *, do_send=True):
+        return alias
+    checked = type_check(bare)
+    base = per_call(lambda: bare(None, 'DEF', 2.5, do_send=False), min_time=args.min_time)
+    result = {'checked_overhead_ns': (per_call(lambda: checked(None, 'DEF', 2.5, do_send=False),
+                                               min_time=args.min_time) - base) * 1e9}
+    previous = set_type_check(False)
+    try:
+        result['disabled_overhead_ns'] = (per_call(lambda: checked(None, 'DEF', 2.5, do_send=False),
+                                                   min_time=args.min_time) - base) * 1e9
+    finally:
+        set_type_check(previous)
+    return result
+
+
+@benchmark('config')
+def bench_config(args) -> dict[str, float]:
+    result = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for n in PARAM_COUNTS:
+            path = Path(folder) / f'config_{n}.yaml'
+            write_config(path, n)
+            config = Config()
+            with quiet():
+                def load_cold():
+                    clear_cache()
+                    config.load(str(path))
+                result[f'load_{n}_ms'] = per_call(load_cold, min_time=args.min_time) * 1e3
+                result[f'load_cached_{n}_ms'] = per_call(lambda: config.load(str(path)),
+                                                         min_time=args.min_time) * 1e3
+                result[f'validate_{n}_ms'] = per_call(lambda: schema.validate(config._data),
+                                                      min_time=args.min_time) * 1e3
+                out = str(Path(folder) / 'dump.yaml')
+                result[f'dump_{n}_ms'] = per_call(lambda: config.dump(out), min_time=args.min_time) * 1e3
+    return result
+
+
+@benchmark('coding')
+def bench_coding(args) -> dict[str, float]:
+    result = {}
+    for n in PARAM_COUNTS:
+        with temp_console(n) as console:
+            def generate():
+                for fn in CodingFiles:
+                    console._coding(fn)
+            result[f'coding_{n}_ms'] = per_call(generate, min_time=args.min_time) * 1e3
+            result[f'coding_cached_{n}_us'] = per_call(
+                lambda: [console.coding(fn) for fn in CodingFiles], min_time=args.min_time) * 1e6
+    return result
+
+
+def _traffic(n_bytes: int) -> bytes:
+    """ 与真实通信相似的混合数据: 回显、空闲、用户帧、文本和警告 """
+    rnd = random.Random(0)
+    parts, size = [], 0
+    while size < n_bytes:
+        r = rnd.random()
+        part = (f'SET P{rnd.randrange(100)}={rnd.uniform(-100, 100):g}\n'.encode() if r < .4 else
+                b'.' * rnd.randrange(1, 20) if r < .6 else
+                f'[T:{rnd.random():.4f},{rnd.random():.4f},{rnd.random():.4f}]\n'.encode() if r < .8 else
+                b'[Warn] Unknow param id=[7]\n' if r < .82 else b'speed %d\n' % rnd.randrange(1000))
+        parts.append(part)
+        size += len(part)
+    return b''.join(parts)
+
+
+@benchmark('parser')
+def bench_parser(args) -> dict[str, float]:
+    mixed = _traffic(1 << 20)
+    idle = b'.' * (1 << 20)
+    blocks = [mixed[i:i + 4096] for i in range(0, len(mixed), 4096)]
+    chunks = [mixed[i:i + 64] for i in range(0, len(mixed), 64)]  # 每次读取的数据块较小时
+
+    def parse(data_chunks):
+        parser = FrameParser()
+        for chunk in data_chunks:
+            parser.feed(chunk)
+        parser.flush()
+    return {
+        'mixed_mb_s': len(mixed) / per_call(lambda: parse(blocks), repeat=3, min_time=args.min_time) / 1e6,
+        'mixed_64b_chunks_mb_s': len(mixed) / per_call(lambda: parse(chunks), repeat=3, min_time=args.min_time) / 1e6,
+        'idle_mb_s': len(idle) / per_call(lambda: parse([idle]), repeat=3, min_time=args.min_time) / 1e6,
+    }
+
+
+@benchmark('roundtrip')
+def bench_roundtrip(args) -> dict[str, float]:
+    """ 通过sim://串口往返，`--baudrate`不为0时按波特率计算线路耗时 """
+    from zyf.console.aio import AsyncTransport
+    from zyf.console.simulator import FirmwareModel, SimulatedSerial
+    result = {}
+    for mode in ('ascii', 'binary'):
+        with temp_console(protocol=mode) as console:
+            port = SimulatedSerial(model=FirmwareModel(console.data), realtime=bool(args.baudrate),
+                                   baudrate=args.baudrate or 115200)
+            port.open()
+
+            async def main():
+                async with AsyncTransport(console, serial=port, poll_interval=0) as transport:
+                    latencies = []
+                    echo = re.compile(rb'SET DEF=')  # 空闲时的'.'会出现在下一帧的开头
+                    for i in range(args.rounds):
+                        order = console._param_order([(1, i % 100 + 0.5)])
+                        start = time.perf_counter()
+                        await transport.request(order, echo, timeout=1)
+                        latencies.append(time.perf_counter() - start)
+                    # 流水线: 连续发送后等待最后一个回显
+                    start = time.perf_counter()
+                    last = transport.wait_for(re.compile(f'SET ABC={args.rounds - 1:g}$'.encode()), timeout=10)
+                    waiting = asyncio.ensure_future(last)
+                    await asyncio.sleep(0)
+                    for i in range(args.rounds):
+                        await transport.send_order(console._param_order([(0, i)]))
+                    await waiting
+                    return latencies, time.perf_counter() - start
+            with quiet():
+                latencies, elapsed = asyncio.run(main())
+            port.close()
+            latencies.sort()
+            result[f'{mode}_latency_median_us'] = statistics.median(latencies) * 1e6
+            result[f'{mode}_latency_p99_us'] = latencies[int(len(latencies) * 0.99)] * 1e6
+            result[f'{mode}_pipelined_per_s'] = args.rounds / elapsed
+    return result
+
+
+@benchmark('reliable')
+def bench_reliable(args) -> dict[str, float]:
+    """ 可靠模式下不同窗口的吞吐量，按`--baudrate`(为0时115200)计算线路耗时 """
+    from zyf.console.reader import SerialReader
+    from zyf.console.reliable import ReliableLink
+    from zyf.console.simulator import FirmwareModel, SimulatedSerial
+    rounds = min(args.rounds, 500)  # 停等时每个命令都要等待线路往返
+    result = {}
+    with temp_console() as console:
+        for window in (1, 8):
+            port = SimulatedSerial(model=FirmwareModel(console.data), realtime=True, baudrate=args.baudrate or 115200)
+            port.open()
+
+            def write(payload: str) -> None:
+                port.write(payload.encode('ascii'))
+            link = ReliableLink(write, window=window, window_bytes=SERIAL_READBUFF_SIZE - 1)
+            reader = SerialReader(port)
+            reader.listeners.append(link.feed)
+            reader.start()
+            done = threading.Event()
+            start = time.perf_counter()
+            for i in range(rounds):
+                link.submit(console._param_order([(0, i)]), on_done=lambda e: done.set() if link.pending == 0 else None)
+            done.wait(60)
+            elapsed = time.perf_counter() - start
+            reader.stop()
+            link.close()
+            port.close()
+            result[f'window{window}_orders_per_s'] = rounds / elapsed
+            result[f'window{window}_retransmissions'] = link.stats.retransmissions
+    return result
+
+
+@benchmark('startup')
+def bench_startup(args) -> dict[str, float]:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import startup
+    return {f'{k}_ms': v * 1e3 for k, v in startup.run(3).items()}
+
+
+def metadata(args: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'machine': platform.machine(),
+            'options': {'min_time': args.min_time, 'rounds': args.rounds, 'baudrate': args.baudrate}}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """ 打印与`baseline`的对比，返回变慢超过`threshold`的指标个数 """
+    regressions = 0
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get('results', {}).get(name, {}).get(metric)
+            if not old or not value:
+                continue
+            # 统一为"加速比"，大于1表示变快
+            speedup = value / old if metric.endswith(HIGHER_IS_BETTER) else old / value
+            flag = ''
+            if speedup < 1 - threshold:
+                flag = '  <-- 变慢'
+                regressions += 1
+            print(f'{name}.{metric:<32}{old:>14.4g}{value:>14.4g}{speedup:>8.2f}x{flag}')
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='*', help=f'运行的基准测试，可选{", ".join(BENCHMARKS)}')
+    parser.add_argument('--json', help='把结果保存为json文件')
+    parser.add_argument('--compare', help='与之前保存的json结果对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='对比时视为变慢的比例(默认0.1)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每轮计时的最短时间(s)')
+    parser.add_argument('--rounds', type=int, default=2000, help='roundtrip的往返次数')
+    parser.add_argument('--baudrate', type=int, default=0, help='roundtrip模拟的波特率，默认0为不限制')
+    args = parser.parse_args(argv)
+
+    names = args.names or [name for name in BENCHMARKS if name not in DEFAULT_SKIP]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f'未知的基准测试: {", ".join(unknown)}')
+
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        results[name] = BENCHMARKS[name](args)
+        print(f'[{name}] {time.perf_counter() - start:.1f} s')
+        for metric, value in results[name].items():
+            print(f'    {metric:<32}{value:>14.4g}')
+    report = {'meta': metadata(args), 'results': results}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f'\n对比 {args.compare} ({baseline.get("meta", {}).get("commit")})')
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
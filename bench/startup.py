@@ -0,0 +1,74 @@
+""" 启动耗时的基准测试
+
+在新的子进程中多次启动主窗口，统计各阶段耗时的中位数:
+- `import_console`导入`zyf.console`
+- `import_window`导入`zyf.window.main_window`(含PyQt6)
+- `first_window`创建`QApplication`和`MainWindow`并完成第一次绘制
+
+>>> python bench/startup.py -n 5
+>>> python bench/startup.py --json startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_CHILD = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import zyf.console
+t1 = time.perf_counter()
+import zyf.window.main_window
+from PyQt6.QtWidgets import QApplication
+t2 = time.perf_counter()
+app = QApplication(sys.argv)
+console = zyf.console.Console()
+console.data.load(sys.argv[1])
+console.loading_histories.append(sys.argv[1])  # 不写入load_history.txt
+win = zyf.window.main_window.MainWindow(console)
+win.show()
+app.processEvents()
+t3 = time.perf_counter()
+print(json.dumps({'import_console': t1 - t0, 'import_window': t2 - t1, 'first_window': t3 - t2, 'total': t3 - t0}))
+'''
+
+
+def measure(yaml_path: str) -> dict[str, float]:
+    """ 在子进程中启动一次，返回各阶段耗时(s) """
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')  # 无显示器时也能运行
+    out = subprocess.run([sys.executable, '-c', _CHILD, yaml_path], cwd=ROOT, env=env,
+                         capture_output=True, text=True, encoding='utf-8', check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(n: int = 5, yaml_path: str = './data/test.yaml') -> dict[str, float]:
+    """ 启动`n`次，返回各阶段耗时的中位数(s) """
+    samples = [measure(yaml_path) for _ in range(n)]
+    return {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', type=int, default=5, help='启动次数')
+    parser.add_argument('--yaml', default='./data/test.yaml', help='加载的配置文件')
+    parser.add_argument('--json', help='把结果保存为json文件')
+    args = parser.parse_args(argv)
+
+    result = run(args.n, args.yaml)
+    for k, v in result.items():
+        print(f'{k:<16}{v * 1000:8.1f} ms')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,11 +6,9 @@ zyf.window 提供可视界面 - 前端
 import os
 import sys
 import pathlib
-from PyQt6.QtWidgets import *
-from PyQt6.QtGui import *
-from PyQt6.QtCore import *
+from PyQt6.QtWidgets import QApplication
 from zyf.window.main_window import MainWindow
-from zyf.console import Console,Config
+from zyf.console import Console
 
 
 if __name__ == '__main__':
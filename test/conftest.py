@@ -0,0 +1,12 @@
+import shutil
+import pytest
+from zyf.console import Console
+
+
+@pytest.fixture
+def console(tmp_path):
+    yaml_path = tmp_path / 'test.yaml'
+    shutil.copyfile('./data/test.yaml', yaml_path)
+    console = Console()
+    console.data.load(yaml_path)
+    return console
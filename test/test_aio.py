@@ -0,0 +1,67 @@
+import os
+import re
+import asyncio
+import pytest
+import serial
+from zyf.console.aio import AsyncTransport
+
+
+def test_loop_request_and_frames(console):
+    """ 没有文件描述符的串口(loop://)轮询接收 """
+    async def main():
+        port = serial.serial_for_url('loop://', timeout=0.5)
+        async with AsyncTransport(console, serial=port) as transport:
+            assert port.timeout == 0
+            assert await transport.send_param('DEF', 2.5) == '[0:1,2.5]'
+            assert console.data['parameter', 'values', console.group_index, 'details', 1] == 2.5
+            reply = await transport.request('pong 1\n', re.compile(rb'pong (\d)$'), timeout=1)
+            assert reply == b'[0:1,2.5]pong 1'
+            with pytest.raises(TimeoutError):
+                await transport.request('x\n', b'never', timeout=0.05)
+            frames = []
+            async for frame in transport.read_frames():
+                frames.append(frame)
+                if len(frames) == 2:
+                    break
+            assert frames == [b'[0:1,2.5]pong 1', b'x']
+        assert port.timeout == 0.5  # 关闭后恢复串口的超时
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(not hasattr(os, 'openpty'), reason='需要pty')
+def test_pty_reader(console):
+    """ 有文件描述符的串口通过add_reader接收 """
+    master, slave = os.openpty()
+    port = serial.Serial(os.ttyname(slave))
+    try:
+        async def main():
+            async with AsyncTransport(console, serial=port) as transport:
+                pending = asyncio.ensure_future(transport.wait_for(b'ok', timeout=1))
+                await asyncio.sleep(0)
+                os.write(master, b'noise\nok 42\n')
+                assert await pending == b'ok 42'
+                await transport.send_shortcut(0)
+                await asyncio.sleep(0.01)
+                assert os.read(master, 100) == b'[1:0]'
+        asyncio.run(main())
+    finally:
+        port.close()
+        os.close(master)
+        os.close(slave)
+
+
+def test_refuses_reliable_mode(console):
+    """ 没有ACK时不能确认数值 """
+    async def main():
+        port = serial.serial_for_url('loop://')
+        console.data['setting', 'reliable'] = True
+        with pytest.raises(RuntimeError):
+            await AsyncTransport(console, serial=port).open()
+        console.data['setting', 'reliable'] = False
+        async with AsyncTransport(console, serial=port) as transport:
+            console.data['setting', 'reliable'] = {'window': 2}
+            before = console.data['parameter', 'values', console.group_index, 'details', 1]
+            with pytest.raises(RuntimeError):
+                await transport.send_param('DEF', before + 1)
+            assert console.data['parameter', 'values', console.group_index, 'details', 1] == before
+    asyncio.run(main())
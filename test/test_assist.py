@@ -0,0 +1,23 @@
+import pytest
+from zyf.assist import type_check, set_type_check, type_check_enabled, TYPE_CHECK_ENV
+
+
+@type_check
+def _order(n: int | float, alias: str = 'ABC', *rest, flag: bool = False, values: list[str] = None):
+    return n
+
+
+@pytest.mark.skipif(not type_check_enabled(), reason=f'{TYPE_CHECK_ENV}关闭了类型检查')
+def test_type_check():
+    assert _order(1, 'DEF', 3, 4, flag=True, values=['x']) == 1
+    with pytest.raises(TypeError, match='`n`'):
+        _order('1')
+    with pytest.raises(TypeError, match='`alias`'):
+        _order(1, alias=2)
+    with pytest.raises(TypeError, match='`flag`'):
+        _order(1, flag=None)
+    previous = set_type_check(False)
+    try:
+        assert _order('1') == '1'
+    finally:
+        set_type_check(previous)
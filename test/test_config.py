@@ -1,9 +1,85 @@
-from zyf.console.config import Config
+import os
+import yaml
+import pytest
+from zyf.console.config import Config, YamlStyleError
 
 
-a = Config()
-a.load('./data/one.yaml')
-# a.dump('./temp/dump.yaml')
+def test_load_and_dump(console, tmp_path):
+    a = Config()
+    a.load(console.yaml_path)
+    assert a['initial', 'coding'].startswith('clock_init')
+    assert a.index_of('DEF') == 1 and a.n_param_group == 2
 
+    a['parameter', 'values', 0, 'details', 1] = 3.5
+    a.dump(str(tmp_path / 'dump.yaml'))
+    with open(tmp_path / 'dump.yaml', encoding='utf-8') as f:
+        assert yaml.safe_load(f)['parameter']['values'][0]['details'] == [1.1, 3.5]
 
-print(a['initial','coding'])
\ No newline at end of file
+    a.dump_later(delay=60)
+    assert a.is_dirty
+    a.flush()
+    assert not a.is_dirty and Config(console.yaml_path)['parameter', 'values', 0, 'details', 1] == 3.5
+
+
+def test_parsed_cache(console, tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.yaml')
+    Config(console.yaml_path).dump(path)  # 保存时写入缓存
+    monkeypatch.setattr(yaml, 'load', lambda *args, **kwargs: pytest.fail('应该命中缓存'))
+    a, b = Config(path), Config(path)
+    a['parameter', 'values', 0, 'details', 0] = 9.0
+    assert b['parameter', 'values', 0, 'details', 0] != 9.0  # 缓存返回的是副本
+    monkeypatch.undo()
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('# edited\n')  # 外部修改后大小变化，重新解析
+    a.load(path)
+    assert a['parameter', 'values', 0, 'details', 0] != 9.0
+
+
+def test_reload_external_edit(console):
+    a = Config(console.yaml_path)
+    assert not a.is_changed_on_disk
+    a['parameter', 'values', 0, 'title'] = 'own'
+    a.dump()
+    assert not a.is_changed_on_disk  # 自己保存的不算外部修改
+
+    with open(console.yaml_path, encoding='utf-8') as f:
+        text = f.read()
+    with open(console.yaml_path, 'w', encoding='utf-8') as f:
+        f.write(text.replace('title: own', 'title: external'))
+    a.dump_later(delay=60)
+    assert a.is_changed_on_disk
+    a.reload()
+    assert a['parameter', 'values', 0, 'title'] == 'external' and not a.is_dirty
+
+    with open(console.yaml_path, 'a', encoding='utf-8') as f:
+        f.write('x: [unclosed\n')
+    with pytest.raises(YamlStyleError):
+        a.reload()
+    assert a['parameter', 'values', 0, 'title'] == 'external'  # 保留原来的数据
+
+
+def test_no_reference_kept(console):
+    import gc
+    import weakref
+    from zyf.console import config
+    a = Config(console.yaml_path)
+    a.dump_later(delay=60)
+    assert a in config._pending_configs
+    a.flush()
+    assert a not in config._pending_configs
+    ref = weakref.ref(a)
+    del a
+    gc.collect()
+    assert ref() is None  # 没有为每个实例注册atexit
+
+
+def test_dump_error_leaves_no_temp_file(console, tmp_path):
+    a = Config(console.yaml_path)
+    a['delay_ms'] = object()  # 无法序列化
+    fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+    with pytest.raises(yaml.YAMLError):
+        a.dump(str(tmp_path / 'out.yaml'))
+    assert os.listdir(tmp_path) == ['test.yaml']  # 只有console的配置
+    if fds is not None:
+        assert len(os.listdir('/proc/self/fd')) == fds
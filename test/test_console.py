@@ -0,0 +1,54 @@
+import pytest
+from zyf.console import Console, CodingFiles
+
+
+def test_alias_index(console):
+    config = console.data
+    assert config.alias_index == {'ABC': 0, 'DEF': 1}
+    assert config.info_of('DEF')['define'] == 'value_2'
+    with pytest.raises(KeyError):
+        config.index_of('XYZ')
+
+    # 参数列表变化后查找表随之更新
+    config['parameter', 'infos', 0, 'alias'] = 'XYZ'
+    assert config.index_of('XYZ') == 0
+    config['parameter', 'infos'].append(dict(config['parameter', 'infos', 1], alias='GHI'))
+    assert config.index_of('GHI') == 2
+    config['parameter', 'values', 0, 'details'].append(0)
+    assert console.make_param_order('GHI', 1.0, do_send=False)[0] == '[0:2,1.0]'
+
+
+def test_coding_cache(console, monkeypatch):
+    codes = {fn: console.coding(fn) for fn in ('main.c', 'serial_order.h', 'serial_order.c')}
+    generated = []
+    _coding = Console._coding
+    monkeypatch.setattr(Console, '_coding', lambda self, fn: (generated.append(fn), _coding(self, fn))[1])
+
+    console.make_param_order('ABC', 5.0, do_send=False)  # 只修改数值
+    assert {fn: console.coding(fn) for fn in codes} == codes
+    assert generated == []
+
+    console.data['delay_ms'] = 'system_delay_ms'
+    assert 'system_delay_ms(200)' in console.coding('main.c')
+    assert console.coding('serial_order.c') == codes['serial_order.c']
+    assert generated == ['main.c']
+
+    setting = dict(console.data['setting'], recv={'frame head': '{', 'frame tail': '}'})
+    console.data['setting'] = setting  # 上层整体赋值
+    assert '"{ACK:%d}' in console.coding('serial_order.c') and generated[-1] == 'serial_order.c'
+    console.data['parameter', 'infos'].append(dict(console.data['parameter', 'infos', 0], alias='GHI'))
+    assert 'PM_GHI' in console.coding('serial_order.h')  # 原地增加参数
+
+
+def test_generate_cli_skips_unchanged(tmp_path):
+    from zyf.console.__main__ import main
+    out = tmp_path / 'build'
+    assert main(['generate', './data/test.yaml', '-o', str(out)]) == 0
+    folder = out / 'test.yaml'
+    assert sorted(p.name for p in folder.iterdir()) == sorted(CodingFiles)
+    mtimes = {p.name: p.stat().st_mtime_ns for p in folder.iterdir()}
+
+    console = Console()
+    console.data.load('./data/test.yaml')
+    assert console.save_codings(folder) == []
+    assert {p.name: p.stat().st_mtime_ns for p in folder.iterdir()} == mtimes
@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip('PyQt6')
+
+from zyf.window import forms
+
+
+def test_form_class_cached(monkeypatch):
+    """ 同一个.ui只编译一次，路径写法不同也命中缓存 """
+    forms._form_class.cache_clear()
+    monkeypatch.setattr(forms, 'compiled_form', lambda ui_path: None)  # 强制走内存编译
+    form = forms.form_class('./assets/ui/shortcut_unit.ui')
+    assert form is forms.form_class('assets/ui/shortcut_unit.ui')
+    assert hasattr(form, 'setupUi')
+    assert forms._form_class.cache_info().misses == 1
+    forms._form_class.cache_clear()
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip('PyQt6')
+
+from zyf.window.param_table import ParamTableModel, TITLE, ALIAS, VALUE
+
+
+def test_model_patches_changed_rows(console):
+    model = ParamTableModel(console)
+    assert model.refresh() is True
+    assert model.rowCount() == 2
+    assert model.index(1, ALIAS).data() == 'DEF'
+    assert model.index(0, TITLE).data() == console.data['parameter', 'infos', 0, 'title']
+
+    changes = []
+    model.dataChanged.connect(lambda a, b: changes.append((a.row(), a.column())))
+    console.make_param_order('DEF', 9.5, do_send=False)
+    assert model.refresh() is False
+    assert changes == [(1, VALUE)]
+    assert model.index(1, VALUE).data() == '9.5'
+
+    # 编辑只暂存，不改变yaml中的值
+    assert model.setData(model.index(0, VALUE), '2.5')
+    assert not model.setData(model.index(0, VALUE), 'abc')
+    assert model.index(0, VALUE).data() == '2.5'
+    assert console.data['parameter', 'values', console.group_index, 'details', 0] != 2.5
+
+
+def test_group_switch_drops_pending(console):
+    console.data['parameter', 'values', 1, 'details', 0] = 1.1  # 与第一组相同，只有暂存的值变化
+    model = ParamTableModel(console)
+    model.refresh()
+    assert model.setData(model.index(0, VALUE), '7.5')
+    changes = []
+    model.dataChanged.connect(lambda a, b: changes.append((a.row(), a.column())))
+    console.switch_group(1, do_send=False)
+    assert model.refresh() is False
+    assert sorted(changes) == [(0, VALUE), (1, VALUE)]
+    assert model.index(0, VALUE).data() == '1.1'  # 暂存的值属于上一组，被丢弃
+    model._on_sent(0, 1, 9.0, '[0:1,9.0]', None)  # 切换前写入的值送达
+    assert model.index(1, VALUE).data() == '2.2'
@@ -0,0 +1,28 @@
+from zyf.console.parser import FrameParser, FrameKind, Frame
+
+
+def test_frames_split_across_chunks():
+    stream = b'..#SET ABC=1.5\n[ACK:3]hello\r\n[Warn] Unknow param id=[9]\n...SET DEF=oops\n'
+    expected = [
+        Frame(FrameKind.IDLE, 2), Frame(FrameKind.NOMATCH, 1), Frame(FrameKind.SET, ('ABC', 1.5)),
+        Frame(FrameKind.FRAMED, b'ACK:3'), Frame(FrameKind.TEXT, b'hello'),
+        Frame(FrameKind.WARNING, b'[Warn] Unknow param id=[9]'), Frame(FrameKind.IDLE, 3),
+        Frame(FrameKind.TEXT, b'SET DEF=oops'),
+    ]
+    # 一次输入和逐字节输入的结果相同(逐字节时连续的'.'仍合并为一帧)
+    assert FrameParser().feed(stream) == expected
+    parser = FrameParser()
+    frames = [f for i in range(len(stream)) for f in parser.feed(memoryview(stream)[i:i + 1])]
+    assert frames == expected
+    assert parser.pending == 0
+    assert parser.stats.idle == 5 and parser.stats.nomatch == 1
+
+
+def test_setting_head_tail_and_flush():
+    parser = FrameParser.from_setting({'recv': {'frame head': '<<', 'frame tail': '>>'}}, max_frame=16)
+    assert parser.feed(b'<<a]b>>..') == [Frame(FrameKind.FRAMED, b'a]b')]
+    assert parser.flush() == [Frame(FrameKind.IDLE, 2)]
+    # 超长且没有结束的数据作为文本输出
+    frames = parser.feed(b'[warnning] buff was burst!xxxx')
+    assert frames == [Frame(FrameKind.WARNING, b'[warnning] buff was burst!xxxx')]
+    assert parser.stats.overflows == 1
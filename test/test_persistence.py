@@ -0,0 +1,43 @@
+import shutil
+import time
+import yaml
+from zyf.console import Config
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def test_dump_later_merges_edits(tmp_path, monkeypatch):
+    yaml_path = tmp_path / 'test.yaml'
+    shutil.copyfile('./data/test.yaml', yaml_path)
+    config = Config(yaml_path)
+    writes = []
+    write = config._write
+    monkeypatch.setattr(config, '_write', lambda *args: (writes.append(args[0]), write(*args)))
+
+    for i in range(50):
+        config['parameter', 'values', 0, 'details', 0] = i
+        config.dump_later(delay=0.05)
+    assert config.is_dirty
+    assert _load(yaml_path)['parameter']['values'][0]['details'][0] == 1.1  # 尚未写入
+
+    deadline = time.monotonic() + 2
+    while config.is_dirty and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert len(writes) == 1
+    assert _load(yaml_path)['parameter']['values'][0]['details'][0] == 49
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['test.yaml']  # 没有残留的临时文件
+
+
+def test_flush_writes_immediately(tmp_path):
+    yaml_path = tmp_path / 'test.yaml'
+    shutil.copyfile('./data/test.yaml', yaml_path)
+    config = Config(yaml_path)
+    config['parameter', 'values', 1, 'details', 1] = 9.5
+    config.dump_later(delay=60)
+    config.flush()
+    assert not config.is_dirty
+    assert _load(yaml_path)['parameter']['values'][1]['details'][1] == 9.5
@@ -0,0 +1,50 @@
+import shutil
+import struct
+import pytest
+from zyf.console import Console, protocol
+
+
+def test_crc8_check_value():
+    assert protocol.crc8(b'123456789') == 0xF4  # CRC-8/SMBUS
+
+
+def test_param_frame_round_trip():
+    frame = protocol.encode_param(3, 1.25)
+    assert len(frame) == protocol.FRAME_SIZE
+    type_, index, payload = protocol.decode_frame(frame)
+    assert (type_, index) == (protocol.TYPE_VALUE, 3)
+    assert struct.unpack('<f', payload)[0] == 1.25
+    with pytest.raises(ValueError):
+        protocol.decode_frame(frame[:-1] + bytes((frame[-1] ^ 0xFF,)))
+
+
+def test_console_binary_mode(tmp_path):
+    yaml_path = tmp_path / 'test.yaml'
+    shutil.copyfile('./data/test.yaml', yaml_path)
+    console = Console()
+    console.data.load(yaml_path)
+    assert console.protocol == 'ascii'
+    assert console.make_param_order('DEF', 2.5, do_send=False)[0] == '[0:1,2.5]'
+
+    console.data['setting', 'protocol'] = 'binary'
+    order, e = console.make_param_order('DEF', 2.5, do_send=False)
+    assert order == protocol.frame_text(protocol.encode_param(1, 2.5))
+    assert 'frame_crc8' in console.coding('serial_order.c')
+    assert 'sscanf' not in console.coding('serial_order.c')
+
+
+def test_console_batch_order(tmp_path):
+    yaml_path = tmp_path / 'test.yaml'
+    shutil.copyfile('./data/test.yaml', yaml_path)
+    console = Console()
+    console.data.load(yaml_path)
+    assert console.make_params_order(do_send=False)[0] == '[-2:0,1.1;1,1.2]'
+    assert console.make_params_order({'DEF': 3.5}, group=1, do_send=False)[0] == '[-2:1,3.5]'
+    assert console.data['parameter', 'values', 1, 'details'] == [2.1, 3.5]
+
+    console.data['setting', 'protocol'] = 'binary'
+    order, e = console.switch_group(1, do_send=False)
+    assert console.group_index == 1
+    frame = protocol.encode_batch([(0, 2.1), (1, 3.5)])
+    assert order == protocol.frame_text(frame)
+    assert protocol.decode_batch(frame)[1] == (1, 3.5)
@@ -0,0 +1,48 @@
+import time
+import serial
+from zyf.console.reader import SerialReader
+
+
+def _wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_reader_batches_chunks_and_notifies_once():
+    port = serial.serial_for_url('loop://', timeout=0.01)
+    notified = []
+    reader = SerialReader(port, notify=lambda: notified.append(1))
+    reader.start()
+    try:
+        for i in range(5):
+            port.write(f'SET ABC={i}\n'.encode())
+        assert _wait_for(lambda: reader.stats.bytes_read == 5 * 10)
+        assert len(notified) == 1  # 前端取走数据之前只通知一次
+        assert reader.drain() == b''.join(f'SET ABC={i}\n'.encode() for i in range(5))
+        port.write(b'.')
+        assert _wait_for(lambda: len(notified) == 2)
+        assert reader.drain() == b'.'
+    finally:
+        reader.stop()
+        port.close()
+    assert not reader.is_running
+
+
+def test_reader_counts_dropped_chunks():
+    port = serial.serial_for_url('loop://', timeout=0.01)
+    reader = SerialReader(port, max_pending=1)
+    reader.start()
+    try:
+        port.write(b'#')
+        assert _wait_for(lambda: reader.stats.chunks_read == 1)
+        port.write(b'#')
+        assert _wait_for(lambda: reader.stats.dropped_chunks == 1)
+        assert reader.stats.dropped_bytes == 1
+        assert reader.drain() == b'#'
+    finally:
+        reader.stop()
+        port.close()
@@ -0,0 +1,47 @@
+import time
+import serial
+import pytest
+from zyf.console.parser import FrameParser, FrameKind
+from zyf.console.recorder import SessionRecorder, SessionLog, Direction
+
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / 'a.spmlog'
+    with SessionRecorder(path) as recorder:
+        recorder.write(Direction.SEND, b'[0:0,1.5]')
+        recorder.write(Direction.RECV, b'SET AB')
+        time.sleep(0.002)
+        recorder.write(Direction.RECV, b'C=1.5\n[T:1,2]\n')
+    with pytest.raises(FileExistsError):  # 不会覆盖已有的记录
+        SessionRecorder(path)
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 7)  # 不完整的记录被忽略
+
+    with SessionLog(path) as log:
+        assert len(log) == 3
+        assert [r.direction for r in log] == [Direction.SEND, Direction.RECV, Direction.RECV]
+        assert bytes(log[0].data) == b'[0:0,1.5]'
+        assert log.index_at(log[2].t_ns) == 2 and log.duration_ns > 0
+        frames = [f for _, f in log.replay(FrameParser())]
+        assert [f.kind for f in frames] == [FrameKind.SET, FrameKind.FRAMED]
+        assert [bytes(r.data) for r in log.records(log[2].t_ns)] == [b'C=1.5\n[T:1,2]\n']
+
+
+def test_console_recording(console, tmp_path, monkeypatch):
+    port = serial.serial_for_url('loop://', timeout=0.01)
+    monkeypatch.setattr(type(console), 'serial', property(lambda self: port), raising=False)  # Console对外只读
+    monkeypatch.setattr(console.reader, 'serial', port)
+    path = console.start_recording(tmp_path / 'b.spmlog')
+    console.reader.start()
+    try:
+        console.make_param_order('ABC', 2.0)
+        for _ in range(200):
+            if console.recorder.records >= 2:
+                break
+            time.sleep(0.005)
+    finally:
+        console.reader.stop()
+    assert console.stop_recording() == path
+    with SessionLog(path) as log:
+        assert [(r.direction, bytes(r.data)) for r in log] == [
+            (Direction.SEND, b'[0:0,2.0]'), (Direction.RECV, b'[0:0,2.0]')]
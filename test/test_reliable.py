@@ -0,0 +1,79 @@
+import time
+import threading
+from zyf.console import protocol
+from zyf.console.reliable import ReliableLink
+from zyf.console.simulator import FirmwareModel, SimulatedSerial
+
+
+def test_window_and_cumulative_ack():
+    written, results = [], []
+    link = ReliableLink(lambda payload: written.append(payload), window=2, rto=0.05, retries=1)
+    for v in range(3):
+        assert link.submit(f'[0:0,{v}]', on_done=lambda e, v=v: results.append((v, e))) is None
+    assert written == ['[-3:@0]']  # 先同步序号
+    link.feed(b'SET ABC=0\n[ACK:0]\n')
+    assert written[1:] == ['[0:0,0@1]', '[0:0,1@2]'] and link.in_flight == 2  # 窗口已满
+    link.feed(b'[ACK:2]\n')  # ACK是累积的
+    assert results == [(0, None), (1, None)] and written[3:] == ['[0:0,2@3]']
+    link.ack(1)
+    assert link.stats.stale_acks == 1
+
+    deadline = time.monotonic() + 2
+    while link.pending and time.monotonic() < deadline:  # 没有ACK，重发一次后失败
+        time.sleep(0.01)
+    assert written[4:] == ['[0:0,2@3]'] and isinstance(results[2][1], TimeoutError)
+    link.submit(protocol.encode_param(0, 1.0))  # 失败后重新同步
+    assert written[5] == protocol.sync_order(4, True)
+    link.close()
+
+
+def test_console_reliable(console, monkeypatch):
+    console.data['setting', 'reliable'] = {'window': 4, 'timeout': 0.05}
+    port = SimulatedSerial(model=FirmwareModel(console.data))
+    port.open()
+    monkeypatch.setattr(type(console), 'serial', property(lambda self: port), raising=False)  # Console对外只读
+    monkeypatch.setattr(console.reader, 'serial', port)
+    receive, lost = port.model.receive, []
+
+    def lossy(data: bytes) -> bytes:
+        if b'@2]' in data and not lost:  # 第二个命令第一次发送时丢失
+            lost.append(data)
+            return b''
+        return receive(data)
+    port.model.receive = lossy
+
+    assert console.make_param_order('ABC', 1.0) == ('[0:0,1.0]', None)
+    assert console.data['parameter', 'values', 0, 'details', 0] != 1.0  # 收到ACK之前不确认
+    console.reader.start()
+    try:
+        done = threading.Event()
+        for v in (2.0, 3.0, 4.0):
+            console.make_param_order('DEF', v)
+        console.post_param_order('ABC', 5.0, on_sent=lambda order, e: done.set())
+        assert done.wait(2)
+    finally:
+        console.reader.stop()
+    assert lost and console.link.stats.retransmissions >= 1 and console.link.pending == 0
+    assert port.model.values == [5.0, 4.0]  # 丢失之后的命令被丢弃并重发，按顺序执行
+    assert console.data['parameter', 'values', 0, 'details'][:2] == [5.0, 4.0]
+
+
+def test_normal_order_reliable(console, monkeypatch):
+    console.data['setting', 'reliable'] = {'timeout': 0.05}
+    port = SimulatedSerial(model=FirmwareModel(console.data))
+    port.open()
+    monkeypatch.setattr(type(console), 'serial', property(lambda self: port), raising=False)
+    monkeypatch.setattr(console.reader, 'serial', port)
+    sent = []
+    write = port.write
+    monkeypatch.setattr(port, 'write', lambda data: sent.append(data) or write(data))
+    console.reader.start()
+    try:
+        assert console.make_normal_order('[0:1,2.5]') == ('[0:1,2.5]', None)  # 发送框中输入的命令
+        deadline = time.monotonic() + 2
+        while console.link.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert console.make_normal_order('hello') == ('hello', None)  # 不是命令，直接写入
+    finally:
+        console.reader.stop()
+    assert sent[1:] == [b'[0:1,2.5@1]', b'hello'] and console.link.pending == 0
@@ -0,0 +1,46 @@
+import time
+import threading
+from zyf.console.scheduler import SendScheduler
+from zyf.console.simulator import FirmwareModel, SimulatedSerial
+
+
+def test_coalesce_and_rate():
+    sent = []
+    scheduler = SendScheduler(lambda payload: sent.append((time.monotonic(), payload)), frames_per_s=20)
+    for v in range(50):  # 连续调整同一个参数，只发送最新的数值
+        scheduler.submit(f'[0:0,{v}]', size=8, key=('param', 0))
+    scheduler.submit('[1:0]', size=5)
+    assert scheduler.flush(timeout=2)
+    payloads = [p for _, p in sent]
+    assert payloads[-2:] == ['[0:0,49]', '[1:0]'] and len(payloads) < 5
+    assert scheduler.stats.coalesced == 50 - (len(payloads) - 1)
+    assert all(b - a >= 1 / 20 * 0.9 for (a, _), (b, _) in zip(sent, sent[1:]))
+
+    sent.clear()
+    scheduler.set_rate(frames_per_s=None, bytes_per_s=1000, burst_bytes=20)
+    start = time.monotonic()
+    for i in range(6):
+        scheduler.submit(f'[0:{i},1.0]', size=10)
+    assert scheduler.flush(timeout=2)
+    assert len(sent) == 6 and time.monotonic() - start >= (60 - 20) / 1000 * 0.9  # 超出缓冲的部分按字节限速
+    scheduler.close()
+
+
+def test_console_post_param_order(console, monkeypatch):
+    port = SimulatedSerial(model=FirmwareModel(console.data))
+    port.open()
+    monkeypatch.setattr(type(console), 'serial', property(lambda self: port), raising=False)  # Console对外只读
+    results, done = [], threading.Event()
+
+    def on_sent(order, e):
+        results.append((order, e))
+        done.set()
+    with console.scheduler._cond:  # 放入全部命令之前后台线程不能取走
+        for v in (1.0, 2.0, 3.0):
+            assert console.post_param_order('DEF', v, on_sent=on_sent) == f'[0:1,{v}]'
+    assert console.scheduler.rate[:3] == (20.0, 960.0, 99)  # 缺省按波特率和MCU的读取缓冲限速
+    assert done.wait(1)
+    console.scheduler.flush(timeout=1)
+    assert results == [('[0:1,3.0]', None)]
+    assert console.data['parameter', 'values', 0, 'details', 1] == 3.0
+    assert port.read(port.in_waiting) == b'SET DEF=3\n.'
@@ -0,0 +1,73 @@
+import pytest
+from zyf.console import schema
+from zyf.console.config import Config, YamlStyleError
+
+
+def test_errors_are_collected(console):
+    data = console.data
+    assert data.errors == () and data.is_compliant
+    del data['parameter', 'infos', 1]['alias']
+    data['parameter', 'values', 0, 'details'] = [1.0, 'x', 2.0]
+    data['project info', 'version'] = '1.0'
+    assert [str(e) for e in data.errors] == [
+        'project info.version: 版本`1.0`与程序的版本2不一致',
+        'parameter.infos[1].alias: 缺少此项',
+        'parameter.values[0].details: 数值的个数(3)与参数的个数(2)不一致',
+    ]
+    data['setting'] = []
+    assert data.errors[-1] == schema.SchemaError(('setting',), '应该是键值对')
+
+
+def test_load_raises_with_errors(tmp_path):
+    path = tmp_path / 'bad.yaml'
+    path.write_text('file info: {title: t}\nparameter: {infos: [], values: []}\n', encoding='utf-8')
+    with pytest.raises(YamlStyleError) as info:
+        Config(str(path))
+    paths = [e.path for e in info.value.errors]
+    assert ('file info', 'description') in paths and ('delay_ms',) in paths
+    assert not any(p[0] == 'parameter' for p in paths)
+
+
+def test_cached_by_digest(console, monkeypatch):
+    calls = []
+    validate_config = schema._validate_config
+    monkeypatch.setattr(schema, '_validate_config', lambda *args: calls.append(1) or validate_config(*args))
+    a = Config(console.yaml_path)
+    b = Config(console.yaml_path)
+    assert a.is_compliant and b.is_compliant and calls == []  # 同一内容的结果已经缓存
+    b['delay_ms'] = 'sleep_ms'
+    assert b.is_compliant and calls == [1]  # 修改后重新检查
+
+
+@pytest.mark.parametrize('keys, value, path', [
+    (('setting', 'protocol'), 'json', ('setting', 'protocol')),
+    (('setting', 'reliable'), 'yes', ('setting', 'reliable')),
+    (('setting', 'reliable'), {'window': 0}, ('setting', 'reliable', 'window')),
+    (('setting', 'reliable'), {'retries': 1.5}, ('setting', 'reliable', 'retries')),
+    (('setting', 'reliable'), {'timeout': -1}, ('setting', 'reliable', 'timeout')),
+    (('setting', 'send', 'rate'), {'bytes per second': -1}, ('setting', 'send', 'rate', 'bytes per second')),
+    (('setting', 'send', 'rate'), {'frames per second': 'fast'}, ('setting', 'send', 'rate', 'frames per second')),
+    (('setting', 'send', 'rate'), {'burst bytes': True}, ('setting', 'send', 'rate', 'burst bytes')),
+    (('telemetry',), {'channels': [{'name': 'x'}]}, ('telemetry', 'channels', 0, 'define')),
+    (('telemetry',), {'channels': [{'define': 'x'}]}, ('telemetry', 'channels', 0, 'name')),
+    (('telemetry',), {'capacity': 0}, ('telemetry', 'capacity')),
+    (('shortcut',), [], ('shortcut',)),
+    (('shortcut',), [{'title': 't', 'define': 'void Fn();'}], ('shortcut', 0, 'alias')),
+    (('shortcut',), [{'title': 't', 'alias': 'a', 'define': 'Fn'}], ('shortcut', 0, 'define')),
+    (('shortcut',), [{'alias': 'a', 'define': 'void Fn();'}], ('shortcut', 0, 'title')),
+])
+def test_rejects_malformed(console, keys, value, path):
+    data = console.data
+    data[keys] = value
+    assert [e.path for e in data.errors] == [path]
+
+
+def test_optional_sections(console):
+    data = console.data
+    data['setting', 'reliable'] = {'window': 4, 'timeout': 0.2}
+    data['setting', 'send', 'rate'] = {'bytes per second': None, 'burst bytes': 64}
+    data['telemetry'] = {'channels': [{'name': 'speed', 'define': 'motor.speed'}], 'fps': 30}
+    assert data.errors == ()
+    data['setting', 'reliable'] = True
+    data['shortcut'] = None
+    assert [e.path for e in data.errors] == [('shortcut',)]
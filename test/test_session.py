@@ -0,0 +1,32 @@
+import shutil
+import pytest
+from zyf.console.session import SessionManager
+from zyf.console.simulator import SimulatedSerial
+
+
+def test_broadcast(tmp_path):
+    manager = SessionManager()
+    for name in ('x', 'y'):
+        path = tmp_path / f'{name}.yaml'
+        shutil.copyfile('./data/test.yaml', path)
+        manager.add(name, path, port=f'sim://{path.as_posix()}', baudrate=115200)
+    manager['y'].data['setting', 'reliable'] = True  # y等待ACK后才确认
+    assert isinstance(manager['x'].serial, SimulatedSerial)
+    assert manager.open() == {'x': None, 'y': None}
+    try:
+        results = manager.broadcast_params({'ABC': 1.5, 'DEF': -2.0, 'XYZ': 3.0})
+        assert [r.error for r in results.values()] == [None, None]
+        for name in manager:
+            assert manager[name].serial.model.values == [1.5, -2.0]
+            assert manager[name].data['parameter', 'values', 0, 'details'][:2] == [1.5, -2.0]
+
+        results = manager.broadcast_group(1, source='x', names=['y'])
+        assert list(results) == ['y'] and results['y'].error is None
+        group = manager['x'].data['parameter', 'values', 1, 'details'][:2]
+        assert manager['y'].serial.model.values == pytest.approx(group)  # float32
+        stats = manager.stats()
+        assert stats['x'].broadcasts == 1 and stats['y'].delivered == 2
+        assert stats['y'].bytes_out > stats['x'].bytes_out > 0 and stats['y'].bytes_in > 0
+    finally:
+        manager.close()
+    assert not manager['x'].serial.is_open
@@ -0,0 +1,78 @@
+import time
+import asyncio
+import serial
+from zyf.console import protocol
+from zyf.console.aio import AsyncTransport
+from zyf.console.simulator import FirmwareModel, SimulatedSerial
+
+
+def test_ascii_firmware(console):
+    model = FirmwareModel(console.data)
+    assert f'#define SERIAL_MATCH_BUFF_SIZE {model.match_buff_size} ' in console.coding('serial_order.h')
+    assert model.receive(b'[0:1,2.5]') == b'SET DEF=2.5\n.'
+    assert model.receive(b'[-2:0,1.1;1,3]') == b'SET ABC=1.1\nSET DEF=3\n.'
+    assert model.values == [protocol.decode_batch(protocol.encode_batch([(0, 1.1)]))[0][1], 3.0]
+    # 两个命令在一次读取中到达，第二个在下一次循环中执行
+    assert model.manage_serial_port(b'[0:0,1][0:0,2]') == b'SET ABC=1\n'
+    assert model.manage_serial_port() == b'SET ABC=2\n'
+    reply = model.receive(b'[0:0' + b'x' * model.match_buff_size)
+    assert reply.startswith(b'.[warnning] buff was burst![0:0') and model.stats.bursts == 1
+    assert model.receive(b'[0:0,5]') == b'SET ABC=5\n.'
+
+
+def test_ascii_firmware_errors(console):
+    model = FirmwareModel(console.data)
+    # 无法匹配的命令回复'#'并被丢弃，不影响之后的命令
+    assert model.receive(b'[-2]') == b'#.'
+    assert model.receive(console.make_shortcut_order(0, do_send=False)[0].encode()) == b'#.'  # [1:0]
+    assert model.manage_serial_port(b'[-2][0:0,5]') == b'#.'  # ':'属于之后的命令
+    assert model.manage_serial_port() == b'SET ABC=5\n'
+    assert model.receive(b'[7:0@0]') == b'#.'  # 匹配失败时不回复ACK
+    assert model.stats.nomatch == 4 and model.stats.bursts == 0 and model.values[0] == 5.0
+
+
+def test_binary_firmware(console):
+    console.data['setting', 'protocol'] = 'binary'
+    model = FirmwareModel(console.data)
+    frame = protocol.encode_param(1, 2.5)
+    broken = bytes((frame[0], frame[1] ^ 0x40)) + frame[2:]
+    assert model.receive(broken + frame) == b'#SET DEF=2.5\n.'
+    assert model.receive(frame[:5]) == b'.'
+    assert model.receive(frame[5:] + protocol.encode_shortcut(0)) == b'SET DEF=2.5\nSET ABC=0\n.'
+    assert model.calls == [('SetParameterValue', (0, 0.0))]
+
+
+def test_binary_resync(console):
+    """ 重新对齐后剩余的数据中已有完整的帧，立即处理而不是等待下一个字节 """
+    console.data['setting', 'protocol'] = 'binary'
+    model = FirmwareModel(console.data)
+    bad = protocol.encode_batch([(0, 1.0), (1, 1.0)])[:3]  # 批量帧的内容丢失，只剩帧头
+    frames = protocol.encode_param(0, 4.0) + protocol.encode_param(1, 2.5)
+    assert model.receive(bad + frames) == b'#SET ABC=4\nSET DEF=2.5\n.'
+    assert model.values == [4.0, 2.5] and model.stats.nomatch == 1
+
+
+def test_sim_url_realtime():
+    port = serial.serial_for_url('sim://data/test.yaml?realtime', baudrate=9600, timeout=1)
+    assert isinstance(port, SimulatedSerial)
+    start = time.monotonic()
+    port.write(b'[0:1,2.5]')
+    assert port.in_waiting == 0
+    assert port.read(12) == b'SET DEF=2.5\n'
+    assert time.monotonic() - start >= 10 * (9 + 13) / 9600 * 0.9  # 命令和回复的传输时间
+    port.close()
+
+
+def test_transport_round_trip(console):
+    async def main():
+        port = SimulatedSerial(model=FirmwareModel(console.data))
+        port.open()
+        async with AsyncTransport(console, serial=port) as transport:
+            pending = asyncio.ensure_future(transport.wait_for(b'SET DEF=', timeout=1))
+            await asyncio.sleep(0)
+            await transport.send_param('DEF', 2.5)
+            assert await pending == b'SET DEF=2.5'
+            await transport.send_params({'ABC': 1, 'DEF': 2})
+            assert await transport.wait_for(b'SET DEF=', timeout=1) == b'SET DEF=2'
+        assert port.model.values == [1.0, 2.0]
+    asyncio.run(main())
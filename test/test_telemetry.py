@@ -0,0 +1,44 @@
+import numpy as np
+from zyf.console.parser import FrameParser
+from zyf.console.telemetry import RingBuffer, Telemetry
+
+
+def test_ring_buffer_wraps():
+    ring = RingBuffer(2, 5)
+    ring.extend(np.arange(6).reshape(3, 2))
+    ring.extend(np.arange(6, 14).reshape(4, 2))
+    assert ring.total == 7 and len(ring) == 5
+    assert ring.latest()[:, 0].tolist() == [4, 6, 8, 10, 12]
+    assert ring.latest(2)[:, 1].tolist() == [11, 13]
+    ring.extend(np.arange(20).reshape(10, 2))  # 一次超过容量
+    assert ring.latest()[:, 0].tolist() == [10, 12, 14, 16, 18]
+
+
+def test_feed_skips_bad_frames():
+    telemetry = Telemetry.from_config({'capacity': 100, 'channels': [{'name': 'a'}, {'name': 'b'}]})
+    frames = FrameParser().feed(b'[T:1,2]\n[T:3]\n[T:x,4]\n[X:5,6]\nSET ABC=1\n[T:5,6.5]\n')
+    assert telemetry.feed(frames) == 2
+    assert telemetry.bad_frames == 2
+    index, values = telemetry.latest()
+    assert index.tolist() == [0, 1]
+    assert values.tolist() == [[1, 2], [5, 6.5]]
+    assert telemetry.frame_pattern(b'[', b']').sub(b'', b'a[T:1,2]\nb') == b'ab'
+
+
+def test_stripper_handles_split_frames():
+    telemetry = Telemetry(['a', 'b'])
+    stripper = telemetry.frame_stripper(b'[', b']')
+    stream = b'SET ABC=1\n[T:1,2]\n..[T:3,4]\n[T:5\n[ACK:1]\n.'
+    for size in (1, 2, 3, 5, 7):
+        shown = b''.join(stripper.feed(stream[i:i + size]) for i in range(0, len(stream), size))
+        assert shown == b'SET ABC=1\n..[T:5\n[ACK:1]\n.', size  # 被换行截断的不是遥测帧
+
+
+def test_report_telemetry_coding(console):
+    assert 'ReportTelemetry' not in console.coding('serial_order.c')
+    console.data['telemetry'] = {'channels': [{'name': 'a', 'define': 'value_1'},
+                                              {'name': 'b', 'define': 'value_2 * 2', 'extern': 'float value_3;'}]}
+    code = console.coding('serial_order.c')
+    assert 'serial_printf("[T:%g,%g]\\n", (double)(value_1), (double)(value_2 * 2));' in code
+    assert 'void ReportTelemetry(void);' in console.coding('serial_order.h')
+    assert 'float value_3;' in console.coding('headfile.h')
@@ -1,33 +1,71 @@
+import os
 from functools import wraps
-from inspect import getfullargspec, signature
-from copy import deepcopy
+from inspect import signature, Parameter
+
+TYPE_CHECK_ENV = 'ZYF_TYPE_CHECK'
+""" 环境变量，为`0`/`false`/`off`时`type_check`直接返回原函数，不做任何检查 """
+
+_enabled = os.environ.get(TYPE_CHECK_ENV, '1').strip().lower() not in ('0', 'false', 'off', 'no')
+
+
+def set_type_check(enabled: bool) -> bool:
+    """ 打开或关闭已经装饰的函数的类型检查，返回之前的状态
+
+    环境变量关闭检查时装饰器不包装函数，之后打开也不会检查这些函数"""
+    global _enabled
+    previous, _enabled = _enabled, bool(enabled)
+    return previous
+
+
+def type_check_enabled() -> bool:
+    return _enabled
+
+
+def _checkable(annotation) -> bool:
+    """ 注解能否用于`isinstance`，如`int`、`float | int`、`dict | None` """
+    try:
+        isinstance(None, annotation)
+    except TypeError:
+        return False
+    return True
 
 
 def type_check(func):
-    """ 严格类型检查 """
+    """ 严格类型检查
+
+    装饰时解析一次函数签名，调用时只对传入的、有注解的参数做`isinstance`检查；
+    `list[str]`、`Literal`等不能用于`isinstance`的注解不检查"""
+    if not _enabled:
+        return func
+    positional: list[tuple[int, str, type]] = []  # (位置, 参数名, 类型)
+    by_name: dict[str, type] = {}  # 可以按关键字传入的参数
+    for i, p in enumerate(signature(func).parameters.values()):
+        if p.annotation is Parameter.empty or p.kind in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD) \
+                or not _checkable(p.annotation):
+            continue
+        if p.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
+            positional.append((i, p.name, p.annotation))
+        if p.kind != Parameter.POSITIONAL_ONLY:
+            by_name[p.name] = p.annotation
+    if not positional and not by_name:
+        return func
+
     @wraps(func)
     def wapper(*args, **kwargs):
-        argspec = getfullargspec(func)
-        #print(argspec)
-        # print(args, kwargs)
-        paramdict = deepcopy(kwargs)
-        for i in range(len(args)):
-            paramdict[argspec.args[i]] = args[i]
-        for param, value in paramdict.items():
-            if not param in argspec.annotations:
-                continue
-            ptype = argspec.annotations[param]
-            if not isinstance(value, ptype):
-                raise TypeError(f'the value of `{param}` is {value}, which is not instance of {ptype}')
-        return func(*args, **kwargs) #执行函数，也要返回其值
+        if _enabled:
+            n = len(args)
+            for i, param, ptype in positional:
+                if i >= n:
+                    break
+                if not isinstance(args[i], ptype):
+                    _raise(param, args[i], ptype)
+            for param, value in kwargs.items():
+                ptype = by_name.get(param)
+                if ptype is not None and not isinstance(value, ptype):
+                    _raise(param, value, ptype)
+        return func(*args, **kwargs)  # 执行函数，也要返回其值
     return wapper
 
 
-# @type_check
-# def _test(n: int | float, x: float = 2, z: int = 1):
-#     """ Test """
-#     ...
-
-
-# _test(1.1, x=2.1)
-# _test(1, x=2.1)
\ No newline at end of file
+def _raise(param: str, value, ptype: type):
+    raise TypeError(f'the value of `{param}` is {value}, which is not instance of {ptype}')
@@ -1,29 +1,55 @@
 import os
 import re
-from functools import wraps
+from functools import wraps, partial
 from typing import Literal
-from icecream import ic
 from pathlib import Path
-import shutil
-import inspect
 import enum
+import time
+import hashlib
 import serial as ser
 from copy import deepcopy
-from typing import Any, NoReturn
+from typing import Any, Callable, NoReturn
 from .config import Config
+from .reader import SerialReader
+from .recorder import SessionRecorder, Direction, LOG_SUFFIX
+from .scheduler import SendScheduler, DEFAULT_FRAMES_PER_SECOND
+from .reliable import ReliableLink, DEFAULT_WINDOW, DEFAULT_RETRIES, INITIAL_RTO
+from . import protocol
 from zyf.assist import type_check
 
+if __name__ not in ser.protocol_handler_packages:
+    ser.protocol_handler_packages.append(__name__)  # serial_for_url('sim://...')使用protocol_sim中的模拟固件
+
 MAN_HISTORY_LEN = 7
 """ 保留历史的最大个数 """
 
+SERIAL_READBUFF_SIZE = 100
+""" 生成代码中的串口读取缓冲，MCU每次主循环最多读取`SERIAL_READBUFF_SIZE - 1`个字节 """
+
+
+def serial_match_buff_size(n_params: int) -> int:
+    """ 生成代码中的`SERIAL_MATCH_BUFF_SIZE`，需要容纳全部参数的批量命令 """
+    return max(100, 24 * n_params + 16)
+
+
 CHAR_N = '\n'
 CHAR_N_ = r'\n'
 CHAR_T = '\t'
-CodingFiles = ('main.c', 'serial_order.h', 'serial_order.c')
-CodingFileNames = Literal['main.c', 'serial_order.h', 'serial_order.c']  # 生成文件名
+CodingFiles = ('main.c', 'serial_order.h', 'serial_order.c', 'headfile.h')
+CodingFileNames = Literal['main.c', 'serial_order.h', 'serial_order.c', 'headfile.h']  # 生成文件名
 """ - `main.c`示例主程序，仅包含调用的说明
 - `serial_order.c`各种辅助函数的实现
-- `serial_order.h`各种类型的声明"""
+- `serial_order.h`各种类型的声明
+- `headfile.h`需要MCU工程提供的函数和变量的声明"""
+
+CODING_DEPENDENCIES: dict[str, tuple[tuple, ...]] = {
+    'main.c': (('initial', 'coding'), ('delay_ms',)),
+    'serial_order.h': (('initial', 'includes'), ('parameter', 'infos'), ('shortcut',), ('telemetry',)),
+    'serial_order.c': (('parameter', 'infos'), ('shortcut',), ('setting', 'protocol'), ('setting', 'recv'),
+                       ('telemetry',)),
+    'headfile.h': (('parameter', 'infos'), ('shortcut',), ('telemetry',)),
+}
+""" 生成每个文件时用到的yaml字段，字段不变时直接使用缓存的代码 """
 
 MAX_PARAM_NUMBER: int = None
 """ 每个命令的最多能有的参数个数 """
@@ -31,6 +57,13 @@ MAX_PARAM_NUMBER: int = None
 
 class Orders(enum.Enum):
     VALUE, OTHER = range(2)
+    BATCH = -2  # 批量设置参数，对应C代码中的`SC_BatchParameterValue`
+    SYNC = protocol.ORDER_SYNC  # 可靠模式下同步序号，对应C代码中的`SC_SyncSequence`
+
+
+def _escape_format(text) -> str:
+    """ 转义为C字符串中的printf格式 """
+    return str(text).replace('\\', '\\\\').replace('"', '\\"').replace('%', '%%')
 
 
 def replace_type(k: Literal['char', 'int', 'float', 'double']):
@@ -51,20 +84,41 @@ def add_writable(method):
         if not isinstance(instance, Console):
             raise TypeError()
         instance._set_writable(True)  # 关闭只读属性
-        method(*args, **kwargs)  # 执行类方法
-        instance._set_writable(False)  # 开启只读属性
+        try:
+            return method(*args, **kwargs)  # 执行类方法
+        finally:
+            instance._set_writable(False)  # 开启只读属性
     return wrapper
 
 
+class WriterStats:
+    """ 写入串口的统计信息 """
+
+    def __init__(self) -> None:
+        self.bytes_written = 0  # 写入的总字节数
+        self.writes = 0  # 写入的次数
+        self.errors = 0  # 写入时返回异常的次数
+
+    def __repr__(self) -> str:
+        return f'WriterStats(bytes_written={self.bytes_written}, writes={self.writes}, errors={self.errors})'
+
+
 class Console:
 
     @add_writable
     def __init__(self) -> None:
         self.data = Config()
         self.serial = ser.Serial()
+        self.reader = SerialReader(self.serial)  # 后台读取线程
+        self.writer_stats = WriterStats()
         self.group_index = 0  # 当前使用第几个参数组
         self._loading_path = './config/load_history.txt'
         self.loading_histories: tuple[str] = []  # 越往后越新
+        self._coding_cache: dict[str, tuple[tuple, str]] = {}  # 文件名 -> (输入字段的版本, 代码)
+        self.recorder: SessionRecorder = None  # 正在进行的会话记录
+        self.scheduler = SendScheduler(self._write_posted)  # 限速并合并的发送队列，见`post_param_order`
+        self.link = ReliableLink(self._serial_write)  # 可靠模式的发送窗口，见`_deliver`
+        self.reader.listeners.append(self.link.feed)
         self.dct = {
             'write encoding': 'ASCII',
             'read encoding': 'ASCII'
@@ -79,7 +133,7 @@ class Console:
     def set_serial(self, d: dict[str, Any]) -> Exception:
         """ 更改串口设置
 
-        >>> port: str | None = None #串口设备路径,
+        >>> port: str | None = None #串口设备路径，也可以是pyserial的URL，如`socket://host:port`、`sim://data/test.yaml`
         >>> baudrate: int = 9600, #串口通信的波特率
         >>> bytesize: int = 8, #数据帧的字节大小
         >>> parity: str = "N", #奇偶校验位
@@ -97,12 +151,76 @@ class Console:
             for k, v in d.items():
                 if k in self.dct.keys():
                     self.dct[k] = v
+                elif k == 'port':
+                    self._use_port(v)
                 else:
                     setattr(self.serial, k, v)
         except Exception as e:
             raise e
+        from icecream import ic  # 延迟导入，icecream的导入耗时很长
         ic(d)
 
+    def _use_port(self, port: str | None):
+        """ 串口路径为URL时换用pyserial中对应的串口类并保留其他设置，只能在可写时调用 """
+        is_url = port is not None and '://' in port
+        if not is_url and type(self.serial) is ser.Serial:
+            self.serial.port = port
+            return
+        if self.serial.is_open:
+            raise ser.SerialException('请先关闭串口再更换')
+        serial = ser.serial_for_url(port, do_not_open=True) if is_url else ser.Serial()
+        serial.apply_settings(self.serial.get_settings())
+        if not is_url:
+            serial.port = port
+        self.serial = serial
+        self.reader.serial = serial
+
+    def open_serial(self):
+        """ 打开串口并启动后台读取线程 """
+        self.serial.open()
+        self.reader.start()
+
+    def close_serial(self):
+        """ 停止后台读取线程并关闭串口，发送队列中尚未发送和尚未确认的命令被丢弃 """
+        self.scheduler.clear()
+        self.link.reset(ser.PortNotOpenError())
+        self.reader.stop()
+        self.serial.close()
+
+    @add_writable
+    def start_recording(self, path: str | Path = None) -> Path:
+        """ API: 开始记录发送和接收的全部数据，返回记录文件
+
+        `path`缺省时为`./logs/<yaml文件名>-<时间>.spmlog`"""
+        if self.recorder is not None:
+            return self.recorder.path
+        if path is None:
+            name = Path(self.current_loading).stem if self.loading_histories else 'session'
+            path = Path('./logs') / f'{name}-{time.strftime("%Y%m%d-%H%M%S")}{LOG_SUFFIX}'
+        self.recorder = SessionRecorder(path)
+        self.reader.listeners.append(self._record_recv)
+        return self.recorder.path
+
+    @add_writable
+    def stop_recording(self) -> Path | None:
+        """ API: 停止记录，返回记录文件 """
+        if self.recorder is None:
+            return None
+        if self._record_recv in self.reader.listeners:
+            self.reader.listeners.remove(self._record_recv)
+        recorder, self.recorder = self.recorder, None
+        recorder.close()
+        return recorder.path
+
+    def _record(self, direction: Direction, data: bytes):
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.write(direction, data)
+
+    def _record_recv(self, data: bytes):
+        """ 读取线程收到数据时记录 """
+        self._record(Direction.RECV, data)
+
     @add_writable
     def load_from_history(self, x: int, from_path=False):
         """ 从load_history中加载数据 """
@@ -142,17 +260,66 @@ class Console:
     def yaml_path(self):
         return deepcopy(self.data.yaml_path)
 
-    def _serial_write(self, info: str) -> Exception | None:
+    @property
+    def protocol(self) -> protocol.ProtocolModes:
+        """ 当前配置使用的命令编码方式 """
+        return protocol.protocol_mode(self.data.get('setting'))
+
+    def _serial_write(self, info: str | bytes) -> Exception | None:
         print(f'[send]: {info}')
+        data = info if isinstance(info, bytes) else info.encode(self.dct['write encoding'])
         try:
-            self.serial.write(info.encode(self.dct['write encoding']))
+            self.serial.write(data)
         except ser.PortNotOpenError as e:
             print(e.args)
+            self.writer_stats.errors += 1
+            return e
+        self.writer_stats.writes += 1
+        self.writer_stats.bytes_written += len(data)
+        self._record(Direction.SEND, data)
+
+    def _deliver(self, order: str | bytes,
+                 on_delivered: Callable[[Exception | None], None] = None) -> Exception | None:
+        """ 写入命令，送达后调用`on_delivered(None)`；写入出错时返回异常，不会调用`on_delivered`
+
+        可靠模式下(yaml中的`setting: reliable:`)命令带序号发送，收到MCU的ACK才算送达，
+        之后在读取线程中调用`on_delivered`，多次重发仍然没有ACK时为`TimeoutError`；
+        否则写入成功即算送达"""
+        reliable = self.data.get(('setting', 'reliable'))
+        if not reliable:
+            e = self._serial_write(order)
+            if e is None and on_delivered is not None:
+                on_delivered(None)
             return e
+        reliable = reliable if isinstance(reliable, dict) else {}
+        recv = self.data.get(('setting', 'recv')) or {}
+        encoding = self.dct['read encoding']
+        self.link.set_frame(str(recv.get('frame head', '[')).encode(encoding),
+                            str(recv.get('frame tail', ']')).encode(encoding))
+        self.link.configure(window=reliable.get('window', DEFAULT_WINDOW),
+                            window_bytes=reliable.get('window bytes', SERIAL_READBUFF_SIZE - 1),
+                            retries=reliable.get('retries', DEFAULT_RETRIES),
+                            rto=reliable.get('timeout', INITIAL_RTO))
+        return self.link.submit(order, on_done=on_delivered)
+
+    def _write_posted(self, posted: tuple) -> Exception | None:
+        """ 发送队列的写入函数，`posted`为(命令, 送达后的回调) """
+        return self._deliver(*posted)
+
+    @staticmethod
+    def _posted_error(posted: tuple, e: Exception | None):
+        """ 写入出错时`_deliver`不会调用回调，由发送队列调用 """
+        if e is not None and posted[1] is not None:
+            posted[1](e)
 
     @type_check
     def make_normal_order(self, order: str, *, do_send=True) -> tuple[str, Exception]:
-        """  """
+        """ API: 发送手动输入的文本(发送框、快捷指令按钮)
+
+        `[...]`形式的命令与其他命令相同经由`_deliver`，可靠模式下带序号发送并等待ACK；
+        其他文本不是命令，MCU不会回复ACK，直接写入串口"""
+        if order.startswith('[') and order.endswith(']'):
+            return self._make_encoded_order(order, do_send=do_send)
         exception = None
         if do_send:
             exception = self._serial_write(order)
@@ -161,8 +328,55 @@ class Console:
     @type_check
     def make_shortcut_order(self, shortcut_id: int, *, do_send=True) -> tuple[str, Exception]:
         """  """
-        order = f'[{Orders.OTHER.value}:{shortcut_id}]'
-        return self.make_normal_order(order, do_send=do_send)
+        return self._make_encoded_order(self._shortcut_order(shortcut_id), do_send=do_send)
+
+    def _shortcut_order(self, shortcut_id: int) -> str | bytes:
+        """ 快捷指令的命令，文本或二进制帧 """
+        if self.protocol == 'binary':
+            return protocol.encode_shortcut(shortcut_id)
+        return f'[{Orders.OTHER.value}:{shortcut_id}]'
+
+    def _param_order(self, items: list[tuple[int, float | int]], *, batch=False) -> str | bytes:
+        """ 设置参数的命令，文本或二进制帧
+
+        `items`(索引, 数值)的列表，`batch`为False时只能有一个参数"""
+        if not batch:
+            (param_index, v), = items
+            if self.protocol == 'binary':
+                return protocol.encode_param(param_index, v)
+            return f"[0:{param_index},{v}]"
+        if self.protocol == 'binary':
+            return protocol.encode_batch(items)
+        return f"[{Orders.BATCH.value}:{';'.join(f'{i},{v}' for i, v in items)}]"
+
+    def _commit_values(self, items: list[tuple[int, float | int]], group: int | None = None):
+        """ 发送成功后确认更改数值，稍后保存yaml """
+        group = self.group_index if group is None else group
+        for i, v in items:
+            self.data['parameter', 'values', group, 'details', i] = v
+        self.data.dump_later()
+
+    def _committer(self, items: list[tuple[int, float | int]], group: int,
+                   then: Callable[[Exception | None], None] = None) -> Callable[[Exception | None], None]:
+        """ 命令送达后确认更改数值的回调，之后调用`then(e)` """
+        def commit(e: Exception | None):
+            if e is None and items:
+                self._commit_values(items, group)
+            if then is not None:
+                then(e)
+        return commit
+
+    def _make_encoded_order(self, order: str | bytes, *, do_send=True,
+                            on_delivered: Callable[[Exception | None], None] = None) -> tuple[str, Exception]:
+        """ 发送文本命令或二进制帧，返回命令的可读文本
+
+        送达后调用`on_delivered(None)`(见`_deliver`)，`do_send`为False时直接调用"""
+        exception = None
+        if do_send:
+            exception = self._deliver(order, on_delivered)
+        elif on_delivered is not None:
+            on_delivered(None)
+        return protocol.frame_text(order) if isinstance(order, bytes) else order, exception
 
     @type_check
     def make_param_order(self, alias: str, v: float | int, *, do_send=True) -> tuple[str, Exception]:
@@ -170,64 +384,338 @@ class Console:
 
         `do_send`是否同时进行发送
 
+        送达后才确认更改数值，可靠模式下为收到ACK之后
+
         ## Return
         order 命令文本
         err Exception对象"""
-        order = f"[0:{[p['alias'] for p in self.data['parameter','infos']].index(alias)},{v}]"
-        o, exception = self.make_normal_order(order, do_send=do_send)
-
-        if not exception:  # 发送不报错，确认更改数值
-            # if True:
-            param_index = [a['alias'] for a in self.data['parameter', 'infos']].index(alias)
-            ic(param_index)
-            self.data['parameter', 'values', self.group_index, 'details', param_index] = v
-            self.data.dump()
-        return order, exception
+        items = [(self.data.index_of(alias), v)]
+        return self._make_encoded_order(self._param_order(items), do_send=do_send,
+                                        on_delivered=self._committer(items, self.group_index))
+
+    @type_check
+    def make_params_order(self, values: dict | None = None, *, group: int | None = None, do_send=True,
+                          on_delivered: Callable[[Exception | None], None] = None) -> tuple[str, Exception]:
+        """ API: 一次性发送多个参数的命令
+
+        `values`{化名: 数值}，缺省时发送整个数值组
+        `group`数值组的索引，缺省时为当前使用的数值组
+        `do_send`是否同时进行发送
+        `on_delivered(e)`送达或失败后调用，见`_deliver`；写入出错时不调用
+
+        所有参数在一个命令中发送，送达后只保存一次yaml
+
+        ## Return
+        order 命令文本
+        err Exception对象"""
+        group = self.group_index if group is None else group
+        if values is None:
+            items = list(enumerate(self.data['parameter', 'values', group, 'details']))
+        else:
+            items = [(self.data.index_of(alias), v) for alias, v in values.items()]
+
+        return self._make_encoded_order(self._param_order(items, batch=True), do_send=do_send,
+                                        on_delivered=self._committer([] if values is None else items, group,
+                                                                     on_delivered))
+
+    def send_rate(self) -> dict:
+        """ 发送队列的限速，yaml中`setting: send: rate:`缺省的项为
+        - `frames per second`: `DEFAULT_FRAMES_PER_SECOND`
+        - `bytes per second`: 波特率/10(每字节10位)
+        - `burst bytes`: MCU每次主循环读取的字节数，连续发送时不会超出其缓冲"""
+        rate = self.data.get(('setting', 'send', 'rate')) or {}
+        line_rate = (self.serial.baudrate or 0) / 10
+        return {'frames_per_s': rate.get('frames per second', DEFAULT_FRAMES_PER_SECOND),
+                'bytes_per_s': rate.get('bytes per second', line_rate or None),
+                'burst_bytes': rate.get('burst bytes', SERIAL_READBUFF_SIZE - 1)}
+
+    def post_order(self, order: str | bytes, *, key=None,
+                   on_sent: Callable[[str | bytes, Exception | None], None] = None):
+        """ API: 把命令放入限速的发送队列，`key`相同且尚未发出的命令会被替换
+
+        `on_sent(order, e)`在送达(见`_deliver`)或出错后于发送线程或读取线程中调用"""
+        rate = self.send_rate()
+        if (rate['frames_per_s'], rate['bytes_per_s'], rate['burst_bytes']) != self.scheduler.rate[:3]:
+            self.scheduler.set_rate(**rate)
+        size = len(order) if isinstance(order, bytes) else len(order.encode(self.dct['write encoding']))
+        self.scheduler.submit((order, None if on_sent is None else partial(on_sent, order)), size=size, key=key,
+                              on_sent=self._posted_error)
+
+    @type_check
+    def post_param_order(self, alias: str, v: float | int, *,
+                         on_sent: Callable[[str, Exception | None], None] = None) -> str:
+        """ API: 把设置参数的命令放入发送队列，返回命令文本
+
+        同一参数尚未发出的命令会被替换，只发送最新的数值；送达后才确认更改数值。
+        `on_sent(order, e)`在送达或出错后调用"""
+        items, group = [(self.data.index_of(alias), v)], self.group_index
+        order = self._param_order(items)
+        text = protocol.frame_text(order) if isinstance(order, bytes) else order
+
+        commit = self._committer(items, group)
+
+        def sent(_, e: Exception | None):
+            commit(e)
+            if on_sent is not None:
+                on_sent(text, e)
+        self.post_order(order, key=('param', group, items[0][0]), on_sent=sent)
+        return text
+
+    @add_writable
+    def switch_group(self, group: int, *, do_send=True,
+                     on_delivered: Callable[[Exception | None], None] = None) -> tuple[str, Exception]:
+        """ API: 切换当前使用的数值组，并一次性发送该组的全部参数 """
+        if not 0 <= group < self.data.n_value_group:
+            raise IndexError(f'数值组{group}不存在，共有{self.data.n_value_group}组')
+        self.group_index = group
+        return self.make_params_order(group=group, do_send=do_send, on_delivered=on_delivered)
 
     @property
     def current_loading(self) -> str:
         """ 当前加载的yaml配置文件 """
         return self.loading_histories[-1]
 
-    def save_codings(self):
-        """ API: 将代码文件保存到指定文件夹下 """
-        folder = Path('./build') / self.current_loading.replace('\\', '/').split('/')[-1]
+    def save_codings(self, folder: str | Path = None) -> list[Path]:
+        """ API: 将代码文件保存到指定文件夹下
+
+        `folder`缺省时保存到`./build/<yaml文件名>`
+        内容的哈希与已有文件相同时不重新写入，返回实际写入的文件"""
+        if folder is None:
+            folder = Path('./build') / self.current_loading.replace('\\', '/').split('/')[-1]
+        folder = Path(folder)
         print(folder)
         # 创建文件夹
-        if not folder.is_dir():
-            folder.mkdir()
+        folder.mkdir(parents=True, exist_ok=True)
         # 写入代码
+        written = []
         for fn in CodingFiles:
-            with open(folder/fn, 'w', encoding='utf-8') as f:
-                f.write(self.coding(fn))
-        # -------------------------------------------- headfile.h ------------------------------------------------
-        with open(folder/'headfile.h', 'w', encoding='utf-8') as f:
-            f.write(f"""#ifndef __HEADFILE_H__
-#define __HEADFILE_H__
+            code = self.coding(fn).encode('utf-8')
+            path = folder / fn
+            if path.is_file() and hashlib.blake2b(path.read_bytes()).digest() == hashlib.blake2b(code).digest():
+                continue  # 内容未变化，保留原文件(及其修改时间)
+            path.write_bytes(code)
+            written.append(path)
+        return written
+
+    def _coding_telemetry(self, channels: list[dict]) -> str:
+        """ 上报遥测数据的C语言代码，没有通道时为空 """
+        if not channels:
+            return ''
+        from .telemetry import DEFAULT_PREFIX  # 不在导入时加载numpy
+        recv = self.data.get(('setting', 'recv')) or {}
+        prefix = (self.data.get('telemetry') or {}).get('prefix', DEFAULT_PREFIX)
+        fmt = (f"{_escape_format(recv.get('frame head', '['))}{_escape_format(prefix)}:"
+               f"{','.join(['%g'] * len(channels))}{_escape_format(recv.get('frame tail', ']'))}{CHAR_N_}")
+        return rf"""
+void ReportTelemetry(void)
+{{
+    serial_printf("{fmt}", {', '.join(f"(double)({ch['define']})" for ch in channels)});
+}}
+"""
+
+    def _coding_sequence(self) -> str:
+        """ 可靠模式下按序号执行命令并回复ACK的C语言代码，见`reliable` """
+        recv = self.data.get(('setting', 'recv')) or {}
+        ack = (f"{_escape_format(recv.get('frame head', '['))}{protocol.ACK_TAG}%d"
+               f"{_escape_format(recv.get('frame tail', ']'))}{CHAR_N_}")
+        return rf"""
+#define SEQ_MASK {protocol.SEQ_MODULO - 1:#04X} // 序号的范围
+#define SEQ_DROP -1     // 之前的命令丢失，丢弃等待重发
+#define SEQ_DUPLICATE 0 // 已经执行过，只回复ACK
+#define SEQ_EXECUTE 1   // 按顺序到达，执行并回复ACK
+
+static int VAR_expected_seq = -1; // 可靠模式下期望的下一个序号，-1为尚未同步
+
+/// @brief 可靠模式下判断带序号的命令是否应该执行
+static int sequence_state(int seq)
+{{
+    if (VAR_expected_seq < 0 || seq == VAR_expected_seq)
+    {{
+        return SEQ_EXECUTE;
+    }}
+    return ((VAR_expected_seq - 1 - seq) & SEQ_MASK) < (SEQ_MASK + 1) / 2 ? SEQ_DUPLICATE : SEQ_DROP;
+}}
 
-typedef char uint8;
-typedef unsigned short uint16;
-typedef unsigned int uint32;
+/// @brief 回复ACK，按顺序执行的命令同时更新期望的序号
+static void sequence_ack(int seq, int state)
+{{
+    if (state == SEQ_EXECUTE)
+    {{
+        VAR_expected_seq = (seq + 1) & SEQ_MASK;
+    }}
+    serial_printf("{ack}", seq);
+}}
+"""
+
+    def _coding_binary_process(self, shortcut_definitions: list[str], shortcut_function_name: list[str]) -> str:
+        """ 二进制帧模式下`process_information`的C语言代码
+
+        逐字节接收帧，校验通过后按类型直接调用，不再需要`sscanf`解析文本。
+        快捷指令使用`define`中的默认参数调用 """
+        n_params = self.data.n_param_group
+        shortcut_default_args = [
+            [arg.strip() for arg in re.findall(r'=([^,)]+)', sd)] for sd in shortcut_definitions]
+        return rf"""
+#define FRAME_SYNC {protocol.SYNC_BYTE:#04X} // 二进制帧的同步字节
+#define FRAME_SIZE {protocol.FRAME_SIZE}    // 同步(1) + 类型(1) + 索引(1) + 数值(4, 小端) + CRC(1)
+#define FRAME_BATCH_SIZE(n) ({protocol.batch_frame_size(0)} + 5 * (n)) // 批量帧: 同步(1) + 类型(1) + 个数(1) + (索引(1) + 数值(4)) * n + CRC(1)
+#define FRAME_MAX_SIZE {max(protocol.FRAME_SIZE, protocol.batch_frame_size(min(n_params, protocol.MAX_BATCH)))} // 最长的帧
+
+/// @brief CRC-8校验(多项式{protocol.CRC8_POLY:#04x}，初值0)
+static unsigned char frame_crc8(const unsigned char *data, int len)
+{{
+    unsigned char crc = 0;
+    int i, j;
+    for (i = 0; i < len; i++)
+    {{
+        crc ^= data[i];
+        for (j = 0; j < 8; j++)
+        {{
+            crc = (crc & 0x80) ? (unsigned char)((crc << 1) ^ {protocol.CRC8_POLY:#04x}) : (unsigned char)(crc << 1);
+        }}
+    }}
+    return crc;
+}}
 
-uint32 wireless_uart_send_buff(uint8 *buff, uint16 len);
-uint32 wireless_uart_read_buff(uint8 *buff, uint32 len);
+/// @brief 丢弃帧缓冲开头的`n`个字节并对齐到下一个同步字节，返回剩余的字节数
+static int frame_drop(unsigned char *frame, int frame_len, int n)
+{{
+    while (n < frame_len && frame[n] != FRAME_SYNC)
+    {{
+        n++;
+    }}
+    memmove(frame, frame + n, frame_len - n);
+    return frame_len - n;
+}}
 
-{f'{CHAR_N}'.join(sc['define'] for sc in self.data['shortcut'])}
+enum shortcut process_information(const char *uart_buff, const int uart_len)
+{{
+    static unsigned char frame[FRAME_MAX_SIZE]; // 正在接收的帧
+    static int frame_len = 0;                   // 已经接收的字节数
+    static int frame_size;                      // 当前帧的完整长度
+    static int i, j;                            // 无特殊含义
+    static int seq = -1;                        // 可靠模式下`TYPE_SEQ`帧给出的下一帧的序号
+    int state;                                  // 序号的状态
+    union type_param value;                     // 帧中的数值
+    enum shortcut ot = SC_None;                 // 指令类型
 
-{CHAR_N.join(e for e in set([param['extern'] for param in self.data['parameter', 'infos']]))}
+    for (i = 0; i < uart_len; i++)
+    {{
+        if (frame_len == 0 && (unsigned char)uart_buff[i] != FRAME_SYNC)
+        {{
+            continue; // 等待同步字节
+        }}
+        frame[frame_len++] = (unsigned char)uart_buff[i];
+        while (frame_len >= 3) // 重新对齐后剩余的数据中可能已经有完整的帧
+        {{
+            frame_size = frame[1] == {protocol.TYPE_BATCH} ? FRAME_BATCH_SIZE(frame[2]) : FRAME_SIZE;
+            if (frame_size <= FRAME_MAX_SIZE && frame_len < frame_size)
+            {{
+                break;
+            }}
 
-#endif""")
+            if (frame_size > FRAME_MAX_SIZE || frame_crc8(frame + 1, frame_size - 2) != frame[frame_size - 1])
+            {{ // 长度或校验错误，从下一个同步字节重新对齐
+                debug_println("frame error %c", ' ');
+                serial_putstr("#");
+                seq = -1;
+                frame_len = frame_drop(frame, frame_len, 1);
+                continue;
+            }}
+
+            if (frame[1] == {protocol.TYPE_SEQ}) // 可靠模式: 下一帧的序号
+            {{
+                seq = frame[2];
+                frame_len = frame_drop(frame, frame_len, frame_size);
+                continue;
+            }}
+            if (frame[1] == {protocol.TYPE_SYNC}) // 可靠模式: 同步序号
+            {{
+                VAR_expected_seq = -1;
+                seq = frame[2];
+            }}
+            state = seq < 0 ? SEQ_EXECUTE : sequence_state(seq);
+
+            memcpy(&value, frame + 3, 4); // 数值按小端的float32/int32传输
+            switch (state == SEQ_EXECUTE ? frame[1] : {protocol.TYPE_SYNC}) // 重复或乱序的帧不执行
+            {{
+            case {protocol.TYPE_VALUE}: // 设置参数
+                SetParameterValue((enum global_param)frame[2], value.float_);
+                ot = SC_SetParameterValue;
+                break;
+            case {protocol.TYPE_SHORTCUT}: // 执行快捷指令
+                switch (frame[2])
+                {{{''.join(f'''
+                case {i}:
+                    {sfn}({", ".join(args)});
+                    break;''' for i, (sfn, args) in enumerate(zip(shortcut_function_name, shortcut_default_args)))}
+                default:
+                    serial_putstr("#");
+                    state = SEQ_DROP; // 不回复ACK
+                    break;
+                }}
+                ot = (enum shortcut)frame[2];
+                break;
+            case {protocol.TYPE_BATCH}: // 批量设置参数
+                for (j = 0; j < frame[2]; j++)
+                {{
+                    memcpy(&value, frame + 4 + 5 * j, 4);
+                    SetParameterValue((enum global_param)frame[3 + 5 * j], value.float_);
+                }}
+                ot = SC_BatchParameterValue;
+                break;
+            case {protocol.TYPE_SYNC}: // 同步序号，重复或乱序的帧也在这里跳过
+                ot = SC_SyncSequence;
+                break;
+            default: // 匹配失败
+                debug_println("match None %c", ' ');
+                serial_putstr("#");
+                state = SEQ_DROP;
+                break;
+            }}
+            if (seq >= 0 && state != SEQ_DROP)
+            {{
+                sequence_ack(seq, state);
+            }}
+            seq = -1;
+            frame_len = frame_drop(frame, frame_len, frame_size);
+        }}
+    }}
+    return ot;
+}}"""[1:]
 
     def coding(self, fn: CodingFileNames) -> str:
-        """ API: 返回对应文件名的C语言代码 """
+        """ API: 返回对应文件名的C语言代码
+
+        以生成该文件用到的yaml字段的版本作为缓存键，只修改参数数值时不会重新生成"""
+        if fn not in CODING_DEPENDENCIES:
+            return self._coding(fn)
+        key = tuple(self._section_key(keys) for keys in CODING_DEPENDENCIES[fn])
+        cached = self._coding_cache.get(fn)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        code = self._coding(fn)
+        self._coding_cache[fn] = (key, code)
+        return code
+
+    def _section_key(self, keys: tuple) -> tuple:
+        """ 字段的版本，以及(id, 长度)以发现原地增删的列表，与`Config.alias_index`相同 """
+        section = self.data.get(keys)
+        return self.data.version(keys), id(section), len(section) if isinstance(section, (list, dict)) else None
+
+    def _coding(self, fn: CodingFileNames) -> str:
+        """ 生成对应文件名的C语言代码，不使用缓存 """
         aliases = [param['alias'] for param in self.data['parameter', 'infos']]
         definitions = [param['define'] for param in self.data['parameter', 'infos']]
-        externs = set([param['extern'] for param in self.data['parameter', 'infos']])
+        channels = (self.data.get('telemetry') or {}).get('channels') or []  # 遥测通道
+        externs = dict.fromkeys([param['extern'] for param in self.data['parameter', 'infos']]
+                                + [ch['extern'] for ch in channels if ch.get('extern')])  # 去重并保持顺序
         max_len = max(len(alias) for alias in aliases)
         shortcut_definitions = [sc['define'] for sc in self.data['shortcut']]
         shortcut_function_name = [re.findall(r'(?<=\s)\w+(?=\()', sd)[0] for sd in shortcut_definitions]
         shortcut_param_type = [re.findall(r'\w+(?=\s\w+=)', defi) for defi in shortcut_definitions]
         MAX_PARAM_NUMBER = max(len(s) for s in shortcut_param_type)
+        binary = self.protocol == 'binary'
         # ic(shortcut_param_type)
         match fn:
             # -------------------------------------------- main.c ------------------------------------------------
@@ -253,6 +741,7 @@ int main()
 #define __SERIAL_ORDER_H__
 
 #include <string.h>
+#include <stdlib.h>
 {CHAR_N.join(f'#include "{h}"' for h in self.data['initial','includes'])}
 
 #define IS_SERIAL_DEBUGGING SERIAL_NOT_DEBUG // SERIAL_DEBUGGING // 是否正在调试串口
@@ -271,8 +760,9 @@ int main()
         }}                                            \
     }}
 
-#define SERIAL_READBUFF_SIZE 100 // 串口读取缓冲
-#define SERIAL_SENDBUFF_SIZE 100 // 串口输出缓冲
+#define SERIAL_READBUFF_SIZE {SERIAL_READBUFF_SIZE} // 串口读取缓冲
+#define SERIAL_SENDBUFF_SIZE {max(100, 16 * len(channels) + 32)} // 串口输出缓冲，需要容纳一帧遥测数据
+#define SERIAL_MATCH_BUFF_SIZE {serial_match_buff_size(len(aliases))} // 命令匹配缓冲，需要容纳全部参数的批量命令
 
 // @brief 串口发送字符串
 // @param string_ 要发送的字符串
@@ -311,16 +801,16 @@ enum debug_flag
 // 快捷指令枚举
 enum shortcut
 {{
-    SC_None = -1,        // 没有匹配到指令时的缺省值
-    SC_SetParameterValue // 设置全局参数值得快捷指令
+    SC_SyncSequence = -3,        // 可靠模式下同步序号的指令
+    SC_BatchParameterValue = -2, // 批量设置全局参数值的指令
+    SC_None = -1,                // 没有匹配到指令时的缺省值
+    SC_SetParameterValue         // 设置全局参数值得快捷指令
 }};
 
 // 可供调用的全局参数枚举
 enum global_param
 {{
-    PM_ABC, // ABC的title
-    PM_DEF  // DEF的title
-}};
+{''.join(f'    PM_{info["alias"]}, // {info["title"]}{CHAR_N}' for info in self.data['parameter', 'infos'])}}};
 
 // 用于存储不同类型的参数值，需要某种类型就调用对应的类型
 union type_param
@@ -348,7 +838,10 @@ enum shortcut process_information(const char *uart_buff, const int uart_len);
 /// @param param 参数索引枚举
 /// @param value 设置的参数值
 void SetParameterValue(enum global_param param, float value); // 设置全局参数的数值
-
+{'''
+/// @brief 按yaml中telemetry的通道顺序上报一帧数据
+void ReportTelemetry(void);
+''' if channels else ''}
 extern char VAR_print_buff[SERIAL_SENDBUFF_SIZE]; // 重定向输出缓冲区
 extern union type_param {', '.join(f"TPp{i}" for i in range(MAX_PARAM_NUMBER))};               // 存储命令的参数
 
@@ -356,60 +849,35 @@ extern union type_param {', '.join(f"TPp{i}" for i in range(MAX_PARAM_NUMBER))};
 #endif"""[1:]
             # -------------------------------------------- func.c ------------------------------------------------
             case 'serial_order.c':
-                code = rf"""
-#include "serial_order.h"
-
-char VAR_print_buff[SERIAL_SENDBUFF_SIZE];
-union type_param {', '.join(f"TPp{i}" for i in range(MAX_PARAM_NUMBER))};
-
-// 暂时 只进行匹配单个字符，后续再添加kmp算法
-int strIndex(const char *src, const char tar)
-{{
-    int i, find = 0, len = (int)strlen(src);
-    for (i = 0; i < len; i++)
-    {{
-        if (src[i] == tar)
-        {{
-            find = 1;
-            break;
-        }}
-    }}
-    if (!find)
-    {{
-        i = -1;
-    }}
-    return i;
-}}
-
-void SetParameterValue(enum global_param param, float value)
-{{
-    switch (param)
-    {{
-    {''.join(f'''case PM_{alias}: 
-        DEF_{alias} = value; serial_printf("SET {alias}=%g{CHAR_N_}", DEF_{alias}); break;
-    ''' for alias in aliases)}default:
-        serial_printf("[Warn] Unknow param id=[%d]\n", param); break;
-    }}
-}}
-
+                if binary:
+                    process_code = self._coding_binary_process(shortcut_definitions, shortcut_function_name)
+                else:
+                    process_code = rf"""
 enum shortcut process_information(const char *uart_buff, const int uart_len)
 {{
     // 这个static声明是必要的，其他的static声明是非必要的。
-    static char match_buff[100] = "START"; // 静态存储缓冲
+    static char match_buff[SERIAL_MATCH_BUFF_SIZE] = "START"; // 静态存储缓冲
     static int buff_len;                   // 缓冲字符串的长度
     static int i, index;                   // 无特殊含义
     enum shortcut ot = SC_None;            // 指令类型
+    char *ptr, *end;                       // 批量命令的解析位置
+    int param;                             // 批量命令中的参数索引
+    float value;                           // 批量命令中的参数值
+    int seq, state;                        // 可靠模式的序号及其状态
 
     buff_len = (int)strlen(match_buff);
     
     debug_println("raw & new\t:\"%s\",\"%s\"", match_buff, uart_buff);
 
-    if (buff_len + uart_len >= 100)
+    if (buff_len + uart_len >= SERIAL_MATCH_BUFF_SIZE)
     {{
         serial_putstr("[warnning] buff was burst!");
         serial_putstr((const uint8 *)match_buff);
         serial_putstr(" | ");
         serial_putstr((const uint8 *)uart_buff);
+        // 丢弃旧的缓冲，避免越界写入
+        match_buff[0] = '\0';
+        buff_len = 0;
     }}
 
     // 拼接字符串
@@ -441,8 +909,19 @@ enum shortcut process_information(const char *uart_buff, const int uart_len)
         {{ // 若存在'['字符，才进行匹配
             
             sscanf(match_buff, "[%d:", &ot); // 匹配命令类型
-            
-            switch (ot) // 根据类型执行不同的函数
+
+            // 可靠模式的命令以"@序号"结尾
+            index = strIndex(match_buff, ']');
+            for (i = index - 1; i > 0 && match_buff[i] != '{protocol.SEQ_MARK}'; i--)
+                ;
+            seq = (i > 0 && match_buff[i + 1] >= '0' && match_buff[i + 1] <= '9') ? atoi(match_buff + i + 1) : -1;
+            if (ot == SC_SyncSequence)
+            {{
+                VAR_expected_seq = -1; // 重新同步序号
+            }}
+            state = seq < 0 ? SEQ_EXECUTE : sequence_state(seq);
+
+            switch (state == SEQ_EXECUTE ? ot : SC_SyncSequence) // 根据类型执行不同的函数，重复或乱序的命令不执行
             {{
             {f'{CHAR_N}'.join(f'''
             case SC_{sc["alias"]}:
@@ -450,6 +929,34 @@ enum shortcut process_information(const char *uart_buff, const int uart_len)
                 +", ".join(f"&TPp{spts.index(s)}.{s}_" for s in  spts)+');// 获取参数值' if len(spts) > 0 else '// 无需获取参数值'}
                 {sfn}({", ".join(f"TPp{spts.index(s)}.{s}_" for s in  spts)}); // 执行对应事件
                 break;''' for sc,sfn,spts in zip(self.data['shortcut'],shortcut_function_name,shortcut_param_type))}
+
+            case SC_BatchParameterValue: // [-2:索引,数值;索引,数值;...]
+                ptr = strchr(match_buff, ':');
+                if (ptr == NULL || (index >= 0 && ptr > match_buff + index)) // 没有':'或':'属于之后的命令
+                {{
+                    debug_println("match None %c",' ');
+                    serial_putstr("#");
+                    ot = SC_None;
+                    break;
+                }}
+                ptr++;
+                while (*ptr != ']' && *ptr != '\0')
+                {{
+                    param = (int)strtol(ptr, &end, 10);
+                    if (end == ptr || *end != ',')
+                        break;
+                    ptr = end + 1;
+                    value = (float)strtod(ptr, &end);
+                    if (end == ptr)
+                        break;
+                    SetParameterValue((enum global_param)param, value);
+                    ptr = (*end == ';') ? end + 1 : end;
+                }}
+                break;
+
+            case SC_SyncSequence: // [-3:@序号]
+                ot = SC_SyncSequence;
+                break;
                 
             default: // 匹配失败
                 debug_println("match None %c",' ');
@@ -457,24 +964,63 @@ enum shortcut process_information(const char *uart_buff, const int uart_len)
                 ot = SC_None;
                 break;
             }}
+            if (seq >= 0 && ot != SC_None && state != SEQ_DROP)
+            {{
+                sequence_ack(seq, state);
+            }}
 
-            // 裁剪字符串[如果匹配成功]
-            if (ot != SC_None)
+            // 裁剪字符串，匹配失败的命令也丢弃，否则会一直停留在缓冲中
+            buff_len = (int)strlen(match_buff);
+            index = strIndex(match_buff, ']') + 1;
+            for (i = 0; i < buff_len - index; i++)
             {{
-                buff_len = (int)strlen(match_buff);
-                index = strIndex(match_buff, ']') + 1;
-                for (i = 0; i < buff_len - index; i++)
-                {{
-                    match_buff[i] = match_buff[i + index];
-                }}
-                match_buff[buff_len - index] = '\0';
-                //DEF_printf("After-cut\t:\"%s\"\n", match_buff);
+                match_buff[i] = match_buff[i + index];
             }}
+            match_buff[buff_len - index] = '\0';
+            //DEF_printf("After-cut\t:\"%s\"\n", match_buff);
         }}
     }}
     return ot;
+}}"""[1:]
+                code = rf"""
+#include "serial_order.h"
+
+char VAR_print_buff[SERIAL_SENDBUFF_SIZE];
+union type_param {', '.join(f"TPp{i}" for i in range(MAX_PARAM_NUMBER))};
+
+// 暂时 只进行匹配单个字符，后续再添加kmp算法
+int strIndex(const char *src, const char tar)
+{{
+    int i, find = 0, len = (int)strlen(src);
+    for (i = 0; i < len; i++)
+    {{
+        if (src[i] == tar)
+        {{
+            find = 1;
+            break;
+        }}
+    }}
+    if (!find)
+    {{
+        i = -1;
+    }}
+    return i;
 }}
 
+void SetParameterValue(enum global_param param, float value)
+{{
+    switch (param)
+    {{
+    {''.join(f'''case PM_{alias}: 
+        DEF_{alias} = value; serial_printf("SET {alias}=%g{CHAR_N_}", DEF_{alias}); break;
+    ''' for alias in aliases)}default:
+        serial_printf("[Warn] Unknow param id=[%d]\n", param); break;
+    }}
+}}
+{self._coding_telemetry(channels)}
+{self._coding_sequence()}
+{process_code}
+
 void manage_serial_port(void)
 {{
     static char VAR_read_buff[SERIAL_READBUFF_SIZE];
@@ -491,6 +1037,23 @@ void manage_serial_port(void)
         serial_putstr(".");
     }}
 }}"""[1:]
+            # -------------------------------------------- headfile.h ------------------------------------------------
+            case 'headfile.h':
+                code = f"""#ifndef __HEADFILE_H__
+#define __HEADFILE_H__
+
+typedef char uint8;
+typedef unsigned short uint16;
+typedef unsigned int uint32;
+
+uint32 wireless_uart_send_buff(uint8 *buff, uint16 len);
+uint32 wireless_uart_read_buff(uint8 *buff, uint32 len);
+
+{f'{CHAR_N}'.join(sc['define'] for sc in self.data['shortcut'])}
+
+{CHAR_N.join(externs)}
+
+#endif"""
             case _:
                 raise ValueError(f'{fn}未被实现')
         return code
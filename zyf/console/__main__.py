@@ -0,0 +1,159 @@
+""" 命令行入口，不依赖PyQt6
+
+>>> python -m zyf.console generate data/*.yaml -o build/
+>>> python -m zyf.console simulate data/test.yaml --baudrate 115200
+>>> python -m zyf.console broadcast COM3=data/axis.yaml COM4=data/axis.yaml --group 1 --baudrate 115200
+"""
+
+import os
+import sys
+import glob
+import time
+import select
+import argparse
+from pathlib import Path
+from . import Console, CodingFiles
+from .config import YamlStyleError
+
+
+def generate(args: argparse.Namespace) -> int:
+    """ 为每个yaml配置生成C代码到`<output>/<yaml文件名>/`下 """
+    paths = []
+    for pattern in args.configs:
+        matched = sorted(glob.glob(pattern))  # Windows的终端不会展开通配符
+        if not matched:
+            print(f'[警告]没有匹配到文件: {pattern}', file=sys.stderr)
+        paths.extend(matched)
+
+    failed = 0
+    for path in paths:
+        console = Console()
+        try:
+            console.data.load(path)
+            written = console.save_codings(Path(args.output) / Path(path).name)
+        except (OSError, YamlStyleError, KeyError, ValueError) as e:
+            print(f'[错误]{path}: {e!r}', file=sys.stderr)
+            failed += 1
+            continue
+        print(f'{path}: 写入{len(written)}个文件，{len(CodingFiles) - len(written)}个未变化')
+    return 1 if failed else 0
+
+
+def simulate(args: argparse.Namespace) -> int:
+    """ 在伪终端上运行模拟固件，主程序连接打印出的设备路径，Ctrl+C结束 """
+    if not hasattr(os, 'openpty'):
+        print('[错误]当前系统没有伪终端，请在脚本中使用sim://串口', file=sys.stderr)
+        return 1
+    import tty
+    from .simulator import FirmwareModel, READ_BUFF_SIZE
+    try:
+        model = FirmwareModel.from_yaml(args.config)
+    except (OSError, YamlStyleError, KeyError, ValueError) as e:
+        print(f'[错误]{args.config}: {e!r}', file=sys.stderr)
+        return 1
+    master, slave = os.openpty()
+    tty.setraw(slave)  # 不回显，不转换换行
+    os.set_blocking(master, False)
+    print(f'{args.config}: 模拟固件({model.protocol})运行在{os.ttyname(slave)}，Ctrl+C结束')
+
+    byte_time = 10 / args.baudrate if args.baudrate else 0  # 每字节10位
+    report_interval = 1 / args.telemetry if args.telemetry and model.telemetry_channels else None
+    next_report = time.monotonic()
+    dropped = 0  # 没有程序读取而丢弃的回复字节数
+
+    def send(data: bytes):
+        nonlocal dropped
+        try:
+            n = os.write(master, data)
+        except BlockingIOError:
+            n = 0
+        dropped += len(data) - n
+        if byte_time:
+            time.sleep(n * byte_time)
+
+    try:
+        while True:
+            now = time.monotonic()
+            timeout = [t for t in (args.period or None, report_interval and next_report - now) if t is not None]
+            readable, _, _ = select.select([master], [], [], max(min(timeout), 0) if timeout else None)
+            if args.period:  # 与固件主循环相同，每个周期读取一次，没有命令时回复'.'
+                data = os.read(master, READ_BUFF_SIZE - 1) if readable else b''
+                send(model.manage_serial_port(data))
+            elif readable:
+                send(model.receive(os.read(master, 4096)))
+            if report_interval and time.monotonic() >= next_report:
+                send(model.report_telemetry())
+                next_report += report_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+    print(f'{model.stats}, 丢弃{dropped}字节')
+    return 0
+
+
+def broadcast(args: argparse.Namespace) -> int:
+    """ 把数值组并行发送到多个串口，打印每个串口的结果和吞吐量 """
+    from .session import SessionManager
+    manager = SessionManager()
+    for spec in args.sessions:
+        port, sep, config = spec.partition('=')
+        if not sep or not port or not config:
+            print(f'[错误]应为<串口>=<yaml>的形式，而不是{spec!r}', file=sys.stderr)
+            return 1
+        try:
+            manager.add(port, config, port=port, baudrate=args.baudrate)
+        except (OSError, YamlStyleError, KeyError, ValueError) as e:
+            print(f'[错误]{config}: {e!r}', file=sys.stderr)
+            return 1
+    if args.source is not None and args.source not in manager:
+        print(f'[错误]--source应为其中一个串口: {", ".join(manager)}', file=sys.stderr)
+        return 1
+    failed = sum(e is not None for e in manager.open().values())
+    try:
+        if failed < len(manager):
+            opened = [name for name in manager if manager[name].serial.is_open]
+            results = manager.broadcast_group(args.group, source=args.source, names=opened, timeout=args.timeout)
+            for name, result in results.items():
+                state = '送达' if result.error is None else f'失败 {result.error!r}'
+                print(f'{name}: {state}, {result.latency * 1000:.1f} ms, {result.order}')
+                failed += result.error is not None
+        for stats in manager.stats().values():
+            print(stats)
+    finally:
+        manager.close()
+    return 1 if failed else 0
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m zyf.console', description='串口调参协议的命令行工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_generate = subparsers.add_parser('generate', help='根据yaml配置生成C代码')
+    parser_generate.add_argument('configs', nargs='+', help='yaml配置文件，支持通配符')
+    parser_generate.add_argument('-o', '--output', default='./build', help='输出文件夹(默认./build)')
+    parser_generate.set_defaults(func=generate)
+
+    parser_simulate = subparsers.add_parser('simulate', help='在伪终端上运行模拟固件')
+    parser_simulate.add_argument('config', help='yaml配置文件')
+    parser_simulate.add_argument('-b', '--baudrate', type=int, default=0, help='按波特率限制回复速度(默认不限制)')
+    parser_simulate.add_argument('-p', '--period', type=float, default=0,
+                                 help='固件主循环的周期(s)，默认0为收到数据立即回复')
+    parser_simulate.add_argument('-t', '--telemetry', type=float, default=0, help='上报遥测帧的频率(Hz)')
+    parser_simulate.set_defaults(func=simulate)
+
+    parser_broadcast = subparsers.add_parser('broadcast', help='把数值组并行发送到多个串口')
+    parser_broadcast.add_argument('sessions', nargs='+', help='<串口>=<yaml>，串口也可以是pyserial的URL')
+    parser_broadcast.add_argument('-g', '--group', type=int, default=0, help='数值组的索引(默认0)')
+    parser_broadcast.add_argument('-s', '--source', help='把这个串口的配置中的数值组发送到全部串口，默认各自发送')
+    parser_broadcast.add_argument('-b', '--baudrate', type=int, default=115200, help='波特率(默认115200)')
+    parser_broadcast.add_argument('-t', '--timeout', type=float, default=5.0, help='等待送达的最长时间(s)')
+    parser_broadcast.set_defaults(func=broadcast)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
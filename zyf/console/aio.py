@@ -0,0 +1,314 @@
+""" 基于asyncio的串口传输，不依赖Qt和线程
+
+>>> async with AsyncTransport(console) as transport:
+...     await transport.send_param('ABC', 1.5)
+...     reply = await transport.request('[1:0]', re.compile(rb'^ok'), timeout=0.5)
+...     async for frame in transport.read_frames():
+...         ...
+
+串口有文件描述符时(POSIX)通过`loop.add_reader`在可读时读取，
+否则(如Windows、`loop://`)以`poll_interval`的间隔轮询`in_waiting`。
+接收的数据按`sep`分割为帧，`read_frames`和`request`得到的都是不含分隔符的帧。
+使用期间不能同时运行`Console.reader`读取线程。
+不支持可靠模式(yaml中的`setting: reliable:`)，没有ACK和重发，写入成功即算送达。
+"""
+
+import os
+import re
+import asyncio
+import serial as ser
+from typing import AsyncIterator, Callable
+from . import Console, protocol
+from .reader import READ_CHUNK, ReaderStats
+from .recorder import Direction
+
+POLL_INTERVAL = 0.001
+""" 没有文件描述符时轮询串口的间隔(s) """
+
+MAX_PENDING_FRAMES = 4096
+""" 等待`read_frames`取走的帧的上限，超出后丢弃并计数 """
+
+FRAME_SEP = b'\n'
+""" 接收数据中帧的分隔符 """
+
+Matcher = bytes | re.Pattern | Callable[[bytes], bool]
+""" 匹配应答帧的条件
+- `bytes`帧以其开头
+- `re.Pattern`对帧`search`成功
+- 可调用对象返回True"""
+
+
+def _matcher(match: Matcher) -> Callable[[bytes], bool]:
+    if isinstance(match, bytes):
+        return lambda frame: frame.startswith(match)
+    if isinstance(match, re.Pattern):
+        return lambda frame: match.search(frame) is not None
+    return match
+
+
+def _fileno(serial: ser.SerialBase) -> int | None:
+    """ 可以直接读写的文件描述符，没有时返回None """
+    try:
+        return serial.fileno()
+    except (AttributeError, OSError, ser.SerialException):
+        return None
+
+
+class AsyncTransport:
+    """ 串口的asyncio传输
+
+    发送的命令与`Console.make_*_order`相同，与非可靠模式的`Console._deliver`一样写入成功即算送达，
+    之后确认并保存数值；出错时直接抛出异常而不是返回异常对象"""
+
+    def __init__(self, console: Console, *, serial: ser.SerialBase = None, sep: bytes = FRAME_SEP,
+                 poll_interval: float = POLL_INTERVAL, max_pending: int = MAX_PENDING_FRAMES) -> None:
+        """ ## Parameter
+        `console`后端控制台，使用其yaml配置和串口
+        `serial`使用其他串口对象(如`serial_for_url('loop://')`)，缺省为`console.serial`
+        `sep`接收数据中帧的分隔符
+        `poll_interval`没有文件描述符时的轮询间隔(s)
+        `max_pending`等待`read_frames`取走的帧的上限"""
+        self.console = console
+        self.serial = console.serial if serial is None else serial
+        self.sep = sep
+        self.poll_interval = poll_interval
+        self.stats = ReaderStats()  # chunks为接收的数据块，dropped为丢弃的帧
+        self._max_pending = max_pending
+        self._buffer = bytearray()  # 尚未分割为帧的数据
+        self._frames: asyncio.Queue[bytes | None] = None
+        self._waiters: list[tuple[Callable[[bytes], bool], asyncio.Future]] = []
+        self._loop: asyncio.AbstractEventLoop = None
+        self._fd: int | None = None  # 已经注册add_reader的文件描述符
+        self._poll_task: asyncio.Task = None
+        self._opened_serial = False  # 串口是否由本对象打开
+        self._saved_timeout: float | None = None  # 打开前串口的读取超时，关闭时恢复
+
+    @property
+    def is_open(self) -> bool:
+        return self._loop is not None
+
+    async def open(self):
+        """ 打开串口(如果尚未打开)并开始接收 """
+        if self.is_open:
+            return
+        if self.console.reader.is_running:
+            raise RuntimeError('Console的读取线程正在运行，不能同时使用AsyncTransport')
+        self._check_unreliable()
+        if not self.serial.is_open:
+            self.serial.open()
+            self._opened_serial = True
+        self._saved_timeout = self.serial.timeout
+        self.serial.timeout = 0  # 只读取已经到达的数据
+        self._loop = asyncio.get_running_loop()
+        self._frames = asyncio.Queue(self._max_pending)
+        fd = _fileno(self.serial)
+        if fd is not None:
+            try:
+                self._loop.add_reader(fd, self._on_readable)
+                self._fd = fd
+            except NotImplementedError:  # Windows的ProactorEventLoop
+                pass
+        if self._fd is None:
+            self._poll_task = self._loop.create_task(self._poll())
+
+    async def close(self):
+        """ 停止接收，关闭由本对象打开的串口；正在等待的`read_frames`随之结束 """
+        if not self.is_open:
+            return
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        self._finish(ConnectionError('串口传输已关闭'))
+        self._loop = None
+        self.serial.timeout = self._saved_timeout  # 之后Console的读取线程仍按原来的超时读取
+        if self._opened_serial:
+            self.serial.close()
+            self._opened_serial = False
+
+    async def __aenter__(self) -> 'AsyncTransport':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # <接收>
+
+    def _on_readable(self):
+        try:
+            data = self.serial.read(max(self.serial.in_waiting, 1))
+        except (ser.SerialException, OSError) as e:
+            self._read_failed(e)
+            return
+        if data:
+            self._feed(data)
+
+    async def _poll(self):
+        while True:
+            try:
+                waiting = self.serial.in_waiting
+                data = self.serial.read(min(waiting, READ_CHUNK)) if waiting else b''
+            except (ser.SerialException, OSError, TypeError, AttributeError) as e:
+                self._read_failed(e)
+                return
+            if data:
+                self._feed(data)
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    def _read_failed(self, e: Exception):
+        """ 串口被关闭或拔出时停止接收 """
+        self.stats.errors += 1
+        print(f'[警告]串口接收停止: {e}')
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        self._finish(e)
+
+    def _finish(self, e: Exception):
+        """ 结束全部等待中的应答和`read_frames` """
+        for _, future in self._waiters:
+            if not future.done():
+                future.set_exception(e)
+        self._waiters.clear()
+        try:
+            self._frames.put_nowait(None)
+        except asyncio.QueueFull:
+            self._frames.get_nowait()  # 丢弃最旧的一帧给结束标记让位
+            self.stats.dropped_chunks += 1
+            self._frames.put_nowait(None)
+
+    def _feed(self, data: bytes):
+        """ 把接收的数据分割为帧 """
+        self.console._record(Direction.RECV, data)
+        self.stats.bytes_read += len(data)
+        self.stats.chunks_read += 1
+        self._buffer += data
+        start = 0
+        while (end := self._buffer.find(self.sep, start)) >= 0:
+            self._dispatch(bytes(self._buffer[start:end]))
+            start = end + len(self.sep)
+        if start:
+            del self._buffer[:start]
+
+    def _dispatch(self, frame: bytes):
+        if self._waiters:
+            remaining = []
+            for match, future in self._waiters:
+                if future.done():
+                    continue
+                if match(frame):
+                    future.set_result(frame)
+                else:
+                    remaining.append((match, future))
+            self._waiters = remaining
+        try:
+            self._frames.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.stats.dropped_bytes += len(frame)
+            self.stats.dropped_chunks += 1
+
+    async def read_frames(self) -> AsyncIterator[bytes]:
+        """ 依次得到接收的帧，传输关闭后结束；只应有一个使用者 """
+        while True:
+            frame = await self._frames.get()
+            if frame is None:
+                return
+            yield frame
+
+    async def wait_for(self, match: Matcher, *, timeout: float | None = None) -> bytes:
+        """ 等待下一个满足`match`的帧，超时抛出`TimeoutError` """
+        return await self._wait(self._register(match), timeout)
+
+    def _register(self, match: Matcher) -> asyncio.Future:
+        if not self.is_open:
+            raise ser.PortNotOpenError()
+        future = self._loop.create_future()
+        self._waiters.append((_matcher(match), future))
+        return future
+
+    async def _wait(self, future: asyncio.Future, timeout: float | None) -> bytes:
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiters = [(m, f) for m, f in self._waiters if f is not future]
+
+    # <发送>
+
+    async def write(self, data: bytes):
+        """ 写入原始数据，有文件描述符时以非阻塞方式分段写入 """
+        if not self.is_open:
+            raise ser.PortNotOpenError()
+        fd = self._fd
+        if fd is None:
+            self.serial.write(data)
+        else:
+            view = memoryview(data)
+            while view:
+                try:
+                    n = os.write(fd, view)
+                except BlockingIOError:
+                    n = 0
+                view = view[n:]
+                if view:
+                    await self._writable(fd)
+        self.console._record(Direction.SEND, data)
+
+    async def _writable(self, fd: int):
+        future = self._loop.create_future()
+        self._loop.add_writer(fd, lambda: future.done() or future.set_result(None))
+        try:
+            await future
+        finally:
+            self._loop.remove_writer(fd)
+
+    def _check_unreliable(self):
+        """ 可靠模式下命令要等到ACK才算送达，这里无法确认，拒绝发送而不是提前确认数值 """
+        if self.console.data.get(('setting', 'reliable')):
+            raise RuntimeError('AsyncTransport不支持可靠模式(setting: reliable:)，请使用Console发送')
+
+    async def send_order(self, order: str | bytes) -> str:
+        """ 发送文本命令或二进制帧，返回命令的可读文本 """
+        self._check_unreliable()  # 配置可能在打开之后被修改
+        if isinstance(order, bytes):
+            await self.write(order)
+            return protocol.frame_text(order)
+        await self.write(order.encode(self.console.dct['write encoding']))
+        return order
+
+    async def send_param(self, alias: str, v: float | int) -> str:
+        """ 设置一个参数，写入成功后确认更改数值 """
+        items = [(self.console.data.index_of(alias), v)]
+        order = await self.send_order(self.console._param_order(items))
+        self.console._commit_values(items)
+        return order
+
+    async def send_params(self, values: dict) -> str:
+        """ 在一个命令中设置多个参数{化名: 数值} """
+        items = [(self.console.data.index_of(alias), v) for alias, v in values.items()]
+        order = await self.send_order(self.console._param_order(items, batch=True))
+        self.console._commit_values(items)
+        return order
+
+    async def send_shortcut(self, shortcut_id: int) -> str:
+        """ 执行快捷指令 """
+        return await self.send_order(self.console._shortcut_order(shortcut_id))
+
+    async def request(self, order: str | bytes, match: Matcher, *, timeout: float | None = 1.0) -> bytes:
+        """ 发送命令并等待满足`match`的应答帧，超时抛出`TimeoutError`
+
+        在发送之前开始等待，不会漏掉很快到达的应答"""
+        future = self._register(match)
+        try:
+            await self.send_order(order)
+        except BaseException:
+            self._waiters = [(m, f) for m, f in self._waiters if f is not future]
+            raise
+        return await self._wait(future, timeout)
@@ -1,14 +1,85 @@
+import os
 import yaml
-from icecream import ic
-import pprint
+import hashlib
+import atexit
+import tempfile
+import weakref
+import threading
+from copy import deepcopy
+from collections import OrderedDict
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:  # 没有libyaml时使用纯Python的实现
+    from yaml import SafeLoader, SafeDumper
+from .schema import PROJECT_VERSION, SchemaError, validate
+
+DUMP_DELAY = 0.5  # 延迟保存的合并窗口(s)，窗口内的修改只写入一次
+PARSED_CACHE_SIZE = 8  # 缓存最近解析过的文件个数，切换历史记录时不必重新解析
+
+_parsed_cache: OrderedDict[str, tuple[tuple[int, int], str, dict]] = OrderedDict()  # 绝对路径 -> ((mtime_ns, size), 摘要, 数据)
+_parsed_lock = threading.Lock()
+
+
+def _file_key(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _read_yaml(path: str) -> tuple[dict, str, tuple[int, int]]:
+    """ 解析yaml文件，返回数据、文件内容的摘要及(mtime_ns, size)，文件没有变化时返回缓存的副本 """
+    path = os.path.abspath(path)
+    key = _file_key(path)
+    with _parsed_lock:
+        cached = _parsed_cache.get(path)
+        if cached is not None and cached[0] == key:
+            _parsed_cache.move_to_end(path)
+            return deepcopy(cached[2]), cached[1], key
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    data, digest = yaml.load(text, Loader=SafeLoader), _digest(text)
+    _remember(path, key, digest, deepcopy(data))
+    return data, digest, key
+
+
+def _remember(path: str, key: tuple[int, int], digest: str, data: dict):
+    """ 缓存解析结果，`data`不能再被修改 """
+    with _parsed_lock:
+        _parsed_cache[path] = (key, digest, data)
+        _parsed_cache.move_to_end(path)
+        while len(_parsed_cache) > PARSED_CACHE_SIZE:
+            _parsed_cache.popitem(last=False)
+
+
+_pending_configs: weakref.WeakSet['Config'] = weakref.WeakSet()  # 有尚未保存修改的配置，不阻止回收
+_pending_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_pending():
+    """ 退出时保存尚未写入的修改 """
+    with _pending_lock:
+        configs = list(_pending_configs)
+    for config in configs:
+        config.flush()
+
+
+def clear_cache():
+    """ 清空解析缓存 """
+    with _parsed_lock:
+        _parsed_cache.clear()
 
-PROJECT_VERSION = 2  # 程序的版本信息
 
 class YamlStyleError(Exception):
-    """ yaml格式不符合 """
+    """ yaml格式不符合，`errors`为全部的格式错误 """
     
-    def __init__(self, *args: object) -> None:
+    def __init__(self, *args: object, errors: tuple[SchemaError, ...] = ()) -> None:
         super().__init__(*args)
+        self.errors = errors
 
 class Config:
     """ 方便地加载和保存配置文件 """
@@ -17,24 +88,134 @@ class Config:
         """ 初始化，yaml_path可以为空的"""
         self.yaml_path: str
         self._data: dict
+        self._lock = threading.RLock()  # 保护_data，修改与后台保存可能同时发生
+        self._write_lock = threading.Lock()  # 保证同一时间只有一个线程在写文件
+        self._dirty = False  # 是否有尚未保存的修改
+        self._dump_timer: threading.Timer = None
+        self._alias_index: dict[str, int] = {}  # 化名 -> 参数索引
+        self._alias_key = None  # 建立索引时参数列表的(id, 长度)，变化时重建
+        self._tick = 0  # 每次加载或修改时加1，作为`version`
+        self._loaded_tick = 0  # 最近一次加载时的_tick
+        self._changed: dict[tuple, int] = {}  # 路径 -> 该路径或其下最近一次修改时的_tick
+        self._replaced: dict[tuple, int] = {}  # 路径 -> 整体被赋值时的_tick
+        self._digest: str | None = None  # 加载的文件内容的摘要，修改后为None
+        self._file_key: tuple[int, int] | None = None  # 最近一次读写时文件的(mtime_ns, size)，用于区分外部修改
         if yaml_path:
             self.load(yaml_path)
 
     def load(self, yaml_path: str = None):
         """ 通过指定新的配置文件路径来重新加载配置 """
+        self.flush()  # 先保存上一个文件尚未写入的修改
+        self._alias_key = None
+        self._tick += 1
+        self._loaded_tick = self._tick
+        self._changed.clear()
+        self._replaced.clear()
         self.yaml_path = yaml_path
-        with open(self.yaml_path, 'r', encoding='utf-8') as f:
-            self._data = yaml.safe_load(f)
-        if self.is_compliant:
-            print(f'[信息]成功加载yaml文件 from {self.yaml_path}')
-        else:
-            raise YamlStyleError('yaml格式错误')
+        self._data, self._digest, self._file_key = _read_yaml(self.yaml_path)
+        errors = self.errors
+        if errors:
+            for e in errors:
+                print(f'[警告]{e} in {self.yaml_path}')
+            raise YamlStyleError(f'yaml格式错误，共{len(errors)}处', errors=errors)
+        print(f'[信息]成功加载yaml文件 from {self.yaml_path}')
 
     def dump(self, yaml_path: str = None):
         """ 如果未指定另存路径，则默认保存到原始文件 """
         path = self.yaml_path if yaml_path is None else yaml_path
-        with open(path, 'w', encoding='utf-8') as f:
-            yaml.safe_dump(self._data, f, allow_unicode=True)  # allow_unicode=True 支持中文
+        with self._lock:
+            data = deepcopy(self._data)
+            if yaml_path is None:
+                self._dirty = False
+        self._write(path, data)
+
+    def dump_later(self, delay: float = DUMP_DELAY):
+        """ 标记为已修改，在`delay`秒后由后台线程保存到原始文件
+
+        合并窗口内的多次修改只写入一次，调用方不会被文件读写阻塞"""
+        with self._lock:
+            self._dirty = True
+            with _pending_lock:
+                _pending_configs.add(self)  # 退出时由_flush_pending保存
+            if self._dump_timer is not None:  # 已有等待中的保存，本次修改一并写入
+                return
+            self._dump_timer = threading.Timer(delay, self._dump_pending)
+            self._dump_timer.daemon = True
+            self._dump_timer.start()
+
+    def flush(self):
+        """ 立即保存尚未写入的修改 """
+        with self._lock:
+            if self._dump_timer is not None:
+                self._dump_timer.cancel()
+        self._dump_pending()
+
+    def reload(self):
+        """ 重新读取被外部修改的原始文件，尚未保存的修改被丢弃
+
+        文件无法读取或格式错误时保留原来的数据并抛出异常，无法解析的yaml抛出`YamlStyleError`"""
+        with self._lock:
+            if self._dump_timer is not None:
+                self._dump_timer.cancel()
+                self._dump_timer = None
+            if self._dirty:
+                print(f'[警告]{self.yaml_path}被外部修改，尚未保存的修改被丢弃')
+                self._dirty = False
+            with _pending_lock:
+                _pending_configs.discard(self)
+        old = self._data, self._digest, self._file_key, self._alias_key
+        try:
+            self.load(self.yaml_path)
+        except (OSError, YamlStyleError):
+            self._data, self._digest, self._file_key, self._alias_key = old
+            raise
+        except yaml.YAMLError as e:  # 外部编辑时文件可能暂时不完整
+            self._data, self._digest, self._file_key, self._alias_key = old
+            raise YamlStyleError(f'yaml无法解析: {e}') from e
+
+    @property
+    def is_dirty(self) -> bool:
+        """ 是否有尚未保存的修改 """
+        return self._dirty
+
+    @property
+    def is_changed_on_disk(self) -> bool:
+        """ 原始文件在最近一次加载或保存之后是否被外部修改，文件不存在时为False """
+        with self._write_lock:  # 等待正在进行的保存
+            try:
+                return _file_key(self.yaml_path) != self._file_key
+            except (OSError, TypeError, AttributeError):  # 尚未加载时没有yaml_path
+                return False
+
+    def _dump_pending(self):
+        with self._lock:
+            self._dump_timer = None
+            with _pending_lock:
+                _pending_configs.discard(self)
+            if not self._dirty:
+                return
+            self._dirty = False
+            path, data = self.yaml_path, deepcopy(self._data)
+        self._write(path, data)
+
+    def _write(self, path: str, data: dict):
+        """ 先写入同目录下的临时文件，再替换目标文件，写入中断时不会损坏原文件 """
+        folder, name = os.path.split(os.path.abspath(path))
+        # 先生成文本，无法序列化时还没有创建临时文件；allow_unicode=True 支持中文
+        text = yaml.dump(data, Dumper=SafeDumper, allow_unicode=True)
+        with self._write_lock:
+            fd, tmp = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=folder)
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            key = _file_key(path)
+            _remember(os.path.join(folder, name), key, _digest(text), data)  # data是副本，再次加载时不必重新解析
+            if os.path.join(folder, name) == os.path.abspath(self.yaml_path):
+                self._file_key = key  # 自己保存的不算外部修改
         print(f'Yaml Saved as {path}')
 
     def __getitem__(self, keys: str | tuple):
@@ -49,16 +230,69 @@ class Config:
                 ret = ret[k]
             return ret
 
-    def __setitem__(self, keys, v):
+    def get(self, keys: str | tuple, default=None):
+        """ 与`self[keys]`相同，但是不存在时返回`default` """
+        try:
+            return self[keys]
+        except (KeyError, IndexError, TypeError):
+            return default
+
+    def __setitem__(self, keys: str | tuple, v):
         # pprint.pprint(self._data)
-        obj = self._data
-        # 获取倒数第二个对象的引用
-        for i in keys[:-1]:
-            obj = obj[i]
-        # 对最后一个对象进行赋值
-        obj[keys[-1]] = v
+        keys = (keys,) if isinstance(keys, str) else keys
+        with self._lock:
+            obj = self._data
+            # 获取倒数第二个对象的引用
+            for i in keys[:-1]:
+                obj = obj[i]
+            # 对最后一个对象进行赋值
+            obj[keys[-1]] = v
+            self._digest = None
+            self._invalidate(keys)
         
     
+    def index_of(self, alias: str) -> int:
+        """ 化名对应的参数索引 """
+        try:
+            return self.alias_index[alias]
+        except KeyError:
+            raise KeyError(f'参数`{alias}`不存在于{self.yaml_path}') from None
+
+    def info_of(self, alias: str) -> dict:
+        """ 化名对应的参数信息 """
+        return self['parameter', 'infos', self.index_of(alias)]
+
+    @property
+    def alias_index(self) -> dict[str, int]:
+        """ 化名 -> 参数索引的查找表
+
+        只在加载新文件或参数列表变化(替换或增删)后重建，修改`alias`本身需要通过`self[...] = v`"""
+        infos = self['parameter', 'infos']
+        key = (id(infos), len(infos))
+        if key != self._alias_key:
+            self._alias_index = {info['alias']: i for i, info in enumerate(infos)}
+            self._alias_key = key
+        return self._alias_index
+
+    def version(self, keys: str | tuple) -> int:
+        """ `self[keys]`最近一次变化时的序号，用于以O(1)的代价判断缓存是否失效
+
+        只统计加载和通过`self[...] = v`的修改，与`alias_index`相同，通过引用原地修改时不会变化"""
+        keys = (keys,) if isinstance(keys, str) else keys
+        version = max(self._loaded_tick, self._changed.get(keys, 0))
+        for i in range(1, len(keys)):  # 上层被整体赋值
+            version = max(version, self._replaced.get(keys[:i], 0))
+        return version
+
+    def _invalidate(self, keys: tuple):
+        """ 记录修改的路径，修改了参数信息时使查找表失效 """
+        self._tick += 1
+        for i in range(1, len(keys) + 1):
+            self._changed[keys[:i]] = self._tick
+        self._replaced[keys] = self._tick
+        if keys[0] == 'parameter' and (len(keys) == 1 or keys[1] == 'infos'):
+            self._alias_key = None
+
     @property
     def n_value_group(self) -> int:
         """ 几个数值组 """
@@ -69,65 +303,12 @@ class Config:
         """ 几个参数 """
         return len(self['parameter', 'infos'])
 
+    @property
+    def errors(self) -> tuple[SchemaError, ...]:
+        """ 按`schema.CONFIG_SCHEMA`检查数据，返回全部的格式错误，未修改时按文件内容缓存 """
+        return validate(self._data, self._digest)
+
     @property
     def is_compliant(self) -> bool:
         """ 检查数据的合规性 """
-        compliant = []
-        parameters_len = None
-
-        def is_include(key, dict_) -> bool:
-            """ 检测key是否存在于dict_中，并输出对应的警告提示信息 """
-            flag: bool = True if key in dict_ else False
-            compliant.append(flag)
-            if not flag:
-                print(f'[警告]`{key}` was not included in {self.yaml_path}')
-            return flag
-
-        def is_include2(bool_, warn_='Some errors have occurred') -> bool:
-            """ 检测bool_是否是True，并输出对应的警告提示信息 """
-            flag: bool = bool_
-            compliant.append(flag)
-            if not flag:
-                print(f'[警告]{warn_} in {self.yaml_path}')
-            return flag
-        if is_include('file info', self._data):  # 文件功能地描述
-            is_include('title', self['file info'])
-            is_include('description', self['file info'])
-
-        if is_include('project info', self._data):  # 程序信息的描述
-            if is_include('version', self['project info']):
-                is_include2(int(str(self['project info', 'version']).split('.')[0]) == PROJECT_VERSION)
-
-        if is_include('initial', self._data):  # 串口初始化的描述
-            is_include('includes', self['initial'])
-            is_include('coding', self['initial'])
-        if is_include('parameter', self._data):  # 参数信息的描述
-            if is_include('infos', self['parameter']):  # 参数名字
-                parameters_len = len(self['parameter', 'infos'])
-                for info in self['parameter', 'infos']:
-                    is_include('title', info)
-                    is_include('description', info)
-                    is_include('extern', info)
-                    is_include('define', info)
-                    is_include('alias', info)
-            if is_include('values', self['parameter']):  # 参数数值
-                for value in self['parameter', 'values']:
-                    is_include('title', value)
-                    is_include('description', value)
-                    if is_include('details', value) and not parameters_len is None:
-                        is_include2(parameters_len == len(value['details']),
-                                    f'`{value["title"]}`参数在上下文中的个数不相互一致')
-                        is_include2(all(isinstance(v, (int, float)) for v in value['details']),
-                                    f'`{value["title"]}`参数的类型不完全符合(int,float)')
-        if is_include('setting', self._data):  # 传输配置
-            if is_include('send', self['setting']):
-                is_include('frame head', self['setting', 'send'])
-                is_include('frame tail', self['setting', 'send'])
-            if is_include('recv', self['setting']):
-                is_include('frame head', self['setting', 'recv'])
-                is_include('frame tail', self['setting', 'recv'])
-                
-        is_include('delay_ms',self._data)
-
-        ic(all(compliant))
-        return all(compliant)
+        return not self.errors
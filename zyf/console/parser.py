@@ -0,0 +1,176 @@
+""" 接收数据的流式解析
+
+MCU端(生成的C代码)会回复以下内容:
+- `SET ABC=1.5\n`设置参数后的回显
+- `#`命令匹配失败
+- `.`本次读取没有完整的命令
+- `[warnning] buff was burst!...`、`[Warn] ...`、`[Send Buff Burst]: ...`警告
+- 用户代码以`setting: recv:`的帧头帧尾包围的数据，以及普通的文本行
+
+`FrameParser`逐块接收数据，跨越多次读取的帧保存在`bytearray`中，
+每个帧只做一次正则匹配，连续的`#`和`.`合并为一个计数的帧，不会为每个字节创建对象。
+
+>>> parser = FrameParser.from_setting(console.data.get('setting'))
+>>> for frame in parser.feed(chunk):
+...     if frame.kind is FrameKind.SET:
+...         alias, value = frame.payload
+"""
+
+import re
+import enum
+from typing import Any, Iterable, Iterator, NamedTuple
+
+MAX_FRAME = 4096
+""" 未完成的帧的最大长度(字节)，超出后作为文本输出 """
+
+WARNING_PREFIXES = (b'[warnning]', b'[Warn]', b'[Send Buff Burst]')
+""" MCU端警告信息的开头 """
+
+
+class FrameKind(enum.Enum):
+    """ 帧的类型 """
+    TEXT = 'text'  # 普通文本行，payload为bytes(不含换行)
+    SET = 'set'  # 参数回显，payload为(化名, 数值)
+    FRAMED = 'framed'  # 帧头帧尾之间的数据，payload为bytes(不含帧头帧尾)
+    WARNING = 'warning'  # MCU端的警告，payload为bytes
+    NOMATCH = 'nomatch'  # 连续的`#`，payload为个数
+    IDLE = 'idle'  # 连续的`.`，payload为个数
+
+
+class Frame(NamedTuple):
+    kind: FrameKind
+    payload: Any
+
+
+class ParserStats:
+    """ 解析的统计信息 """
+
+    def __init__(self) -> None:
+        self.bytes_fed = 0  # 输入的总字节数
+        self.frames = 0  # 输出的帧数
+        self.idle = 0  # `.`的个数
+        self.nomatch = 0  # `#`的个数
+        self.overflows = 0  # 超过`MAX_FRAME`而强制输出的次数
+
+    def __repr__(self) -> str:
+        return (f'ParserStats(bytes_fed={self.bytes_fed}, frames={self.frames}, idle={self.idle}, '
+                f'nomatch={self.nomatch}, overflows={self.overflows})')
+
+
+def _pattern(head: bytes, tail: bytes) -> re.Pattern:
+    warn = b'|'.join(re.escape(p) for p in WARNING_PREFIXES)
+    return re.compile(
+        rb'(?P<idle>\.+)'
+        rb'|(?P<nomatch>#+)'
+        rb'|SET (?P<alias>[^=\n]+)=(?P<value>[^\n]*)\n'
+        rb'|(?P<warn>(?:' + warn + rb')[^\n]*)\n'
+        rb'|' + re.escape(head) + rb'(?P<framed>[^\n]*?)' + re.escape(tail) +
+        rb'|(?P<text>[^\n]*)\n')
+
+
+class FrameParser:
+    """ 接收数据的增量解析器
+
+    `feed`输入任意切分的数据块，返回其中完整的帧；不完整的部分留待下一次输入"""
+
+    def __init__(self, head: bytes = b'[', tail: bytes = b']', *, max_frame: int = MAX_FRAME) -> None:
+        """ ## Parameter
+        `head`,`tail`用户数据的帧头和帧尾
+        `max_frame`未完成的帧的最大长度"""
+        if not head or not tail:
+            raise ValueError('帧头和帧尾不能为空')
+        self.head = head
+        self.tail = tail
+        self.max_frame = max_frame
+        self.stats = ParserStats()
+        self._pattern = _pattern(head, tail)
+        self._buffer = bytearray()
+
+    @classmethod
+    def from_setting(cls, setting: dict | None, *, encoding: str = 'utf-8', **kwargs) -> 'FrameParser':
+        """ 使用yaml中`setting: recv:`的帧头和帧尾 """
+        recv = (setting or {}).get('recv') or {}
+        return cls(str(recv.get('frame head', '[')).encode(encoding),
+                   str(recv.get('frame tail', ']')).encode(encoding), **kwargs)
+
+    @property
+    def pending(self) -> int:
+        """ 尚未组成完整帧的字节数 """
+        return len(self._buffer)
+
+    def feed(self, data: bytes | bytearray | memoryview) -> list[Frame]:
+        """ 输入一块数据，返回其中完整的帧 """
+        self.stats.bytes_fed += len(data)
+        self._buffer += data
+        frames = self._parse()
+        if len(self._buffer) > self.max_frame:  # 迟迟没有结束的帧，作为文本输出
+            self.stats.overflows += 1
+            frames.extend(self.flush())
+        return frames
+
+    def flush(self) -> list[Frame]:
+        """ 输出剩余的数据，不完整的部分作为文本，用于数据流结束或长时间空闲时 """
+        frames = self._parse(final=True)
+        if self._buffer:
+            frames.append(self._text(bytes(self._buffer).rstrip(b'\r')))
+            self._buffer.clear()
+            self.stats.frames += 1
+        return frames
+
+    def _parse(self, final=False) -> list[Frame]:
+        buffer, match, frames = self._buffer, self._pattern.match, []
+        pos, end = 0, len(buffer)
+        last_line_end = buffer.rfind(b'\n')  # 之后的数据还没有换行
+        while pos < end:
+            m = match(buffer, pos)
+            if m is None:
+                break
+            group = m.lastgroup
+            if group == 'idle' or group == 'nomatch':
+                if m.end() == end and not final:
+                    break  # 可能还有后续的同类字符，等待下一次输入再合并
+                n = m.end() - pos
+                if group == 'idle':
+                    self.stats.idle += n
+                    frames.append(Frame(FrameKind.IDLE, n))
+                else:
+                    self.stats.nomatch += n
+                    frames.append(Frame(FrameKind.NOMATCH, n))
+            elif group == 'value':
+                try:
+                    frames.append(Frame(FrameKind.SET, (m['alias'].decode('ascii', 'replace').strip(),
+                                                        float(m['value']))))
+                except ValueError:
+                    frames.append(Frame(FrameKind.TEXT, m.group(0)[:-1].rstrip(b'\r')))
+            elif group == 'warn':
+                frames.append(Frame(FrameKind.WARNING, m['warn'].rstrip(b'\r')))
+            elif group == 'framed':
+                if not final and pos > last_line_end and self._maybe_warning(buffer, pos):
+                    break  # 可能是尚未收到换行的警告，等待下一次输入
+                frames.append(Frame(FrameKind.FRAMED, m['framed']))
+            else:
+                text = m['text'].rstrip(b'\r')
+                if text:
+                    frames.append(self._text(text))
+            pos = m.end()
+        if pos:
+            del buffer[:pos]
+        self.stats.frames += len(frames)
+        return frames
+
+    @staticmethod
+    def _maybe_warning(buffer: bytearray, pos: int) -> bool:
+        """ `pos`处是警告的开头(或其一部分) """
+        return any(prefix.startswith(buffer[pos:pos + len(prefix)]) for prefix in WARNING_PREFIXES)
+
+    @staticmethod
+    def _text(text: bytes) -> Frame:
+        if text.startswith(WARNING_PREFIXES):
+            return Frame(FrameKind.WARNING, text)
+        return Frame(FrameKind.TEXT, text)
+
+    def frames(self, chunks: Iterable[bytes | memoryview]) -> Iterator[Frame]:
+        """ 依次解析多个数据块，结束时输出剩余的数据 """
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.flush()
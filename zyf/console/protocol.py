@@ -0,0 +1,158 @@
+import struct
+from typing import Literal
+
+ProtocolModes = Literal['ascii', 'binary']
+""" 命令的编码方式，在yaml的`setting: protocol:`中选择，缺省为`ascii`
+- `ascii`文本命令，如`[0:3,1.25]`
+- `binary`定长二进制帧，见`encode_frame`"""
+
+SYNC_BYTE = 0xA5
+""" 二进制帧的同步字节 """
+
+FRAME_SIZE = 8
+""" 二进制帧的长度: 同步(1) + 类型(1) + 索引(1) + 数值(4) + CRC(1) """
+
+MAX_BATCH = 0xFF
+""" 一个批量帧中最多的参数个数 """
+
+CRC8_POLY = 0x07
+""" CRC-8的生成多项式 x^8+x^2+x+1 """
+
+TYPE_VALUE, TYPE_SHORTCUT, TYPE_BATCH, TYPE_SEQ, TYPE_SYNC = range(5)
+""" 帧类型
+- `TYPE_VALUE`设置参数，数值为float32
+- `TYPE_SHORTCUT`执行快捷指令，数值为int32
+- `TYPE_BATCH`批量设置参数，索引位置为参数个数，之后是(索引, float32)的序列
+- `TYPE_SEQ`可靠模式下紧接着的下一帧的序号，在索引位置
+- `TYPE_SYNC`可靠模式下同步序号，MCU此后期望索引位置的序号+1"""
+
+SEQ_MODULO = 256
+""" 可靠模式的序号范围，序号在二进制帧中占一个字节 """
+
+SEQ_MARK = '@'
+""" 可靠模式下文本命令末尾的序号标记，如`[0:3,1.25@17]` """
+
+ACK_TAG = 'ACK:'
+""" MCU回复的ACK在`setting: recv:`的帧头帧尾之间，如`[ACK:17]` """
+
+ORDER_SYNC = -3
+""" 文本模式下同步序号的命令类型`[-3:@序号]`，对应C代码中的`SC_SyncSequence` """
+
+_HEAD = struct.Struct('<BBB')
+_ITEM = struct.Struct('<Bf')
+_FLOAT = struct.Struct('<f')
+_INT = struct.Struct('<i')
+_ACK = ACK_TAG.encode('ascii')
+
+
+def _make_crc8_table() -> bytes:
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC8_POLY) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+_CRC8_TABLE = _make_crc8_table()
+
+
+def crc8(data: bytes | bytearray | memoryview) -> int:
+    """ 计算CRC-8(初值0，不反转)，与生成的C代码`frame_crc8`一致 """
+    crc = 0
+    for b in data:
+        crc = _CRC8_TABLE[crc ^ b]
+    return crc
+
+
+def protocol_mode(setting: dict | None) -> ProtocolModes:
+    """ 从yaml的`setting`块中读取编码方式 """
+    mode = (setting or {}).get('protocol', 'ascii')
+    if mode not in ('ascii', 'binary'):
+        raise ValueError(f'未知的编码方式`{mode}`，只能是ascii或binary')
+    return mode
+
+
+def encode_frame(type_: int, index: int, payload: bytes) -> bytes:
+    """ 组装二进制帧
+
+    >>> [0xA5][type][index][payload: 4 bytes, little-endian][crc8(type..payload)]"""
+    if not 0 <= index <= 0xFF:
+        raise ValueError(f'索引{index}超出了二进制帧的范围(0~255)')
+    body = _HEAD.pack(SYNC_BYTE, type_, index) + payload
+    return body + bytes((crc8(body[1:]),))
+
+
+def encode_param(index: int, value: float | int) -> bytes:
+    """ 设置参数的二进制帧，数值以IEEE-754 float32传输 """
+    return encode_frame(TYPE_VALUE, index, _FLOAT.pack(value))
+
+
+def encode_shortcut(shortcut_id: int, value: int = 0) -> bytes:
+    """ 执行快捷指令的二进制帧，数值以int32传输 """
+    return encode_frame(TYPE_SHORTCUT, shortcut_id, _INT.pack(value))
+
+
+def tag_sequence(order: str | bytes, seq: int) -> str | bytes:
+    """ 可靠模式下给命令加上序号: 文本命令在`]`之前加`@序号`，二进制帧之前加一个`TYPE_SEQ`帧 """
+    if isinstance(order, bytes):
+        return encode_frame(TYPE_SEQ, seq, bytes(4)) + order
+    if not order.endswith(']'):
+        raise ValueError(f'不是完整的命令: {order!r}')
+    return f'{order[:-1]}{SEQ_MARK}{seq}]'
+
+
+def sync_order(seq: int, binary: bool) -> str | bytes:
+    """ 同步序号的命令，MCU执行后回复`seq`的ACK并期望下一个序号为`seq + 1` """
+    if binary:
+        return encode_frame(TYPE_SYNC, seq, bytes(4))
+    return f'[{ORDER_SYNC}:{SEQ_MARK}{seq}]'
+
+
+def parse_ack(payload: bytes | bytearray) -> int | None:
+    """ 帧头帧尾之间的内容为ACK时返回其序号 """
+    if payload.startswith(_ACK) and payload[len(_ACK):].isdigit():
+        return int(payload[len(_ACK):])
+    return None
+
+
+def batch_frame_size(n: int) -> int:
+    """ 含有`n`个参数的批量帧的长度 """
+    return _HEAD.size + _ITEM.size * n + 1
+
+
+def encode_batch(items: list[tuple[int, float | int]]) -> bytes:
+    """ 批量设置参数的二进制帧，超过`MAX_BATCH`个参数时拆分为多个帧
+
+    >>> [0xA5][TYPE_BATCH][n][(index, float32) * n][crc8]"""
+    frames = []
+    for i in range(0, len(items), MAX_BATCH):
+        part = items[i:i + MAX_BATCH]
+        body = _HEAD.pack(SYNC_BYTE, TYPE_BATCH, len(part)) + b''.join(_ITEM.pack(k, v) for k, v in part)
+        frames.append(body + bytes((crc8(body[1:]),)))
+    return b''.join(frames)
+
+
+def decode_batch(frame: bytes | bytearray | memoryview) -> list[tuple[int, float]]:
+    """ 解析一个完整的批量帧，返回(索引, 数值)的列表 """
+    if len(frame) < batch_frame_size(0) or frame[0] != SYNC_BYTE or frame[1] != TYPE_BATCH \
+            or len(frame) != batch_frame_size(frame[2]):
+        raise ValueError(f'不是有效的批量帧: {bytes(frame).hex(" ")}')
+    if crc8(frame[1:-1]) != frame[-1]:
+        raise ValueError(f'批量帧校验失败: {bytes(frame).hex(" ")}')
+    return [_ITEM.unpack_from(frame, _HEAD.size + _ITEM.size * i) for i in range(frame[2])]
+
+
+def decode_frame(frame: bytes | bytearray | memoryview) -> tuple[int, int, bytes]:
+    """ 解析一个完整的二进制帧，返回(类型, 索引, 4字节数值) """
+    if len(frame) != FRAME_SIZE or frame[0] != SYNC_BYTE:
+        raise ValueError(f'不是有效的二进制帧: {bytes(frame).hex(" ")}')
+    if crc8(frame[1:-1]) != frame[-1]:
+        raise ValueError(f'二进制帧校验失败: {bytes(frame).hex(" ")}')
+    return frame[1], frame[2], bytes(frame[3:7])
+
+
+def frame_text(frame: bytes) -> str:
+    """ 二进制帧的可读文本，用于显示和记录 """
+    return frame.hex(' ').upper()
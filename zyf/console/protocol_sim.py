@@ -0,0 +1,3 @@
+""" pyserial的URL处理模块，`serial.serial_for_url('sim://<yaml路径>')`打开模拟固件的串口 """
+
+from .simulator import SimulatedSerial as Serial  # noqa: F401
@@ -0,0 +1,113 @@
+import queue
+import threading
+import serial as ser
+from typing import Callable
+
+READ_TIMEOUT = 0.02
+""" 读取线程阻塞等待的超时时间(s)，决定了关闭串口时的最大等待时长 """
+
+READ_CHUNK = 4096
+""" 单次读取的最大字节数 """
+
+MAX_PENDING_CHUNKS = 1024
+""" 等待前端取走的数据块上限，超出后丢弃并计数 """
+
+
+class ReaderStats:
+    """ 读取线程的统计信息，只由读取线程写入 """
+
+    def __init__(self) -> None:
+        self.bytes_read = 0  # 从串口读到的总字节数
+        self.chunks_read = 0  # 从串口读到的数据块个数
+        self.dropped_bytes = 0  # 队列溢出而丢弃的字节数
+        self.dropped_chunks = 0  # 队列溢出而丢弃的数据块个数
+        self.errors = 0  # 读取时发生的异常次数
+
+    def __repr__(self) -> str:
+        return (f'ReaderStats(bytes_read={self.bytes_read}, chunks_read={self.chunks_read}, '
+                f'dropped_bytes={self.dropped_bytes}, dropped_chunks={self.dropped_chunks}, errors={self.errors})')
+
+
+class SerialReader:
+    """ 后台串口读取线程
+
+    在独立线程中阻塞读取串口(带短超时)，把读到的数据块放入有界队列。
+    每次`drain`之后的第一个数据块才会调用`notify`，前端收到通知后用`drain`一次性取走全部数据，
+    因此高速收发时通知的次数远小于数据块的个数。队列满时丢弃新数据并记录在`stats`中。"""
+
+    def __init__(self, serial: ser.Serial, *, notify: Callable[[], None] = None,
+                 max_pending: int = MAX_PENDING_CHUNKS) -> None:
+        """ ## Parameter
+        `serial`已经配置好的串口对象
+        `notify`有新数据时的回调，在读取线程中被调用
+        `max_pending`队列中最多保存的数据块个数"""
+        self.serial = serial
+        self.notify = notify
+        self.stats = ReaderStats()
+        self._queue: queue.Queue[bytes] = queue.Queue(max_pending)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+        self._notified = False  # 已经通知但前端还未取走数据
+        self.listeners: list[Callable[[bytes], None]] = []  # 每个数据块都会在读取线程中调用，用于记录等
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ 开始读取，串口需要已经打开 """
+        if self.is_running:
+            return
+        self.serial.timeout = READ_TIMEOUT
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='SerialReader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """ 停止读取，应在关闭串口之前调用 """
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def drain(self) -> bytes:
+        """ 取走队列中的全部数据，不会阻塞 """
+        self._notified = False  # 先清除标志，保证之后到达的数据一定会再次通知
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return b''.join(chunks)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                # 先阻塞等待至少1个字节，再一次性取走缓冲区中剩余的数据
+                data = self.serial.read(1)
+                if not data:
+                    continue
+                waiting = self.serial.in_waiting
+                if waiting:
+                    data += self.serial.read(min(waiting, READ_CHUNK))
+            except (ser.SerialException, OSError, TypeError, AttributeError) as e:
+                # 串口被关闭或拔出时退出线程
+                self.stats.errors += 1
+                print(f'[警告]串口读取线程退出: {e}')
+                break
+            self.stats.bytes_read += len(data)
+            self.stats.chunks_read += 1
+            for listener in self.listeners:
+                try:
+                    listener(data)
+                except Exception as e:
+                    print(f'[警告]读取线程的回调出错: {e!r}')
+            try:
+                self._queue.put_nowait(data)
+            except queue.Full:
+                self.stats.dropped_bytes += len(data)
+                self.stats.dropped_chunks += 1
+            if not self._notified and self.notify is not None:
+                self._notified = True
+                self.notify()
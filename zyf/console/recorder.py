@@ -0,0 +1,174 @@
+""" 会话记录
+
+`SessionRecorder`把发送的命令和接收的数据块追加写入二进制文件，
+`SessionLog`用`mmap`打开记录并按时间建立索引，不把整个文件读入内存。
+
+文件格式(小端):
+- 文件头`<8sqq`: `MAGIC`, 开始时的`time.time_ns()`, 保留
+- 每条记录`<qBI`: 相对开始的单调时间(ns), 方向(`SEND`/`RECV`), 数据长度，之后是数据
+
+>>> with SessionLog('logs/test-20240101-120000.spmlog') as log:
+...     for frame in log.replay(FrameParser(), start_ns=60 * 10**9):
+...         ...
+"""
+
+import os
+import mmap
+import time
+import enum
+import bisect
+import struct
+import threading
+from array import array
+from pathlib import Path
+from typing import Iterator, NamedTuple
+from .parser import Frame, FrameParser
+
+MAGIC = b'SPMPLOG1'
+""" 记录文件的标识 """
+
+LOG_SUFFIX = '.spmlog'
+""" 记录文件的后缀 """
+
+_HEADER = struct.Struct('<8sqq')
+_RECORD = struct.Struct('<qBI')
+
+
+class Direction(enum.IntEnum):
+    SEND = 0  # 主机 -> MCU
+    RECV = 1  # MCU -> 主机
+
+
+class Record(NamedTuple):
+    t_ns: int  # 相对开始的时间(ns)
+    direction: Direction
+    data: memoryview  # 指向mmap，只在SessionLog关闭前有效
+
+
+class SessionRecorder:
+    """ 追加写入的会话记录，可以在多个线程中同时调用`write` """
+
+    def __init__(self, path: str | Path) -> None:
+        """ `path`记录文件，已经存在时报错，不会覆盖 """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'xb')
+        self._lock = threading.Lock()
+        self._start_ns = time.monotonic_ns()
+        self.records = 0  # 已经写入的记录数
+        self._file.write(_HEADER.pack(MAGIC, time.time_ns(), 0))
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, direction: Direction, data: bytes | bytearray | memoryview):
+        """ 追加一条记录，时间戳为调用时的单调时间 """
+        head = _RECORD.pack(time.monotonic_ns() - self._start_ns, direction, len(data))
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(head)
+            self._file.write(data)
+            self.records += 1
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'SessionRecorder':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SessionLog:
+    """ 只读打开会话记录
+
+    打开时扫描一遍记录头，建立(时间, 偏移)索引，数据本身留在mmap中按需读取。
+    写入中途断电等原因造成的不完整的最后一条记录会被忽略"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f'{self.path}不是会话记录文件')
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.start_time_ns, _ = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{self.path}不是会话记录文件')
+        self._view = memoryview(self._mmap)
+        self._times = array('q')  # 每条记录的时间
+        self._offsets = array('q')  # 每条记录头的偏移
+        self._build_index(size)
+
+    def _build_index(self, size: int):
+        unpack_from, record_size = _RECORD.unpack_from, _RECORD.size
+        times, offsets = self._times, self._offsets
+        pos = _HEADER.size
+        while pos + record_size <= size:
+            t_ns, _, length = unpack_from(self._mmap, pos)
+            if pos + record_size + length > size:
+                break  # 不完整的记录
+            times.append(t_ns)
+            offsets.append(pos)
+            pos += record_size + length
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, i: int) -> Record:
+        pos = self._offsets[i]
+        t_ns, direction, length = _RECORD.unpack_from(self._mmap, pos)
+        start = pos + _RECORD.size
+        return Record(t_ns, Direction(direction), self._view[start:start + length])
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.records()
+
+    @property
+    def duration_ns(self) -> int:
+        """ 第一条到最后一条记录的时长(ns) """
+        return self._times[-1] - self._times[0] if self._times else 0
+
+    def index_at(self, t_ns: int) -> int:
+        """ 第一条时间不早于`t_ns`的记录的序号 """
+        return bisect.bisect_left(self._times, t_ns)
+
+    def records(self, start_ns: int = None, end_ns: int = None, *,
+                direction: Direction | None = None) -> Iterator[Record]:
+        """ 依次得到[start_ns, end_ns)之间的记录，`direction`缺省时包含两个方向 """
+        begin = 0 if start_ns is None else self.index_at(start_ns)
+        stop = len(self) if end_ns is None else self.index_at(end_ns)
+        for i in range(begin, stop):
+            record = self[i]
+            if direction is None or record.direction == direction:
+                yield record
+
+    def replay(self, parser: FrameParser, start_ns: int = None, end_ns: int = None, *,
+               direction: Direction = Direction.RECV) -> Iterator[tuple[int, Frame]]:
+        """ 把一段时间内的数据依次交给`parser`，得到(记录时间, 帧) """
+        for record in self.records(start_ns, end_ns, direction=direction):
+            for frame in parser.feed(record.data):
+                yield record.t_ns, frame
+            record.data.release()
+        for frame in parser.flush():
+            yield (self._times[-1] if self._times else 0), frame
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> 'SessionLog':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,314 @@
+""" 可靠模式: 带序号的命令、ACK和重发
+
+生成的固件按序号执行命令(Go-Back-N): 只执行期望的下一个序号，已经执行过的序号只回复ACK，
+更靠后的序号说明之前的命令丢失，直接丢弃等待重发。每个执行的命令回复`[ACK:序号]`，
+ACK是累积的，收到序号n的ACK说明n及之前的命令都已经执行。
+
+`ReliableLink`在窗口中保存已经发出但还没有确认的命令，窗口未满时继续发送而不必等待上一个ACK；
+最早的命令超时后重发窗口中的全部命令，超时时间按往返时间估计(RFC 6298)并在重发时加倍。
+首次发送前先发送同步命令，使MCU的期望序号与主机一致。
+
+>>> link = ReliableLink(console._serial_write)
+>>> console.reader.listeners.append(link.feed)
+>>> link.submit('[0:1,2.5]', on_done=lambda e: print('applied' if e is None else e))
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable
+from . import protocol
+from .parser import FrameParser, FrameKind
+
+DEFAULT_WINDOW = 8
+""" 缺省最多同时等待ACK的命令数 """
+
+DEFAULT_RETRIES = 5
+""" 缺省最多重发的次数，之后窗口中的命令全部失败 """
+
+INITIAL_RTO, MIN_RTO, MAX_RTO = 1.0, 0.05, 5.0
+""" 重发超时(s)的初值和范围，MCU主循环较慢时往返时间可能有数百毫秒 """
+
+
+class LinkStats:
+    """ 可靠模式的统计信息 """
+
+    def __init__(self) -> None:
+        self.submitted = 0  # 提交的命令数
+        self.acked = 0  # 确认送达的命令数
+        self.failed = 0  # 重发后仍然失败或被取消的命令数
+        self.transmissions = 0  # 写入串口的次数(含重发和同步)
+        self.retransmissions = 0  # 重发的次数
+        self.timeouts = 0  # 超时的次数
+        self.syncs = 0  # 发送同步命令的次数
+        self.stale_acks = 0  # 不在窗口中的ACK(重复的或过时的)
+        self.max_in_flight = 0  # 同时等待ACK的最多命令数
+        self.srtt: float | None = None  # 平滑的往返时间(s)
+
+    def __repr__(self) -> str:
+        srtt = None if self.srtt is None else round(self.srtt * 1000, 2)
+        return (f'LinkStats(submitted={self.submitted}, acked={self.acked}, failed={self.failed}, '
+                f'transmissions={self.transmissions}, retransmissions={self.retransmissions}, '
+                f'timeouts={self.timeouts}, syncs={self.syncs}, stale_acks={self.stale_acks}, '
+                f'max_in_flight={self.max_in_flight}, srtt_ms={srtt})')
+
+
+class _Pending:
+    __slots__ = ('order', 'on_done', 'seq', 'payload', 'size', 'sent_at', 'sends')
+
+    def __init__(self, order: str | bytes, on_done: Callable | None) -> None:
+        self.order = order
+        self.on_done = on_done
+        self.seq = -1
+        self.payload: str | bytes = None  # 带序号的命令
+        self.size = 0
+        self.sent_at = 0.0
+        self.sends = 0  # 写入的次数，重发过的命令不用于估计往返时间
+
+
+class ReliableLink:
+    """ 带序号和ACK的发送窗口
+
+    `write(payload)`写入串口，返回Exception或None；`feed(data)`输入串口读到的数据，通常作为读取线程的监听。
+    `on_done(e)`在命令确认送达(None)或失败(Exception)后调用，可能在读取线程或重发线程中"""
+
+    def __init__(self, write: Callable[[str | bytes], Exception | None], *, window: int = DEFAULT_WINDOW,
+                 window_bytes: int | None = None, retries: int = DEFAULT_RETRIES, rto: float = INITIAL_RTO,
+                 head: bytes = b'[', tail: bytes = b']') -> None:
+        """ ## Parameter
+        `write`实际发送的函数
+        `window`最多同时等待ACK的命令数
+        `window_bytes`等待ACK的命令的总字节数上限，不超过MCU的缓冲时不会溢出；None为不限制
+        `retries`最多重发的次数
+        `rto`重发超时的初值(s)，之后按测得的往返时间调整
+        `head`,`tail`MCU回复ACK使用的帧头和帧尾(`setting: recv:`)"""
+        self._write = write
+        self.stats = LinkStats()
+        self._cond = threading.Condition()
+        self._backlog: deque[_Pending] = deque()  # 窗口已满而尚未发送的命令
+        self._in_flight: deque[_Pending] = deque()  # 按序号排列的等待ACK的命令，可能以同步命令开头
+        self._bytes_in_flight = 0
+        self._next_seq = 0
+        self._synced = False  # MCU的期望序号已经与主机一致
+        self._rttvar = 0.0
+        self._parser = FrameParser(head, tail)
+        self._thread: threading.Thread = None
+        self._closed = False
+        self.configure(window=window, window_bytes=window_bytes, retries=retries, rto=rto)
+
+    def configure(self, *, window: int = DEFAULT_WINDOW, window_bytes: int | None = None,
+                  retries: int = DEFAULT_RETRIES, rto: float = INITIAL_RTO):
+        """ 修改窗口和重发的设置，已经测得往返时间时不再使用`rto` """
+        if not 1 <= window < protocol.SEQ_MODULO // 2:
+            raise ValueError(f'窗口应在1~{protocol.SEQ_MODULO // 2 - 1}之间，而不是{window}')
+        with self._cond:
+            self.window = window
+            self.window_bytes = window_bytes
+            self.retries = retries
+            if self.stats.srtt is None:
+                self.rto = min(max(rto, MIN_RTO), MAX_RTO)
+            self._cond.notify_all()
+
+    def set_frame(self, head: bytes, tail: bytes):
+        """ 修改ACK的帧头和帧尾 """
+        if (head, tail) != (self._parser.head, self._parser.tail):
+            self._parser = FrameParser(head, tail)
+
+    @property
+    def in_flight(self) -> int:
+        """ 已经发送但还没有确认的命令数 """
+        return len(self._in_flight)
+
+    @property
+    def pending(self) -> int:
+        """ 尚未确认的命令数(含窗口已满而尚未发送的) """
+        return len(self._in_flight) + len(self._backlog)
+
+    def submit(self, order: str | bytes, *, on_done: Callable[[Exception | None], None] = None) -> Exception | None:
+        """ 发送命令，收到ACK后调用`on_done(None)`
+
+        窗口未满时立即发送，写入出错时返回异常并且不会调用`on_done`；否则等待之前的命令确认后再发送"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('可靠发送已经关闭')
+            self.stats.submitted += 1
+            item = _Pending(order, on_done)
+            self._backlog.append(item)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ReliableLink', daemon=True)
+                self._thread.start()
+            failed = self._pump()
+        error = None
+        for pending, e in failed:
+            if pending is item:
+                error = e  # 本次提交的命令直接返回异常
+                self.stats.failed += 1
+            else:
+                self._done(pending, e)
+        return error
+
+    def feed(self, data: bytes):
+        """ 输入串口读到的数据，从中找出ACK """
+        if not self._in_flight:
+            return
+        acks = [seq for frame in self._parser.feed(data) if frame.kind is FrameKind.FRAMED
+                for seq in (protocol.parse_ack(frame.payload),) if seq is not None]
+        for seq in acks:
+            self.ack(seq)
+
+    def ack(self, seq: int):
+        """ 确认`seq`及窗口中在其之前的命令 """
+        now = time.monotonic()
+        with self._cond:
+            if not self._in_flight:
+                self.stats.stale_acks += 1
+                return
+            n = (seq - self._in_flight[0].seq) % protocol.SEQ_MODULO + 1
+            if n > len(self._in_flight):
+                self.stats.stale_acks += 1
+                return
+            done = [self._in_flight.popleft() for _ in range(n)]
+            self._bytes_in_flight -= sum(item.size for item in done)
+            if done[-1].sends == 1:  # Karn算法: 重发过的命令的往返时间不确定
+                self._sample_rtt(now - done[-1].sent_at)
+            self._synced = True
+            failed = self._pump()
+            self._cond.notify_all()
+        for item in done:
+            if item.order is not None:  # 同步命令没有回调
+                self.stats.acked += 1
+                self._done(item, None)
+        for item, e in failed:
+            self._done(item, e)
+
+    def reset(self, exception: Exception = None) -> int:
+        """ 取消全部尚未确认的命令并重新同步，如串口关闭时；返回取消的个数 """
+        with self._cond:
+            items = [item for item in (*self._in_flight, *self._backlog) if item.order is not None]
+            self._clear()
+            self._cond.notify_all()
+        e = exception or ConnectionAbortedError('可靠发送被取消')
+        for item in items:
+            self._done(item, e)
+        return len(items)
+
+    def close(self, timeout: float = 1.0):
+        """ 停止重发线程，尚未确认的命令失败 """
+        self.reset()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _clear(self):
+        self._in_flight.clear()
+        self._backlog.clear()
+        self._bytes_in_flight = 0
+        self._synced = False
+
+    def _done(self, item: _Pending, e: Exception | None):
+        if e is not None:
+            self.stats.failed += 1
+        if item.on_done is None:
+            return
+        try:
+            item.on_done(e)
+        except Exception as exc:
+            print(f'[警告]可靠发送的回调出错: {exc!r}')
+
+    def _transmit(self, item: _Pending) -> Exception | None:
+        """ 写入一个命令，需要持有锁，保证线路上的顺序与序号一致 """
+        item.sends += 1
+        item.sent_at = time.monotonic()
+        self.stats.transmissions += 1
+        return self._write(item.payload)
+
+    def _pump(self) -> list[tuple[_Pending, Exception]]:
+        """ 把等待的命令放入窗口并发送，需要持有锁；返回写入出错的命令 """
+        if not self._backlog:
+            return []
+        if not self._synced:
+            if self._in_flight:  # 同步命令还没有确认
+                return []
+            sync = _Pending(None, None)
+            sync.seq = self._next_seq
+            sync.payload = protocol.sync_order(sync.seq, isinstance(self._backlog[0].order, bytes))
+            e = self._enter(sync)
+            if e is not None:  # 串口无法写入，全部失败
+                failed = [(item, e) for item in self._backlog]
+                self._clear()
+                return failed
+            self.stats.syncs += 1
+            return []
+        failed = []
+        while self._backlog and len(self._in_flight) < self.window:
+            item = self._backlog[0]
+            item.seq = self._next_seq
+            item.payload = protocol.tag_sequence(item.order, item.seq)
+            size = _size(item.payload)
+            if self.window_bytes is not None and self._in_flight and self._bytes_in_flight + size > self.window_bytes:
+                break
+            self._backlog.popleft()
+            e = self._enter(item)
+            if e is not None:
+                failed.append((item, e))
+        return failed
+
+    def _enter(self, item: _Pending) -> Exception | None:
+        """ 分配序号后发送并放入窗口 """
+        item.size = _size(item.payload)
+        e = self._transmit(item)
+        if e is not None:
+            return e
+        self._next_seq = (item.seq + 1) % protocol.SEQ_MODULO
+        self._in_flight.append(item)
+        self._bytes_in_flight += item.size
+        self.stats.max_in_flight = max(self.stats.max_in_flight, len(self._in_flight))
+        self._cond.notify_all()
+        return None
+
+    def _sample_rtt(self, rtt: float):
+        """ RFC 6298的往返时间估计 """
+        stats = self.stats
+        if stats.srtt is None:
+            stats.srtt, self._rttvar = rtt, rtt / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(stats.srtt - rtt)
+            stats.srtt = 0.875 * stats.srtt + 0.125 * rtt
+        self.rto = min(max(stats.srtt + 4 * self._rttvar, MIN_RTO), MAX_RTO)
+
+    def _run(self):
+        while True:
+            failed = []
+            with self._cond:
+                while not self._closed and not self._in_flight:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                oldest = self._in_flight[0]
+                delay = oldest.sent_at + self.rto - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)  # 期间可能收到ACK，醒来后重新计算
+                    continue
+                self.stats.timeouts += 1
+                if oldest.sends > self.retries:  # 放弃窗口和等待中的全部命令，下次发送时重新同步
+                    failed = [(item, TimeoutError(f'{self.retries}次重发后仍然没有收到ACK'))
+                              for item in (*self._in_flight, *self._backlog) if item.order is not None]
+                    self._clear()
+                else:
+                    self.rto = min(self.rto * 2, MAX_RTO)
+                    for item in self._in_flight:  # Go-Back-N: MCU丢弃了丢失的命令之后的全部命令
+                        self.stats.retransmissions += 1
+                        e = self._transmit(item)
+                        if e is not None:
+                            failed = [(item, e) for item in (*self._in_flight, *self._backlog)
+                                      if item.order is not None]
+                            self._clear()
+                            break
+            for item, e in failed:
+                self._done(item, e)
+
+
+def _size(payload: str | bytes) -> int:
+    return len(payload) if isinstance(payload, bytes) else len(payload.encode('utf-8'))
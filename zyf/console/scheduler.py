@@ -0,0 +1,200 @@
+""" 发送队列
+
+MCU端每次主循环只处理一个命令，读入的数据先拼接到定长的`match_buff`中，
+连续快速发送(如按住按键、滚动轮盘)时会溢出并回复`[warnning] buff was burst!`。
+
+`SendScheduler`把命令放入队列，由后台线程按字节和帧的令牌桶限速发送；
+同一个键(如同一个参数)尚未发出的命令会被新的命令替换，只发送最新的数值。
+
+>>> scheduler = SendScheduler(console._serial_write, frames_per_s=20, bytes_per_s=11520, burst_bytes=99)
+>>> scheduler.submit('[0:1,2.5]', size=9, key=('param', 1), on_sent=print)
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+DEFAULT_FRAMES_PER_SECOND = 20.0
+""" 缺省每秒最多发送的命令数 """
+
+
+class SchedulerStats:
+    """ 发送队列的统计信息 """
+
+    def __init__(self) -> None:
+        self.submitted = 0  # 放入队列的命令数
+        self.sent = 0  # 已经发送的命令数
+        self.coalesced = 0  # 被同一个键的新命令替换而没有发送的命令数
+        self.bytes_sent = 0  # 已经发送的字节数
+        self.errors = 0  # 发送时返回异常的次数
+        self.max_pending = 0  # 队列的最大长度
+
+    def __repr__(self) -> str:
+        return (f'SchedulerStats(submitted={self.submitted}, sent={self.sent}, coalesced={self.coalesced}, '
+                f'bytes_sent={self.bytes_sent}, errors={self.errors}, max_pending={self.max_pending})')
+
+
+class _Item:
+    __slots__ = ('payload', 'size', 'on_sent')
+
+    def __init__(self, payload: Any, size: int, on_sent: Callable | None) -> None:
+        self.payload = payload
+        self.size = size
+        self.on_sent = on_sent
+
+
+class SendScheduler:
+    """ 限速并合并的发送队列
+
+    `write(payload)`在后台线程中调用，返回Exception或None；
+    `on_sent(payload, e)`在发送后于同一线程中调用"""
+
+    def __init__(self, write: Callable[[Any], Exception | None], *, frames_per_s: float = DEFAULT_FRAMES_PER_SECOND,
+                 bytes_per_s: float | None = None, burst_bytes: int | None = None, burst_frames: int = 1) -> None:
+        """ ## Parameter
+        `write`实际发送的函数
+        `frames_per_s`每秒最多发送的命令数，None为不限制
+        `bytes_per_s`每秒最多发送的字节数，None为不限制
+        `burst_bytes`空闲后可以连续发送的字节数，应不超过MCU端的缓冲，缺省为1秒的字节数
+        `burst_frames`空闲后可以连续发送的命令数"""
+        self._write = write
+        self.stats = SchedulerStats()
+        self._cond = threading.Condition()
+        self._queue: OrderedDict[Hashable, _Item] = OrderedDict()  # 键 -> 命令，按放入的顺序发送
+        self._thread: threading.Thread = None
+        self._closed = False
+        self._sending = False  # 后台线程正在调用write
+        self._serial = 0  # 没有键的命令使用的唯一键
+        self.set_rate(frames_per_s=frames_per_s, bytes_per_s=bytes_per_s,
+                      burst_bytes=burst_bytes, burst_frames=burst_frames)
+
+    def set_rate(self, *, frames_per_s: float | None, bytes_per_s: float | None,
+                 burst_bytes: int | None = None, burst_frames: int = 1):
+        """ 修改限速，令牌桶重新装满 """
+        with self._cond:
+            self.frames_per_s = frames_per_s
+            self.bytes_per_s = bytes_per_s
+            self.burst_frames = max(1, burst_frames)
+            self.burst_bytes = burst_bytes if burst_bytes is not None else (
+                max(1, int(bytes_per_s)) if bytes_per_s else None)
+            self._frame_tokens = float(self.burst_frames)
+            self._byte_tokens = float(self.burst_bytes or 0)
+            self._refilled = time.monotonic()
+            self._cond.notify_all()
+
+    @property
+    def rate(self) -> tuple:
+        """ (frames_per_s, bytes_per_s, burst_bytes, burst_frames) """
+        return self.frames_per_s, self.bytes_per_s, self.burst_bytes, self.burst_frames
+
+    @property
+    def pending(self) -> int:
+        """ 队列中尚未发送的命令数 """
+        return len(self._queue)
+
+    def submit(self, payload: Any, *, size: int, key: Hashable = None,
+               on_sent: Callable[[Any, Exception | None], None] = None) -> bool:
+        """ 放入队列，返回是否替换了同一个键尚未发送的命令
+
+        `size`命令的字节数，用于限速；`key`为None时不会被替换"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('发送队列已经关闭')
+            self.stats.submitted += 1
+            if key is None:
+                self._serial += 1
+                key = (SendScheduler, self._serial)
+            item = self._queue.get(key)
+            if item is not None:  # 保持原来的位置，只更新内容
+                item.payload, item.size, item.on_sent = payload, size, on_sent
+                self.stats.coalesced += 1
+                return True
+            self._queue[key] = _Item(payload, size, on_sent)
+            self.stats.max_pending = max(self.stats.max_pending, len(self._queue))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='SendScheduler', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return False
+
+    def discard(self, key: Hashable) -> bool:
+        """ 取消该键尚未发送的命令 """
+        with self._cond:
+            return self._queue.pop(key, None) is not None
+
+    def clear(self) -> int:
+        """ 取消全部尚未发送的命令，返回取消的个数 """
+        with self._cond:
+            n = len(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+            return n
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """ 等待队列中的命令全部发送，返回是否在超时前完成 """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._sending, timeout)
+
+    def close(self, timeout: float = 1.0):
+        """ 停止后台线程，尚未发送的命令被丢弃 """
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled
+        self._refilled = now
+        if self.frames_per_s:
+            self._frame_tokens = min(self.burst_frames, self._frame_tokens + elapsed * self.frames_per_s)
+        if self.bytes_per_s:
+            self._byte_tokens = min(self.burst_bytes, self._byte_tokens + elapsed * self.bytes_per_s)
+
+    def _delay(self, size: int) -> float:
+        """ 发送`size`字节的命令还需要等待的时间(s) """
+        delay = 0.0
+        if self.frames_per_s and self._frame_tokens < 1:
+            delay = (1 - self._frame_tokens) / self.frames_per_s
+        if self.bytes_per_s:
+            need = min(size, self.burst_bytes)  # 比令牌桶还大的命令在桶满时发送
+            if self._byte_tokens < need:
+                delay = max(delay, (need - self._byte_tokens) / self.bytes_per_s)
+        return delay
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._queue:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._refill(time.monotonic())
+                key, item = next(iter(self._queue.items()))
+                delay = self._delay(item.size)
+                if delay > 0:
+                    self._cond.wait(delay)  # 期间可能被替换、取消或修改限速，醒来后重新计算
+                    continue
+                del self._queue[key]
+                if self.frames_per_s:
+                    self._frame_tokens -= 1
+                if self.bytes_per_s:
+                    self._byte_tokens -= item.size
+                self._sending = True
+            try:
+                e = self._write(item.payload)
+                if item.on_sent is not None:
+                    item.on_sent(item.payload, e)
+            except Exception as exc:
+                e = exc
+                print(f'[警告]发送队列出错: {exc!r}')
+            finally:
+                with self._cond:
+                    self._sending = False
+                    self.stats.sent += 1
+                    self.stats.bytes_sent += item.size
+                    if e is not None:
+                        self.stats.errors += 1
+                    self._cond.notify_all()
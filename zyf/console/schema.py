@@ -0,0 +1,268 @@
+""" yaml配置的格式
+
+`CONFIG_SCHEMA`以嵌套的dict/list声明配置文件应有的结构，导入时编译为一个校验函数，
+`validate`一次遍历文档并返回全部的`SchemaError`。结果按文件内容的摘要缓存，同一个文件再次加载时不再遍历。
+
+- `{键: 子格式}`必须是dict并包含全部的键，多余的键不检查
+- `[子格式]`必须是list，每一项都符合子格式；`ListOf(子格式, min_items)`还限制最少的项数
+- `Optional(子格式)`可以缺省的键，值为null时与缺省相同
+- `ByType({类型: 子格式})`按值的类型选择子格式，如`reliable`可以是`true`或键值对
+- `Leaf`检查单个值，可以访问整个文档(如数值组的个数与参数的个数一致)
+"""
+
+import re
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple
+import threading
+
+PROJECT_VERSION = 2  # 程序的版本信息
+VALIDATION_CACHE_SIZE = 32  # 缓存校验结果的文件个数
+
+KeyPath = tuple[str | int, ...]
+
+
+class SchemaError(NamedTuple):
+    """ 一处格式错误 """
+    path: KeyPath  # 出错的位置，如('parameter', 'values', 0, 'details')
+    message: str
+
+    def __str__(self) -> str:
+        return f'{format_path(self.path)}: {self.message}'
+
+
+def format_path(path: KeyPath) -> str:
+    """ ('parameter', 'values', 0) -> `parameter.values[0]` """
+    text = ''
+    for key in path:
+        text += f'[{key}]' if isinstance(key, int) else f'.{key}' if text else str(key)
+    return text or '<root>'
+
+
+class Leaf:
+    """ 叶子的检查，`check(value, root)`返回错误信息，没有错误时返回None """
+
+    def __init__(self, check: Callable[[Any, dict], str | None] = None) -> None:
+        self.check = check
+
+
+ANY = Leaf()
+""" 只要求存在，不检查数值 """
+
+
+class Optional:
+    """ 可以缺省或为null的键 """
+
+    def __init__(self, schema) -> None:
+        self.schema = schema
+
+
+class ListOf:
+    """ 列表，`min_items`最少的项数 """
+
+    def __init__(self, item, min_items: int = 0) -> None:
+        self.item = item
+        self.min_items = min_items
+
+
+class ByType:
+    """ 按值的类型选择子格式，按声明的顺序匹配 """
+
+    def __init__(self, choices: dict[type | tuple[type, ...], Any], expected: str) -> None:
+        self.choices = choices
+        self.expected = expected  # 都不匹配时的错误信息
+
+
+def one_of(*choices) -> Leaf:
+    """ 只能是`choices`中的一个 """
+    def check(value, root: dict) -> str | None:
+        if value not in choices:
+            return f'`{value}`只能是{"或".join(map(str, choices))}'
+        return None
+    return Leaf(check)
+
+
+def number(*, minimum: float = None, integer=False, nullable=False) -> Leaf:
+    """ 数值，`minimum`最小值(含)，`integer`必须是整数，`nullable`可以为null """
+    def check(value, root: dict) -> str | None:
+        if value is None and nullable:
+            return None
+        if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+            return '应该是整数' if integer else '应该是数值'
+        if minimum is not None and value < minimum:
+            return f'{value}不能小于{minimum}'
+        return None
+    return Leaf(check)
+
+
+def string() -> Leaf:
+    """ 非空的字符串 """
+    def check(value, root: dict) -> str | None:
+        return None if isinstance(value, str) and value else '应该是非空的字符串'
+    return Leaf(check)
+
+
+def _check_version(value, root: dict) -> str | None:
+    try:
+        major = int(str(value).split('.')[0])
+    except ValueError:
+        return f'无法识别的版本`{value}`'
+    if major != PROJECT_VERSION:
+        return f'版本`{value}`与程序的版本{PROJECT_VERSION}不一致'
+    return None
+
+
+def _check_details(value, root: dict) -> str | None:
+    if not isinstance(value, list):
+        return '应该是数值的列表'
+    infos = root['parameter'].get('infos')  # 能到达这里说明parameter是dict
+    if isinstance(infos, list) and len(value) != len(infos):
+        return f'数值的个数({len(value)})与参数的个数({len(infos)})不一致'
+    if not all(isinstance(v, (int, float)) for v in value):
+        return '数值的类型不完全符合(int,float)'
+    return None
+
+
+_FUNCTION_NAME = re.compile(r'(?<=\s)\w+(?=\()')  # 与生成代码时相同
+
+
+def _check_shortcut_define(value, root: dict) -> str | None:
+    if not isinstance(value, str) or _FUNCTION_NAME.search(value) is None:
+        return f'`{value}`应该是C函数的声明，如`void Fn(int a=0);`'
+    return None
+
+
+_FRAME = {'frame head': ANY, 'frame tail': ANY}
+
+_RATE = {  # 发送队列的限速，见`Console.send_rate`
+    'frames per second': Optional(number(minimum=0, nullable=True)),
+    'bytes per second': Optional(number(minimum=0, nullable=True)),
+    'burst bytes': Optional(number(minimum=1, integer=True)),
+}
+
+_RELIABLE = {  # 可靠模式，见`Console._deliver`
+    'window': Optional(number(minimum=1, integer=True)),
+    'window bytes': Optional(number(minimum=1, integer=True)),
+    'retries': Optional(number(minimum=0, integer=True)),
+    'timeout': Optional(number(minimum=0)),
+}
+
+CONFIG_SCHEMA = {
+    'file info': {'title': ANY, 'description': ANY},  # 文件功能的描述
+    'project info': {'version': Leaf(_check_version)},  # 程序信息的描述
+    'initial': {'includes': ANY, 'coding': ANY},  # 串口初始化的描述
+    'parameter': {  # 参数信息的描述
+        'infos': [{'title': ANY, 'description': ANY, 'extern': ANY, 'define': ANY, 'alias': ANY}],
+        'values': [{'title': ANY, 'description': ANY, 'details': Leaf(_check_details)}],
+    },
+    'shortcut': ListOf({'title': ANY, 'alias': string(), 'define': Leaf(_check_shortcut_define)}, 1),  # 快捷指令
+    'telemetry': Optional({  # 遥测通道，见`telemetry.Telemetry.from_config`
+        'channels': Optional([{'name': ANY, 'define': string(), 'extern': Optional(string())}]),
+        'prefix': Optional(string()),
+        'capacity': Optional(number(minimum=1, integer=True)),
+        'window': Optional(number(minimum=1, integer=True)),
+        'fps': Optional(number(minimum=0)),
+    }),
+    'setting': {  # 传输配置
+        'send': dict(_FRAME, rate=Optional(_RATE)),
+        'recv': _FRAME,
+        'protocol': Optional(one_of('ascii', 'binary')),
+        'reliable': Optional(ByType({bool: ANY, dict: _RELIABLE}, '应该是true/false或键值对')),
+    },
+    'delay_ms': ANY,
+}
+""" 配置文件的格式 """
+
+Validator = Callable[[Any, KeyPath, dict, list[SchemaError]], None]
+
+
+def compile_schema(schema) -> Validator:
+    """ 把声明的格式编译为校验函数`validator(value, path, root, errors)` """
+    if isinstance(schema, Leaf):
+        check = schema.check
+        if check is None:
+            return lambda value, path, root, errors: None
+
+        def leaf(value, path: KeyPath, root: dict, errors: list[SchemaError]):
+            message = check(value, root)
+            if message is not None:
+                errors.append(SchemaError(path, message))
+        return leaf
+
+    if isinstance(schema, ByType):
+        choices = [(types, compile_schema(sub)) for types, sub in schema.choices.items()]
+        expected = schema.expected
+
+        def by_type(value, path: KeyPath, root: dict, errors: list[SchemaError]):
+            for types, validator in choices:
+                if isinstance(value, types):
+                    validator(value, path, root, errors)
+                    return
+            errors.append(SchemaError(path, expected))
+        return by_type
+
+    if isinstance(schema, list):
+        schema = ListOf(schema[0])
+    if isinstance(schema, ListOf):
+        item = compile_schema(schema.item)
+        quick = getattr(item, 'quick', None)
+        min_items = schema.min_items
+
+        def sequence(value, path: KeyPath, root: dict, errors: list[SchemaError]):
+            if not isinstance(value, list):
+                errors.append(SchemaError(path, '应该是列表'))
+                return
+            if len(value) < min_items:
+                errors.append(SchemaError(path, f'至少需要{min_items}项'))
+            if quick is not None and all(map(quick, value)):  # 大部分文档没有错误，不必逐项生成路径
+                return
+            for i, v in enumerate(value):
+                item(v, path + (i,), root, errors)
+        return sequence
+
+    if isinstance(schema, dict):
+        keys = tuple(key for key, sub in schema.items() if not isinstance(sub, Optional))
+        required = frozenset(keys)
+        fields = [(key, compile_schema(sub), False) for key, sub in schema.items()
+                  if sub is not ANY and not isinstance(sub, Optional)]  # 只要求存在的键不必调用
+        fields += [(key, compile_schema(sub.schema), True) for key, sub in schema.items() if isinstance(sub, Optional)]
+
+        def mapping(value, path: KeyPath, root: dict, errors: list[SchemaError]):
+            if not isinstance(value, dict):
+                errors.append(SchemaError(path, '应该是键值对'))
+                return
+            if not required <= value.keys():
+                errors.extend(SchemaError(path + (key,), '缺少此项') for key in keys if key not in value)
+            for key, validator, optional in fields:
+                if key in value and not (optional and value[key] is None):
+                    validator(value[key], path + (key,), root, errors)
+        if not fields:  # 只检查键是否存在时，可以不调用而直接判断
+            mapping.quick = lambda value: isinstance(value, dict) and required <= value.keys()
+        return mapping
+
+    raise TypeError(f'无法识别的格式{schema!r}')
+
+
+_validate_config = compile_schema(CONFIG_SCHEMA)
+_cache: OrderedDict[str, tuple[SchemaError, ...]] = OrderedDict()  # 内容摘要 -> 错误
+_cache_lock = threading.Lock()
+
+
+def validate(data, digest: str = None) -> tuple[SchemaError, ...]:
+    """ 检查配置的格式，返回全部的错误
+
+    `digest`文件内容的摘要，给出时按摘要缓存结果；文档在加载之后被修改过时应为None"""
+    if digest is not None:
+        with _cache_lock:
+            errors = _cache.get(digest)
+            if errors is not None:
+                _cache.move_to_end(digest)
+                return errors
+    found: list[SchemaError] = []
+    _validate_config(data, (), data, found)
+    errors = tuple(found)
+    if digest is not None:
+        with _cache_lock:
+            _cache[digest] = errors
+            while len(_cache) > VALIDATION_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return errors
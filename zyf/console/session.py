@@ -0,0 +1,237 @@
+""" 多串口会话
+
+`SessionManager`管理多个`Console`，每个会话有自己的串口、yaml配置和读取线程，用于同时调试多块MCU(如多轴的台架)。
+`broadcast_group`、`broadcast_params`把同一组参数并行发送到各个会话并等待送达(可靠模式下为收到ACK)，
+`stats`返回每个串口的吞吐量。
+
+>>> manager = SessionManager()
+>>> manager.add('x', 'data/axis.yaml', port='COM3', baudrate=115200)
+>>> manager.add('y', 'data/axis.yaml', port='COM4', baudrate=115200)
+>>> manager.open()
+>>> for name, result in manager.broadcast_group(1).items():
+...     print(name, result.error, result.latency)
+"""
+
+import time
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, NamedTuple
+from . import Console
+
+DEFAULT_TIMEOUT = 5.0
+""" 广播时等待每个会话送达的最长时间(s) """
+
+
+class BroadcastResult(NamedTuple):
+    """ 一个会话的广播结果 """
+    order: str  # 命令文本
+    error: Exception | None  # 写入出错、超时或没有送达时的异常
+    latency: float  # 从发送到送达的耗时(s)
+
+
+class SessionStats:
+    """ 一个会话的吞吐量，速率为与上一次`SessionManager.stats`之间的平均值 """
+
+    def __init__(self, name: str, port: str | None, is_open: bool) -> None:
+        self.name = name
+        self.port = port
+        self.is_open = is_open
+        self.bytes_out = 0  # 写入的总字节数
+        self.bytes_in = 0  # 读到的总字节数
+        self.out_bytes_per_s = 0.0
+        self.in_bytes_per_s = 0.0
+        self.broadcasts = 0  # 参与的广播次数
+        self.delivered = 0  # 送达的广播次数
+        self.failed = 0  # 出错或超时的广播次数
+        self.last_latency: float | None = None  # 最近一次送达的耗时(s)
+
+    def __repr__(self) -> str:
+        return (f'SessionStats(name={self.name!r}, port={self.port!r}, is_open={self.is_open}, '
+                f'bytes_out={self.bytes_out}, bytes_in={self.bytes_in}, '
+                f'out_bytes_per_s={self.out_bytes_per_s:.1f}, in_bytes_per_s={self.in_bytes_per_s:.1f}, '
+                f'broadcasts={self.broadcasts}, delivered={self.delivered}, failed={self.failed}, '
+                f'last_latency={self.last_latency})')
+
+
+class _Counters:
+    __slots__ = ('broadcasts', 'delivered', 'failed', 'last_latency', 'sampled_at', 'bytes_out', 'bytes_in')
+
+    def __init__(self) -> None:
+        self.broadcasts = self.delivered = self.failed = 0
+        self.last_latency: float | None = None
+        self.sampled_at = time.monotonic()  # 上一次计算速率的时刻及当时的字节数
+        self.bytes_out = self.bytes_in = 0
+
+
+class SessionManager:
+    """ 按名称管理多个`Console`会话 """
+
+    def __init__(self) -> None:
+        self.sessions: dict[str, Console] = {}
+        self._counters: dict[str, _Counters] = {}
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor = None
+        self._pool_size = 0
+
+    def __getitem__(self, name: str) -> Console:
+        return self.sessions[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sessions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sessions)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def add(self, name: str, config: str | Path | Console, *, port: str = None, **serial: Any) -> Console:
+        """ 添加会话
+
+        `config`yaml配置的路径，或已经加载配置的`Console`
+        `port`串口路径或pyserial的URL，`serial`其他串口设置，见`Console.set_serial`"""
+        if name in self.sessions:
+            raise KeyError(f'会话{name}已经存在')
+        if isinstance(config, Console):
+            console = config
+        else:
+            console = Console()
+            console.data.load(config)
+        yaml_path = getattr(console.data, 'yaml_path', None)
+        for other_name, other in self.sessions.items():
+            if yaml_path is not None and getattr(other.data, 'yaml_path', None) == yaml_path:
+                print(f'[警告]会话{name}与{other_name}使用同一个yaml，确认的数值会写入同一个文件')
+        if port is not None:
+            serial['port'] = port
+        if serial:
+            console.set_serial(serial)
+        self.sessions[name] = console
+        self._counters[name] = _Counters()
+        return console
+
+    def remove(self, name: str) -> Console:
+        """ 移除会话并关闭其串口 """
+        console = self.sessions.pop(name)
+        del self._counters[name]
+        if console.serial.is_open:
+            console.close_serial()
+        return console
+
+    def open(self, names: list[str] = None) -> dict[str, Exception | None]:
+        """ 打开会话的串口并启动读取线程，返回每个会话的异常，已经打开的会话不变 """
+        errors = {}
+        for name in self._names(names):
+            console = self.sessions[name]
+            try:
+                if not console.serial.is_open:
+                    console.open_serial()
+                errors[name] = None
+            except (OSError, ValueError) as e:  # SerialException是OSError的子类
+                print(f'[警告]会话{name}无法打开串口{console.serial.port}: {e}')
+                errors[name] = e
+        return errors
+
+    def close(self):
+        """ 关闭全部串口，会话保留 """
+        for console in self.sessions.values():
+            if console.serial.is_open:
+                console.close_serial()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def broadcast_group(self, group: int, *, source: str = None, names: list[str] = None,
+                        timeout: float = DEFAULT_TIMEOUT) -> dict[str, BroadcastResult]:
+        """ API: 并行地把数值组发送到各个会话
+
+        `source`缺省时每个会话切换到各自配置中的第`group`组并发送；
+        否则把会话`source`的第`group`组按化名发送到各个会话，送达后确认到各自的配置中"""
+        if source is None:
+            return self._broadcast(
+                lambda console, done: console.switch_group(group, on_delivered=done), names, timeout)
+        data = self.sessions[source].data
+        aliases = [info['alias'] for info in data['parameter', 'infos']]
+        return self.broadcast_params(dict(zip(aliases, data['parameter', 'values', group, 'details'])),
+                                     names=names, timeout=timeout)
+
+    def broadcast_params(self, values: dict[str, float | int], *, names: list[str] = None,
+                         timeout: float = DEFAULT_TIMEOUT) -> dict[str, BroadcastResult]:
+        """ API: 并行地把{化名: 数值}发送到各个会话，会话的配置中没有的化名被跳过 """
+        def send(console: Console, done: Callable[[Exception | None], None]) -> tuple[str, Exception]:
+            known = {a: v for a, v in values.items() if a in console.data.alias_index}
+            if len(known) < len(values):
+                print(f'[警告]{getattr(console.data, "yaml_path", None)}中没有{", ".join(a for a in values if a not in known)}，不发送')
+            if not known:
+                return '', KeyError('没有可以发送的参数')
+            return console.make_params_order(known, on_delivered=done)
+        return self._broadcast(send, names, timeout)
+
+    def stats(self) -> dict[str, SessionStats]:
+        """ 每个会话的吞吐量 """
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for name, console in self.sessions.items():
+                counters = self._counters[name]
+                stats = SessionStats(name, console.serial.port, console.serial.is_open)
+                stats.bytes_out = console.writer_stats.bytes_written
+                stats.bytes_in = console.reader.stats.bytes_read
+                elapsed = now - counters.sampled_at
+                if elapsed > 0:
+                    stats.out_bytes_per_s = (stats.bytes_out - counters.bytes_out) / elapsed
+                    stats.in_bytes_per_s = (stats.bytes_in - counters.bytes_in) / elapsed
+                counters.sampled_at, counters.bytes_out, counters.bytes_in = now, stats.bytes_out, stats.bytes_in
+                stats.broadcasts, stats.delivered, stats.failed = (counters.broadcasts, counters.delivered,
+                                                                   counters.failed)
+                stats.last_latency = counters.last_latency
+                result[name] = stats
+        return result
+
+    def _names(self, names: list[str] | None) -> list[str]:
+        if names is None:
+            return list(self.sessions)
+        unknown = [name for name in names if name not in self.sessions]
+        if unknown:
+            raise KeyError(f'没有会话{", ".join(unknown)}')
+        return list(names)
+
+    def _broadcast(self, send: Callable[[Console, Callable], tuple[str, Exception]], names: list[str] | None,
+                   timeout: float) -> dict[str, BroadcastResult]:
+        names = self._names(names)
+        if not names:
+            return {}
+        if self._pool is None or self._pool_size < len(names):  # 每个会话一个线程，全部会话同时发送
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool_size = len(self.sessions)
+            self._pool = ThreadPoolExecutor(max_workers=self._pool_size, thread_name_prefix='SessionManager')
+        futures = {name: self._pool.submit(self._send_one, name, send, timeout) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _send_one(self, name: str, send: Callable, timeout: float) -> BroadcastResult:
+        """ 在线程池中发送并等待送达 """
+        delivered = threading.Event()
+        box: list[Exception | None] = []
+
+        def done(e: Exception | None):
+            box.append(e)
+            delivered.set()
+        start = time.perf_counter()
+        try:
+            order, error = send(self.sessions[name], done)
+        except (KeyError, IndexError, ValueError) as e:
+            order, error = '', e
+        if error is None:
+            error = box[0] if delivered.wait(timeout) else TimeoutError(f'{timeout}s内没有送达')
+        latency = time.perf_counter() - start
+        with self._lock:
+            counters = self._counters.get(name)
+            if counters is not None:
+                counters.broadcasts += 1
+                if error is None:
+                    counters.delivered += 1
+                    counters.last_latency = latency
+                else:
+                    counters.failed += 1
+        return BroadcastResult(order, error, latency)
@@ -0,0 +1,542 @@
+""" 生成的MCU固件的模拟
+
+`FirmwareModel`用Python复现生成的`serial_order.c`中`manage_serial_port`、`process_information`
+和`SetParameterValue`的状态机，对同样的输入给出与真实固件相同的回复(`SET ABC=1.5\\n`、`#`、`.`、警告)，
+包括其缓冲长度限制和未能匹配的命令留在缓冲中的行为。
+
+`SimulatedSerial`是pyserial的串口后端，写入的数据交给模型，回复从读取端得到，
+可以按波特率模拟传输耗时；也可以用`sim://`的URL打开(见`protocol_sim`):
+
+>>> port = serial.serial_for_url('sim://data/test.yaml?realtime', baudrate=115200)
+>>> port.write(b'[0:1,2.5]')
+>>> port.read(12)
+b'SET DEF=2.5\\n'
+
+没有硬件时还可以用`python -m zyf.console simulate data/test.yaml`在伪终端上运行模型，
+主程序和其他串口工具直接连接打印出的设备路径。
+"""
+
+import re
+import time
+import struct
+import threading
+import urllib.parse
+import serial as ser
+from collections import deque
+from typing import Callable
+from serial.serialutil import SerialBase, PortNotOpenError
+from . import protocol, serial_match_buff_size, SERIAL_READBUFF_SIZE
+from .config import Config
+
+READ_BUFF_SIZE = SERIAL_READBUFF_SIZE
+""" 与生成代码的`SERIAL_READBUFF_SIZE`相同，每次循环最多读取`READ_BUFF_SIZE - 1`个字节 """
+
+ASCII_INITIAL_BUFF = b'START'
+""" 文本模式下`match_buff`的初始内容 """
+
+MAX_DRAIN_POLLS = 256
+""" `FirmwareModel.receive`处理缓冲中剩余命令时的最多循环次数 """
+
+SC_NONE, SC_BATCH, SC_SYNC = -1, -2, protocol.ORDER_SYNC
+""" 与生成代码中`enum shortcut`的`SC_None`、`SC_BatchParameterValue`和`SC_SyncSequence`相同 """
+
+SEQ_DROP, SEQ_DUPLICATE, SEQ_EXECUTE = -1, 0, 1
+""" 可靠模式下带序号的命令的状态，与生成代码中的同名宏相同 """
+
+_FLOAT = struct.Struct('<f')
+_INT = struct.Struct('<i')
+_INTEGER = re.compile(rb'\s*[+-]?\d+')
+_DECIMAL = re.compile(rb'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|\s*[+-]?(?:inf(?:inity)?|nan)', re.I)
+_ORDER_TYPE = re.compile(rb'\[\s*([+-]?\d+)')
+_CONVERSIONS = {'int': _INTEGER, 'float': _DECIMAL, 'double': _DECIMAL, 'char': re.compile(rb'.', re.S)}
+
+
+def float32(v: float) -> float:
+    """ 按C语言的float保存后的数值 """
+    try:
+        return _FLOAT.unpack(_FLOAT.pack(v))[0]
+    except OverflowError:
+        return float('inf') if v > 0 else float('-inf')
+
+
+def _strtol(buff: bytes, pos: int) -> tuple[int, int] | None:
+    """ C语言的`strtol(ptr, &end, 10)`，返回(数值, end)，没有转换时返回None """
+    m = _INTEGER.match(buff, pos)
+    if m is None:
+        return None
+    return int(m.group()), m.end()
+
+
+def _strtod(buff: bytes, pos: int) -> tuple[float, int] | None:
+    """ C语言的`strtod(ptr, &end)` """
+    m = _DECIMAL.match(buff, pos)
+    if m is None:
+        return None
+    return float(m.group()), m.end()
+
+
+class Shortcut:
+    """ yaml中`shortcut`的一项，按生成代码的方式解析`define` """
+
+    def __init__(self, define: str) -> None:
+        self.define = define
+        self.name = re.findall(r'(?<=\s)\w+(?=\()', define)[0]
+        self.types = re.findall(r'\w+(?=\s\w+=)', define)  # 参数类型，决定`sscanf`的格式
+        self.defaults = [arg.strip() for arg in re.findall(r'=([^,)]+)', define)]  # 二进制模式下的参数
+
+    def default_args(self) -> tuple:
+        args = []
+        for t, arg in zip(self.types, self.defaults):
+            try:
+                args.append(float(arg) if t in ('float', 'double') else int(arg, 0) if t == 'int' else arg)
+            except ValueError:
+                args.append(0)
+        return tuple(args)
+
+
+class FirmwareStats:
+    """ 模拟固件的统计信息 """
+
+    def __init__(self) -> None:
+        self.polls = 0  # `manage_serial_port`的调用次数
+        self.bytes_in = 0  # 读取的字节数
+        self.bytes_out = 0  # 回复的字节数
+        self.orders = 0  # 匹配成功的命令数
+        self.sets = 0  # 设置参数的次数
+        self.nomatch = 0  # 回复`#`的次数
+        self.bursts = 0  # 缓冲溢出的次数
+        self.acks = 0  # 回复ACK的次数
+        self.dropped = 0  # 可靠模式下因乱序而丢弃的命令数
+
+    def __repr__(self) -> str:
+        return (f'FirmwareStats(polls={self.polls}, bytes_in={self.bytes_in}, bytes_out={self.bytes_out}, '
+                f'orders={self.orders}, sets={self.sets}, nomatch={self.nomatch}, bursts={self.bursts}, '
+                f'acks={self.acks}, dropped={self.dropped})')
+
+
+class FirmwareModel:
+    """ 生成的固件的Python模型
+
+    每次`manage_serial_port`对应固件主循环中的一次调用，`receive`则像主循环一样
+    分段读取一块数据，并继续循环直到缓冲中没有可以执行的命令"""
+
+    def __init__(self, config: Config) -> None:
+        """ `config`已经加载的yaml配置，模型使用其参数、快捷指令、编码方式和遥测通道 """
+        infos = config['parameter', 'infos']
+        self.aliases: list[str] = [info['alias'] for info in infos]
+        self.defines: list[str] = [str(info['define']).split(' ')[-1].replace(';', '') for info in infos]
+        self.variables: dict[str, float] = dict.fromkeys(self.defines, 0.0)  # 全局变量，未初始化时为0
+        self.shortcuts = [Shortcut(sc['define']) for sc in config['shortcut']]
+        self.functions: dict[str, Callable[..., None]] = {'SetParameterValue': self.set_parameter_value}
+        """ 快捷指令调用的函数，可以添加模拟用户代码的函数；没有对应函数时只记录在`calls`中 """
+        self.calls: list[tuple[str, tuple]] = []  # 执行过的快捷指令(函数名, 参数)
+        self.protocol = protocol.protocol_mode(config.get('setting'))
+        self.stats = FirmwareStats()
+        self._last_order = SC_NONE  # 上一次`process_information`的返回值
+        self.match_buff_size = serial_match_buff_size(len(self.aliases))
+        self._output = bytearray()
+        self._match_buff = bytearray(ASCII_INITIAL_BUFF)
+        self._tpp: dict[int, object] = {}  # 生成代码中的`TPp`全局变量
+        self._frame = bytearray()  # 二进制模式下正在接收的帧
+        self._frame_seq = -1  # 二进制模式下`TYPE_SEQ`帧给出的下一帧的序号
+        self.expected_seq = -1  # 可靠模式下期望的下一个序号，-1为尚未同步
+        self._frame_max_size = max(protocol.FRAME_SIZE,
+                                   protocol.batch_frame_size(min(len(self.aliases), protocol.MAX_BATCH)))
+        recv = (config.get(('setting', 'recv')) or {})
+        telemetry = config.get('telemetry') or {}
+        self.telemetry_channels: list[str] = [str(ch['define']) for ch in telemetry.get('channels') or []]
+        from .telemetry import DEFAULT_PREFIX  # 不在导入时加载numpy
+        self._telemetry_head = (f"{recv.get('frame head', '[')}{telemetry.get('prefix', DEFAULT_PREFIX)}:"
+                                .encode('ascii'))
+        self._telemetry_tail = f"{recv.get('frame tail', ']')}\n".encode('ascii')
+        self._ack_head = f"{recv.get('frame head', '[')}{protocol.ACK_TAG}".encode('ascii')
+
+    @classmethod
+    def from_yaml(cls, yaml_path: str) -> 'FirmwareModel':
+        return cls(Config(yaml_path))
+
+    @property
+    def values(self) -> list[float]:
+        """ 按参数索引排列的当前数值 """
+        return [self.variables[d] for d in self.defines]
+
+    # <生成代码中的函数>
+
+    def serial_putstr(self, text: bytes | str):
+        self._output += text.encode('ascii') if isinstance(text, str) else text
+
+    def set_parameter_value(self, param: int, value: float):
+        """ `SetParameterValue`，设置后回显`SET 化名=%g` """
+        if 0 <= param < len(self.aliases):
+            value = float32(value)
+            self.variables[self.defines[param]] = value
+            self.stats.sets += 1
+            self.serial_putstr(f'SET {self.aliases[param]}={value:g}\n')
+        else:
+            self.serial_putstr(f'[Warn] Unknow param id=[{param}]\n')
+
+    def report_telemetry(self) -> bytes:
+        """ `ReportTelemetry`，通道的表达式不是已知的变量时为0 """
+        if not self.telemetry_channels:
+            return b''
+        values = ','.join(f'{self.variables.get(ch, 0.0):g}' for ch in self.telemetry_channels)
+        frame = self._telemetry_head + values.encode('ascii') + self._telemetry_tail
+        self.stats.bytes_out += len(frame)
+        return frame
+
+    def sequence_state(self, seq: int) -> int:
+        """ `sequence_state`，可靠模式下带序号的命令是否应该执行 """
+        if self.expected_seq < 0 or seq == self.expected_seq:
+            return SEQ_EXECUTE
+        return SEQ_DUPLICATE if (self.expected_seq - 1 - seq) & 0xFF < 0x80 else SEQ_DROP
+
+    def sequence_ack(self, seq: int, state: int):
+        """ `sequence_ack`，回复ACK，按顺序执行的命令同时更新期望的序号 """
+        if state == SEQ_EXECUTE:
+            self.expected_seq = (seq + 1) & 0xFF
+        self.stats.acks += 1
+        self.serial_putstr(self._ack_head + str(seq).encode('ascii') + self._telemetry_tail)
+
+    def manage_serial_port(self, data: bytes = b'') -> bytes:
+        """ 主循环中的一次调用: 读取`data`(最多`READ_BUFF_SIZE - 1`个字节)并返回回复 """
+        if len(data) > READ_BUFF_SIZE - 1:
+            raise ValueError(f'每次最多读取{READ_BUFF_SIZE - 1}个字节')
+        self.stats.polls += 1
+        self.stats.bytes_in += len(data)
+        if self.protocol == 'binary':
+            ot = self._process_binary(data)
+        else:
+            ot = self._process_ascii(data)
+        if ot == SC_NONE:
+            self.serial_putstr('.')
+        else:
+            self.stats.orders += 1
+        self._last_order = ot
+        output = bytes(self._output)
+        self._output.clear()
+        self.stats.bytes_out += len(output)
+        return output
+
+    def receive(self, data: bytes) -> bytes:
+        """ 分段读取一块数据，之后继续空读直到缓冲中没有可以执行的命令，返回全部回复 """
+        step = READ_BUFF_SIZE - 1
+        replies = [self.manage_serial_port(data[i:i + step]) for i in range(0, len(data), step)]
+        for _ in range(MAX_DRAIN_POLLS):
+            if not data or self._last_order == SC_NONE:
+                break
+            replies.append(self.manage_serial_port())
+        return b''.join(replies)
+
+    def _call(self, shortcut: Shortcut, args: tuple):
+        self.calls.append((shortcut.name, args))
+        function = self.functions.get(shortcut.name)
+        if function is not None:
+            function(*args)
+
+    def _process_ascii(self, data: bytes) -> int:
+        """ 文本模式的`process_information` """
+        buff = self._match_buff
+        data = data.split(b'\0', 1)[0]  # C字符串
+        if len(buff) + len(data) >= self.match_buff_size:
+            self.stats.bursts += 1
+            self.serial_putstr(b'[warnning] buff was burst!' + bytes(buff) + b' | ' + data)
+            buff.clear()
+        buff += data
+        ot = SC_NONE
+        if b']' not in buff:
+            return ot
+        index = buff.find(b'[')
+        if index > 0:
+            del buff[:index]
+        if index < 0:
+            return ot
+        m = _ORDER_TYPE.match(buff)  # sscanf(match_buff, "[%d:", &ot)，没有':'时ot也已经被赋值
+        if m is not None:
+            ot = int(m.group(1))
+        # 可靠模式的命令以"@序号"结尾，在第一个']'之前向前查找
+        i = buff.rfind(protocol.SEQ_MARK.encode('ascii'), 1, max(buff.find(b']'), 0))
+        seq = int(_INTEGER.match(buff, i + 1).group()) if i > 0 and buff[i + 1:i + 2].isdigit() else -1
+        if ot == SC_SYNC:
+            self.expected_seq = -1
+        state = SEQ_EXECUTE if seq < 0 else self.sequence_state(seq)
+        if state == SEQ_DROP:
+            self.stats.dropped += 1
+        if state != SEQ_EXECUTE or ot == SC_SYNC:  # 重复或乱序的命令不执行
+            ot = SC_SYNC
+        elif 0 <= ot < len(self.shortcuts):
+            shortcut = self.shortcuts[ot]
+            if buff.startswith(b':', m.end()):
+                self._scan_args(buff, m.end() + 1, shortcut)
+            # 转换失败的参数沿用上一次的TPp；生成代码以`spts.index(s)`选择TPp，同类型的参数共用一个变量
+            self._call(shortcut, tuple(self._tpp.get(shortcut.types.index(t), 0) for t in shortcut.types))
+        elif ot == SC_BATCH and self._batch_colon(buff) >= 0:
+            self._batch_ascii(buff, self._batch_colon(buff) + 1)
+        else:
+            self.stats.nomatch += 1
+            self.serial_putstr('#')
+            ot = SC_NONE
+        if seq >= 0 and ot != SC_NONE and state != SEQ_DROP:
+            self.sequence_ack(seq, state)
+        del buff[:buff.find(b']') + 1]  # 匹配失败的命令也裁剪，平移后没有']'时`strIndex`为-1，不裁剪
+        return ot
+
+    @staticmethod
+    def _batch_colon(buff: bytearray) -> int:
+        """ 批量命令中':'的位置，没有':'或':'在第一个']'之后(属于之后的命令)时为-1 """
+        colon, close = buff.find(b':'), buff.find(b']')
+        return -1 if close >= 0 and colon > close else colon
+
+    def _scan_args(self, buff: bytearray, pos: int, shortcut: Shortcut):
+        """ `sscanf(match_buff, "[%d:%d,%f]", ...)`，转换失败时之后的TPp保持原值 """
+        for i, t in enumerate(shortcut.types):
+            if i and (pos >= len(buff) or buff[pos] != ord(',')):
+                return
+            pos += 1 if i else 0
+            m = _CONVERSIONS.get(t, _DECIMAL).match(buff, pos)
+            if m is None:
+                return
+            text = m.group()
+            self._tpp[shortcut.types.index(t)] = (int(text) if t == 'int' else text.decode('latin-1')
+                                                  if t == 'char' else float32(float(text)) if t == 'float'
+                                                  else float(text))
+            pos = m.end()
+
+    def _batch_ascii(self, buff: bytearray, pos: int):
+        """ `[-2:索引,数值;索引,数值;...]` """
+        while pos < len(buff) and buff[pos] != ord(']'):
+            param = _strtol(buff, pos)
+            if param is None or param[1] >= len(buff) or buff[param[1]] != ord(','):
+                break
+            value = _strtod(buff, param[1] + 1)
+            if value is None:
+                break
+            self.set_parameter_value(param[0], value[0])
+            pos = value[1] + 1 if value[1] < len(buff) and buff[value[1]] == ord(';') else value[1]
+
+    def _process_binary(self, data: bytes) -> int:
+        """ 二进制帧模式的`process_information` """
+        frame, ot = self._frame, SC_NONE
+        for b in data:
+            if not frame and b != protocol.SYNC_BYTE:
+                continue  # 等待同步字节
+            frame.append(b)
+            while len(frame) >= 3:  # 重新对齐后剩余的数据中可能已经有完整的帧
+                size = protocol.batch_frame_size(frame[2]) if frame[1] == protocol.TYPE_BATCH else protocol.FRAME_SIZE
+                if size <= self._frame_max_size and len(frame) < size:
+                    break
+                if size > self._frame_max_size or protocol.crc8(frame[1:size - 1]) != frame[size - 1]:
+                    # 长度或校验错误，从下一个同步字节重新对齐
+                    self.stats.nomatch += 1
+                    self.serial_putstr('#')
+                    self._frame_seq = -1
+                    self._frame_drop(1)
+                    continue
+                type_, index, payload = frame[1], frame[2], bytes(frame[3:7])
+                if type_ == protocol.TYPE_SEQ:  # 可靠模式: 下一帧的序号
+                    self._frame_seq = index
+                    self._frame_drop(size)
+                    continue
+                if type_ == protocol.TYPE_SYNC:
+                    self.expected_seq = -1
+                    self._frame_seq = index
+                seq = self._frame_seq
+                state = SEQ_EXECUTE if seq < 0 else self.sequence_state(seq)
+                if state == SEQ_DROP:
+                    self.stats.dropped += 1
+                if state != SEQ_EXECUTE or type_ == protocol.TYPE_SYNC:  # 重复或乱序的帧不执行
+                    ot = SC_SYNC
+                elif type_ == protocol.TYPE_VALUE:
+                    self.set_parameter_value(index, _FLOAT.unpack(payload)[0])
+                    ot = 0
+                elif type_ == protocol.TYPE_SHORTCUT:
+                    if index < len(self.shortcuts):
+                        self._call(self.shortcuts[index], self.shortcuts[index].default_args())
+                    else:
+                        self.stats.nomatch += 1
+                        self.serial_putstr('#')
+                        state = SEQ_DROP
+                    ot = index
+                elif type_ == protocol.TYPE_BATCH:
+                    for i, value in protocol.decode_batch(frame[:size]):
+                        self.set_parameter_value(i, value)
+                    ot = SC_BATCH
+                else:
+                    self.stats.nomatch += 1
+                    self.serial_putstr('#')
+                    state = SEQ_DROP
+                if seq >= 0 and state != SEQ_DROP:
+                    self.sequence_ack(seq, state)
+                self._frame_seq = -1
+                self._frame_drop(size)
+        return ot
+
+    def _frame_drop(self, n: int):
+        """ `frame_drop`，丢弃开头的`n`个字节并对齐到下一个同步字节 """
+        frame = self._frame
+        while n < len(frame) and frame[n] != protocol.SYNC_BYTE:
+            n += 1
+        del frame[:n]
+
+
+class SimulatedSerial(SerialBase):
+    """ 连接到`FirmwareModel`的串口
+
+    `write`的数据立即交给模型，回复放入接收缓冲。`realtime`为True时按波特率(每字节10位)
+    计算命令和回复在线路上的传输时间，回复在传输完成后才能读到，用于测量往返延迟和吞吐量。
+
+    URL形式为`sim://<yaml路径>[?realtime]`"""
+
+    def __init__(self, *args, model: FirmwareModel = None, realtime: bool = False, **kwargs) -> None:
+        """ `model`直接使用的固件模型，缺省时由URL中的yaml创建 """
+        self.model = model
+        self.realtime = realtime
+        self._chunks: deque[tuple[float, bytes]] = deque()  # (可以读取的时刻, 数据)
+        self._cond = threading.Condition()
+        self._tx_free = 0.0  # 主机到MCU的线路空闲的时刻
+        self._rx_free = 0.0  # MCU到主机的线路空闲的时刻
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        if self.is_open:
+            raise ser.SerialException('串口已经打开')
+        if self._port is not None:
+            self.from_url(self._port)
+        if self.model is None:
+            raise ser.SerialException('没有固件模型，需要`model`参数或sim://<yaml路径>')
+        self._reconfigure_port()
+        self.is_open = True
+        self.reset_input_buffer()
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+    def from_url(self, url: str):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != 'sim':
+            raise ser.SerialException(f'应为sim://<yaml路径>[?realtime]的形式，而不是{url!r}')
+        path = urllib.parse.unquote(parts.netloc + parts.path)
+        for option, values in urllib.parse.parse_qs(parts.query, keep_blank_values=True).items():
+            if option == 'realtime':
+                self.realtime = values[-1].lower() not in ('0', 'false', 'no')
+            else:
+                raise ser.SerialException(f'未知的选项: {option!r}')
+        if path:
+            try:
+                self.model = FirmwareModel.from_yaml(path)
+            except (OSError, KeyError, ValueError) as e:
+                raise ser.SerialException(f'无法加载{path}: {e!r}') from e
+
+    def _reconfigure_port(self):
+        if not isinstance(self._baudrate, int) or self._baudrate <= 0:
+            raise ValueError(f'无效的波特率: {self._baudrate!r}')
+
+    def _byte_time(self, n: int) -> float:
+        return 10.0 * n / self._baudrate
+
+    def _ready(self, now: float) -> int:
+        """ 已经传输完成的字节数 """
+        n = 0
+        for t, data in self._chunks:
+            if t > now:
+                break
+            n += len(data)
+        return n
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self._cond:
+            return self._ready(time.monotonic())
+
+    def read(self, size: int = 1) -> bytes:
+        if not self.is_open:
+            raise PortNotOpenError()
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        data = bytearray()
+        with self._cond:
+            while len(data) < size and self.is_open:
+                now = time.monotonic()
+                if self._chunks and self._chunks[0][0] <= now:
+                    t, chunk = self._chunks.popleft()
+                    take = size - len(data)
+                    data += chunk[:take]
+                    if len(chunk) > take:
+                        self._chunks.appendleft((t, chunk[take:]))
+                    continue
+                if deadline is not None and now >= deadline:
+                    break
+                wake = [t for t in (deadline, self._chunks[0][0] if self._chunks else None) if t is not None]
+                self._cond.wait(min(wake) - now if wake else None)
+        return bytes(data)
+
+    def write(self, data) -> int:
+        if not self.is_open:
+            raise PortNotOpenError()
+        data = ser.to_bytes(data)
+        with self._cond:
+            reply = self.model.receive(data)
+            now = time.monotonic()
+            if self.realtime:
+                self._tx_free = max(now, self._tx_free) + self._byte_time(len(data))  # 命令到达MCU
+                self._rx_free = max(self._tx_free, self._rx_free) + self._byte_time(len(reply))
+                ready = self._rx_free
+            else:
+                ready = now
+            if reply:
+                self._chunks.append((ready, reply))
+                self._cond.notify_all()
+        return len(data)
+
+    def inject(self, data: bytes):
+        """ 模拟MCU主动发送数据(如遥测帧) """
+        with self._cond:
+            now = time.monotonic()
+            if self.realtime:
+                self._rx_free = max(now, self._rx_free) + self._byte_time(len(data))
+                now = self._rx_free
+            self._chunks.append((now, bytes(data)))
+            self._cond.notify_all()
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._chunks.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    @property
+    def out_waiting(self) -> int:
+        return 0
+
+    def cancel_read(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _update_break_state(self):
+        pass
+
+    def _update_rts_state(self):
+        pass
+
+    def _update_dtr_state(self):
+        pass
+
+    @property
+    def cts(self) -> bool:
+        return True
+
+    @property
+    def dsr(self) -> bool:
+        return True
+
+    @property
+    def ri(self) -> bool:
+        return False
+
+    @property
+    def cd(self) -> bool:
+        return True
+
@@ -0,0 +1,186 @@
+""" 实时遥测数据
+
+在yaml中声明MCU上报的通道:
+
+```yaml
+telemetry:
+  prefix: T         # 帧的标识，MCU发送`[T:v1,v2,...]`(帧头帧尾为setting: recv:)
+  capacity: 20000   # 每个通道在内存中保存的样本数
+  window: 2000      # 曲线显示最近的样本数
+  fps: 30           # 曲线的最高刷新率
+  channels:
+  - name: 速度        # 显示的名称
+    define: value_1  # 生成的C代码中上报的表达式
+```
+
+生成的C代码中`ReportTelemetry()`按通道顺序发送一帧，
+`Telemetry.feed`从解析后的帧中批量取出数值，存入定长的NumPy环形缓冲，不会为每个样本创建Python对象。
+"""
+
+import re
+import warnings
+import numpy as np
+from typing import Iterable
+from .parser import Frame, FrameKind
+
+DEFAULT_PREFIX = 'T'
+""" 遥测帧的缺省标识 """
+
+DEFAULT_CAPACITY = 20000
+""" 每个通道缺省保存的样本数 """
+
+DEFAULT_WINDOW = 2000
+""" 曲线缺省显示的样本数 """
+
+DEFAULT_FPS = 30
+""" 曲线缺省的最高刷新率 """
+
+MAX_HELD_BYTES = 4096
+""" `FrameStripper`最多保留的未结束的帧，超过时当作普通数据显示 """
+
+
+class RingBuffer:
+    """ 定长的二维环形缓冲，每行一个样本，每列一个通道 """
+
+    def __init__(self, n_channels: int, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError(f'容量必须大于0，而不是{capacity}')
+        self.capacity = capacity
+        self.total = 0  # 写入过的样本总数
+        self._data = np.full((capacity, n_channels), np.nan)
+        self._head = 0  # 下一个写入的位置
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def extend(self, block: np.ndarray):
+        """ 写入多个样本，形状为(样本数, 通道数)，超出容量时覆盖最旧的样本 """
+        k = len(block)
+        self.total += k
+        if k >= self.capacity:
+            self._data[:] = block[-self.capacity:]
+            self._head = 0
+            return
+        first = min(k, self.capacity - self._head)
+        self._data[self._head:self._head + first] = block[:first]
+        self._data[:k - first] = block[first:]
+        self._head = (self._head + k) % self.capacity
+
+    def latest(self, n: int = None) -> np.ndarray:
+        """ 最近的`n`个样本(按时间顺序)，缺省为全部 """
+        n = len(self) if n is None else min(n, len(self))
+        start = self._head - n
+        if start >= 0:
+            return self._data[start:self._head]
+        return np.concatenate((self._data[start:], self._data[:self._head]))
+
+    def clear(self):
+        self._data.fill(np.nan)
+        self._head = 0
+        self.total = 0
+
+
+class Telemetry:
+    """ 遥测通道和其数据 """
+
+    def __init__(self, names: list[str], *, prefix: str = DEFAULT_PREFIX, capacity: int = DEFAULT_CAPACITY,
+                 window: int = DEFAULT_WINDOW, fps: float = DEFAULT_FPS) -> None:
+        """ ## Parameter
+        `names`通道的名称，顺序与帧中的数值相同
+        `prefix`帧的标识
+        `capacity`每个通道保存的样本数
+        `window`曲线显示的样本数
+        `fps`曲线的最高刷新率"""
+        if not names:
+            raise ValueError('至少需要一个遥测通道')
+        self.names = list(names)
+        self.prefix = prefix
+        self.window = window
+        self.fps = fps
+        self.buffer = RingBuffer(len(self.names), capacity)
+        self.bad_frames = 0  # 数值个数不对或无法解析的帧
+        self._tag = f'{prefix}:'.encode('ascii')
+
+    @classmethod
+    def from_config(cls, section: dict | None) -> 'Telemetry | None':
+        """ 由yaml的`telemetry`块创建，没有声明通道时返回None """
+        if not section or not section.get('channels'):
+            return None
+        return cls([str(ch['name']) for ch in section['channels']],
+                   prefix=str(section.get('prefix', DEFAULT_PREFIX)),
+                   capacity=int(section.get('capacity', DEFAULT_CAPACITY)),
+                   window=int(section.get('window', DEFAULT_WINDOW)),
+                   fps=float(section.get('fps', DEFAULT_FPS)))
+
+    def frame_pattern(self, head: bytes, tail: bytes) -> re.Pattern:
+        """ 匹配原始数据中完整遥测帧(含换行)的正则，用于从收发信息中去掉遥测帧 """
+        return re.compile(re.escape(head + self._tag) + rb'[^\n]*?' + re.escape(tail) + rb'\r?\n?')
+
+    def frame_stripper(self, head: bytes, tail: bytes) -> 'FrameStripper':
+        """ 从收发信息中去掉遥测帧的过滤器 """
+        return FrameStripper(self.frame_pattern(head, tail), head + self._tag)
+
+    @property
+    def n_channels(self) -> int:
+        return len(self.names)
+
+    def feed(self, frames: Iterable[Frame]) -> int:
+        """ 取出遥测帧中的数值，返回新增的样本数 """
+        tag, n = self._tag, self.n_channels
+        payloads = [f.payload for f in frames if f.kind is FrameKind.FRAMED and f.payload.startswith(tag)]
+        if not payloads:
+            return 0
+        good = [p[len(tag):] for p in payloads if p.count(b',') == n - 1]
+        self.bad_frames += len(payloads) - len(good)
+        values = self._parse(b','.join(good))
+        if values is None or values.size != len(good) * n:  # 有无法解析的数值，逐帧解析并跳过错误的帧
+            rows = [v for v in map(self._parse, good) if v is not None and v.size == n]
+            self.bad_frames += len(good) - len(rows)
+            values = np.concatenate(rows) if rows else np.empty(0)
+        if not values.size:
+            return 0
+        samples = values.reshape(-1, n)
+        self.buffer.extend(samples)
+        return len(samples)
+
+    @staticmethod
+    def _parse(text: bytes) -> np.ndarray | None:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)  # 未读到结尾时numpy只给出警告
+            try:
+                return np.fromstring(text, sep=',')
+            except (ValueError, DeprecationWarning):
+                return None
+
+    def latest(self, n: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """ 最近的`n`个样本，返回(样本序号, 数值)，缺省为`window`个 """
+        values = self.buffer.latest(self.window if n is None else n)
+        index = np.arange(self.buffer.total - len(values), self.buffer.total)
+        return index, values
+
+
+class FrameStripper:
+    """ 从连续的原始数据中去掉遥测帧，被两次读取分开的帧留到下一次读取时再去掉 """
+
+    def __init__(self, pattern: re.Pattern, start: bytes) -> None:
+        """ ## Parameter
+        `pattern`完整遥测帧(含换行)的正则，见`Telemetry.frame_pattern`
+        `start`遥测帧的开头，帧头+标识"""
+        self.pattern = pattern
+        self.start = start
+        self._held = b''  # 上一次末尾尚未结束的帧
+
+    def feed(self, data: bytes) -> bytes:
+        """ 返回去掉遥测帧之后可以显示的数据 """
+        data = self._held + data
+        cut = data.rfind(self.start)  # 最后一帧之后还没有换行时保留，换行可能在下一次读取中
+        if cut < 0 or b'\n' in data[cut:]:  # 只需要保留末尾可能是帧开头的部分
+            cut = len(data)
+            for k in range(min(len(self.start) - 1, len(data)), 0, -1):
+                if data.endswith(self.start[:k]):
+                    cut -= k
+                    break
+        if len(data) - cut > MAX_HELD_BYTES:
+            cut = len(data)
+        self._held = data[cut:]
+        return self.pattern.sub(b'', data[:cut])
@@ -0,0 +1 @@
+""" `python -m zyf.window.forms`生成的.ui预编译模块，不纳入版本管理 """
@@ -1,13 +1,11 @@
-import sys
 import datetime
 from functools import partial, wraps
 from PyQt6.QtCore import *
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
-from PyQt6 import uic
 from typing import Literal
 from PyQt6.QtWidgets import QWidget
-from rich import traceback
+from zyf.window.forms import setup_ui
 
 
 CHAT_WID = 200
@@ -27,7 +25,7 @@ class BasicBubble(QWidget):
 
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
-        uic.loadUi('./assets/ui/chat-unit.ui', self)
+        setup_ui(self, './assets/ui/chat-unit.ui')
         self.setMaximumWidth(CHAT_WID)
         self.setMinimumWidth(CHAT_WID)
         self.title_label: QLabel = self.label_2
@@ -77,7 +75,7 @@ class MessageBubbleFrame(QWidget):
     def __init__(self, parent: QWidget = None, *, debug=False) -> None:
         super().__init__(parent)
         self.is_debug = debug
-        uic.loadUi('./assets/ui/chat-frame.ui', self)
+        setup_ui(self, './assets/ui/chat-frame.ui')
         self.scrollWidget: QWidget = self.chat_widget
         self.addBtn: QPushButton = self.pushButton
         self.subBtn: QPushButton = self.pushButton_2
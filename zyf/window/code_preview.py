@@ -1,12 +1,9 @@
-import os
-from pprint import pprint
-from copy import deepcopy
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
 from typing import Literal
 from PyQt6.QtCore import *
-from PyQt6 import uic
 from zyf.console import CodingFileNames, Console
+from zyf.window.forms import setup_ui
 
 CODE_PREVIEW_UI = './assets/ui/code_preview.ui'
 
@@ -84,7 +81,7 @@ class CodeWindow(QDialog):
             QDialog.__init__(self, parent, *args, **kwargs)
 
         self.console = console
-        uic.loadUi(CODE_PREVIEW_UI, self)
+        setup_ui(self, CODE_PREVIEW_UI)
         self.setWindowTitle('高亮代码预览')
         self.mainBrowser: QTextBrowser = self.textBrowser
         self.funcBrowser: QTextBrowser = self.textBrowser_2
@@ -92,6 +89,7 @@ class CodeWindow(QDialog):
         self.highlighter1 = CppHighlighter(self.mainBrowser.document())
         self.highlighter2 = CppHighlighter(self.funcBrowser.document())
         self.highlighter3 = CppHighlighter(self.headBrowser.document())
+        self._shown_codes: dict[QTextBrowser, str] = {}  # 正在显示的代码，未变化时不重新排版和高亮
 
         self.save_pushButton.clicked.connect(self.console.save_codings)
         self.pushButton_2.clicked.connect(self.close)
@@ -105,7 +103,11 @@ class CodeWindow(QDialog):
         super().show()
 
     def Update_Coding(self):
-        self.mainBrowser.setText(self.console.coding('main.c'))
-        self.funcBrowser.setText(self.console.coding('serial_order.c'))
-        self.headBrowser.setText(self.console.coding('serial_order.h'))
+        for browser, fn in ((self.mainBrowser, 'main.c'),
+                            (self.funcBrowser, 'serial_order.c'),
+                            (self.headBrowser, 'serial_order.h')):
+            code = self.console.coding(fn)
+            if self._shown_codes.get(browser) != code:
+                browser.setText(code)
+                self._shown_codes[browser] = code
         
\ No newline at end of file
@@ -0,0 +1,93 @@
+""" .ui文件的加载
+
+运行`python -m zyf.window.forms`把`assets/ui`下的.ui文件预编译为`zyf/window/_forms`中的python模块，
+之后`setup_ui`直接执行编译好的代码，不再在启动时解析XML。
+预编译的模块不存在或比.ui文件旧时，在内存中编译一次。
+两种情况下窗体类都按文件缓存，重复创建控件时不会再次解析XML。
+"""
+
+import io
+import os
+import re
+import functools
+import importlib
+from pathlib import Path
+from PyQt6 import uic
+from PyQt6.QtWidgets import QWidget
+
+UI_FOLDER = Path('./assets/ui')  # .ui文件所在的文件夹
+FORMS_FOLDER = Path(__file__).parent / '_forms'  # 预编译模块所在的文件夹
+FORMS_PACKAGE = 'zyf.window._forms'
+
+_RELATIVE_PATH = re.compile(r'>(\.{1,2}/[^<>]+)<')  # .ui中相对于.ui文件的资源路径
+
+
+def _module_name(ui_path: str | Path) -> str:
+    """ .ui文件对应的模块名，如`chat-unit.ui` -> `ui_chat_unit` """
+    return 'ui_' + re.sub(r'\W', '_', Path(ui_path).stem)
+
+
+def compiled_form(ui_path: str | Path) -> type | None:
+    """ 预编译的窗体类，不存在或已经过期时返回None """
+    name = _module_name(ui_path)
+    try:
+        if (FORMS_FOLDER / f'{name}.py').stat().st_mtime < os.stat(ui_path).st_mtime:
+            return None
+    except FileNotFoundError:
+        return None
+    return importlib.import_module(f'{FORMS_PACKAGE}.{name}').Form
+
+
+def _compile(ui_path: Path) -> tuple[str, str]:
+    """ 把.ui编译为python代码，返回(代码, 窗体类名) """
+    # 编译后的代码以工作目录为基准，需要把相对于.ui文件的资源路径转换过来
+    text = _RELATIVE_PATH.sub(
+        lambda m: f'>./{Path(os.path.relpath(os.path.normpath(ui_path.parent / m[1]))).as_posix()}<',
+        ui_path.read_text(encoding='utf-8'))
+    out = io.StringIO()
+    uic.compileUi(io.StringIO(text), out)
+    code = out.getvalue()
+    class_name = re.search(r'^class (Ui_\w+)\(', code, re.M)[1]
+    code = re.sub(r"reading ui file '.*'", f"reading ui file '{ui_path.as_posix()}'", code, count=1)
+    return code, class_name
+
+
+@functools.cache
+def _form_class(ui_path: Path) -> type:
+    form = compiled_form(ui_path)
+    if form is None:
+        code, class_name = _compile(ui_path)
+        namespace = {}
+        exec(compile(code, str(ui_path), 'exec'), namespace)
+        form = namespace[class_name]
+    return form
+
+
+def form_class(ui_path: str | Path) -> type:
+    """ .ui文件对应的窗体类，每个文件只编译一次 """
+    return _form_class(Path(os.path.normpath(ui_path)))
+
+
+def setup_ui(widget: QWidget, ui_path: str | Path):
+    """ 在`widget`上创建.ui中的控件，与`uic.loadUi(ui_path, widget)`的效果相同 """
+    ui = form_class(ui_path)()
+    ui.setupUi(widget)
+    for k, v in vars(ui).items():  # 与loadUi一样，把子控件设置为widget的属性
+        setattr(widget, k, v)
+
+
+def compile_forms(ui_folder: str | Path = UI_FOLDER) -> list[Path]:
+    """ 预编译文件夹下全部的.ui文件，返回生成的模块 """
+    ui_folder = Path(ui_folder)
+    FORMS_FOLDER.mkdir(exist_ok=True)
+    written = []
+    for ui in sorted(ui_folder.glob('*.ui')):
+        code, class_name = _compile(ui)
+        path = FORMS_FOLDER / f'{_module_name(ui)}.py'
+        path.write_text(f'{code}\n\nForm = {class_name}\n', encoding='utf-8')
+        written.append(path)
+    return written
+
+if __name__ == '__main__':
+    for path in compile_forms():
+        print(f'[信息]已生成{path}')
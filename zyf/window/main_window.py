@@ -1,32 +1,33 @@
 import os
 import re
-import sys
-import attr
-import yaml
 import shutil
 import pathlib
-import inspect
-import pprint
+from copy import deepcopy
 import serial
 import serial.serialutil
-import serial.tools.list_ports
 from typing import Literal
-from icecream import ic
-from functools import partial, wraps
+from functools import partial
 from zyf.window.turntable import Turntable
-from zyf.console import Console, Orders
+from zyf.console import Console
+from zyf.console.config import YamlStyleError
+from zyf.console.parser import FrameParser, FrameKind
 from zyf.window.setting_window import SettingWindow
-from zyf.window.bubble import MessageBubbleFrame, MessageBubbleUnit
+from zyf.window.bubble import MessageBubbleFrame
 from zyf.window.code_preview import CodeWindow
+from zyf.window.forms import setup_ui
+from zyf.window.param_table import ParamTableModel, setup_param_table
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
 from PyQt6.QtCore import *
-from PyQt6 import uic
 
 MAIN_UI = './assets/ui/main-manager.ui'  # 主窗口的UI文件
 MAIN_ICO = './assets/ico/usb1.png'  # 主窗口的图标文件
+CURRENT_PROJECT_STYLE = '*{color: green; font-weight: bold; text-align: left;}'  # 当前文件按键的样式
 
 BAUDRATES = (300, 1200, 2400, 4800, 9600, 14400, 19200, 38400, 57600, 115200)  # 右键菜单的波特率
+MAX_LOG_LINES = 5000  # 收发信息最多保留的行数
+MAX_LOG_CHARS = 1_000_000  # 收发信息最多保留的字符数
+WATCH_DEBOUNCE_MS = 300  # 文件变化后等待的时间，编辑器保存时的多次变化只处理一次
 
 
 def text2html(text: str) -> str:
@@ -53,7 +54,7 @@ class ShortcutUnit(QWidget):
         self.id = id_
         self.mw = mw
         super().__init__(parent, *args, **kwargs)
-        uic.loadUi('./assets/ui/shortcut_unit.ui', self)
+        setup_ui(self, './assets/ui/shortcut_unit.ui')
         self.setToolTip(define)
         self.edit_btn.clicked.connect(self._edit_event)
         self.send_btn.clicked.connect(self._send_event)
@@ -89,7 +90,7 @@ class ShortcutAndHistory(QDialog):
         self.console = console
         self.mw = parent
         super().__init__(parent, *args, **kwargs)
-        uic.loadUi('./assets/ui/shortcut_or_history.ui', self)
+        setup_ui(self, './assets/ui/shortcut_or_history.ui')
         self.update_btn.clicked.connect(self._update_shortcut)
         self.ok_btn.clicked.connect(self.close)
         self.end_btn.clicked.connect(self.close)
@@ -113,56 +114,6 @@ class ShortcutAndHistory(QDialog):
             self.shortcut_list.append(newsc)
 
 
-class ParamUnit(QWidget):
-    """ 参数列表单元
-
-    每行分别代表各自的参数信息，其从左到右依次是 标题,化名,数值,写入 四个列。可以通过更改数值然后点击‘写入’按钮进行更改实际值"""
-
-    def __init__(self, console: Console, id_: int, parent=None, *args, **kwargs):
-        super().__init__(parent, *args, **kwargs)
-        uic.loadUi('./assets/ui/param_unit.ui', self)
-        self.console = console
-        self.id = id_
-        self.parent_: MainWindow = parent  # 直接引用
-        self.param = self.console.data['parameter', 'infos', id_]
-        self.label.setText(self.param['title'])
-        self.label_2.setText(self.param['alias'])
-        self.lineEdit: QLineEdit
-        values = self.console.data['parameter', 'values', self.console.group_index, 'details', id_]
-        self.lineEdit.setText(str(values))
-        self.pushButton.clicked.connect(self._write)
-        
-    @property
-    def order(self) -> str | None:
-        try:
-            v = float(self.lineEdit.text())
-        except:
-            self.parent_.subBubbleFrame.add_message(
-                type_='warn', title='数值类型不合规', info=f'{self.param["alias"]}的值({v})类型错误')
-            return None
-        return f'[0:{self.id},{v}]'
-
-    def _write(self):
-        """ 按钮的事件 """
-        try:
-            v = float(self.lineEdit.text())
-            order, e = self.console.make_param_order(self.param["alias"],v)  # 发送指令并获取发送的指令的详细文本信息
-        except Exception as e:
-            pass
-        
-        if e is None:
-            # self.parent_.subBubbleFrame.add_message(
-            #     title='发送调参信息', info=f'{self.param["title"]} {self.param["alias"]}={v}\n{order}')
-            self.parent_.subBubbleFrame.add_message(
-                 title='发送调参信息', info=f'{order}')
-            self.parent_.append_send_recv_info(f'设置{order}', 'tips')
-            self.parent_.append_send_recv_info_signal.emit(order, 'send')
-        elif isinstance(e, serial.PortNotOpenError):
-            self.parent_.subBubbleFrame.add_message(type_='warn', title='串口未打开')
-            self.parent_.append_send_recv_info(f'"<< {order}" 发送无效', 'tips')
-        self.parent_.reload_from_yaml()  # 刷新
-
-
 class SerialInfoHighlighter(QSyntaxHighlighter):
     def __init__(self, document):
         super().__init__(document)
@@ -191,35 +142,77 @@ class SerialInfoHighlighter(QSyntaxHighlighter):
             self.setFormat(matched.capturedStart(0), matched.capturedLength(), format)
 
 
+class SerialLogView:
+    """ 只追加的收发信息显示
+
+    通过`QTextCursor`在文档末尾插入新的文本，只有新增的文本块需要排版和高亮。
+    超出`max_lines`行或`max_chars`个字符时从头部删除最旧的行，单条信息的开销与会话长度无关"""
+
+    def __init__(self, browser: QTextBrowser, *, max_lines: int = MAX_LOG_LINES, max_chars: int = MAX_LOG_CHARS):
+        self.browser = browser
+        self.document = browser.document()
+        self.document.setMaximumBlockCount(max_lines)  # 由Qt维护按行的环形缓冲
+        self.max_chars = max_chars
+        self._cursor = QTextCursor(self.document)
+
+    def append(self, text: str):
+        """ 在末尾追加纯文本，若原本停留在底部则继续跟随滚动 """
+        bar = self.browser.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum()
+        self._cursor.movePosition(QTextCursor.MoveOperation.End)
+        self._cursor.insertText(text)
+        self._trim()
+        if at_bottom:
+            bar.setValue(bar.maximum())
+
+    def clear(self):
+        self.document.clear()
+
+    def _trim(self):
+        """ 删除超出字符上限的最旧的行 """
+        overflow = self.document.characterCount() - self.max_chars
+        if overflow <= 0:
+            return
+        block = self.document.findBlock(overflow)
+        end = min(block.position() + block.length(), self.document.characterCount() - 1)
+        cursor = QTextCursor(self.document)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+
+
 class MainWindow(QMainWindow):
     """ 主窗口(前端)，只进行显示和调用后端接口 
 
     需要传入对应的`Console`对象供以调用后端数据"""
 
     append_send_recv_info_signal = pyqtSignal(str, str)
+    serial_data_ready_signal = pyqtSignal()  # 读取线程有新数据时发出
 
     def __init__(self, console: Console, *args, **kwargs):
         """ ## Parameter
         `console`后端控制台，所有后端接口从这里调用"""
         super().__init__(*args, **kwargs)
-        uic.loadUi(MAIN_UI, self)
+        setup_ui(self, MAIN_UI)
         self.setWindowIcon(QIcon(MAIN_ICO))
         self.setWindowTitle('功能调参窗口 - v2')
         self.console = console
         self.data_path = pathlib.Path('./data')  # 配置文件存储路径
-        self.project_btns = []  # 存放对应按键的引用
+        self.project_btns: dict[str, QPushButton] = {}  # 文件名 -> 对应按键的引用
+        self._project_names: list[str] = None  # ./data中的yaml文件名，目录变化时才重新扫描
+        self._current_project: str = None  # 高亮显示的文件名
+        self._tree_snapshot: tuple = ()  # 大纲树当前显示的内容
+        self._histories_snapshot: tuple = ()  # 历史菜单当前显示的内容
 
-        # <sub window> 创建子窗口
+        # <sub window> 创建子窗口，其余的对话框在第一次打开时才创建
         self.subBubbleFrame = MessageBubbleFrame(self)
         self.action_msg.triggered.connect(self.subBubbleFrame.add_message)
-        self.settingWindow = SettingWindow(self.console, self)
-        self.action_6.triggered.connect(self.settingWindow.exec)
-
-        self.shortcut_window = ShortcutAndHistory(self.console, self)
-        self.code_preview = CodeWindow('QDialog', self.console, self)
-        self.code_widget = CodeWindow('QWidget', self.console, self)
-        self.code_widget.pushButton_2.setEnabled(False)
-        self.code_frame.layout().addWidget(self.code_widget)
+        self._setting_window: SettingWindow = None
+        self._shortcut_window: ShortcutAndHistory = None
+        self._code_preview: CodeWindow = None
+        self.code_widget: CodeWindow = None  # [代码预览]页，切换到该页时才创建
+        self.action_6.triggered.connect(lambda: self.settingWindow.exec())
+        self.tabWidget.currentChanged.connect(self._create_code_widget)
+        self._create_code_widget()  # 启动时已经位于[代码预览]页
 
         # <define> 定义控件和属性
         self.scroll_project_browsing: QWidget
@@ -227,20 +220,28 @@ class MainWindow(QMainWindow):
         self.yaml_histories_menu: QMenu
         self.param_adjust_stackArea: QStackedWidget = self.stackedWidget
         # list
-        self.param_adjust_srocllWidget: QWidget = self.scrollAreaWidgetContents
-        self.param_adjust_list = []
+        self.param_tableView: QTableView
+        self.param_model = ParamTableModel(self.console, self)
+        self.param_model.written.connect(self._param_written)
+        setup_param_table(self.param_tableView, self.param_model)
         # wheel
         self.param_adjust_wheel = Turntable(self, n_items=9)
         self.groupBox_5.layout().addWidget(self.param_adjust_wheel)
         # tree
         self._tree_model = QStandardItemModel()  # 创建 QStandardItemModel 对象
         self.treeView.setModel(self._tree_model)  # 将模型设置为 QTreeView 的数据源
+        self.treeView.doubleClicked.connect(self._switch_group_event)  # 双击数值组，整组写入
 
         self.serial_textBrowser: QTextBrowser
         # 高亮显示
         self.hlter = SerialInfoHighlighter(self.serial_textBrowser.document())
+        self.serial_log = SerialLogView(self.serial_textBrowser)
         self._last_serial_type = None
-        self.hlter_text = ''
+        self.frame_parser: FrameParser = None  # 解析MCU的回复，帧头帧尾变化时重新创建
+        self.telemetry = None  # 遥测数据(zyf.console.telemetry.Telemetry)，yaml中没有声明时为None
+        self.telemetry_plot = None  # [实时曲线]页
+        self._telemetry_config = None  # 创建遥测时的yaml配置
+        self._telemetry_frames = None  # 从收发信息中去掉遥测帧(zyf.console.telemetry.FrameStripper)
         self.append_send_recv_info('注释', 'tips')
         self.append_send_recv_info('发送', 'send')
         self.append_send_recv_info('接收1', 'recv')
@@ -252,33 +253,37 @@ class MainWindow(QMainWindow):
         # <connect> 绑定事件
         self.action_1.triggered.connect(partial(self.param_adjust_stackArea.setCurrentIndex, 0))  # 切换为轮盘模式
         self.action_14.triggered.connect(partial(self.param_adjust_stackArea.setCurrentIndex, 1))  # 切换为列表模式
-        self.action_C.triggered.connect(self.code_preview.exec)  # 生成C代码预览
+        self.action_C.triggered.connect(lambda: self.code_preview.exec())  # 生成C代码预览
         self.action_N.triggered.connect(self.make_new_file)  # 创建新文件
         self.pushButton.clicked.connect(self.make_new_file)  # 创建新文件
         self.pushButton_8.clicked.connect(self.reload_from_yaml)
-        self.pushButton_17.clicked.connect(self.shortcut_window.exec)  # 调用快捷指令的模态窗口
-        self.pushButton_20.clicked.connect(self.shortcut_window.exec)
+        self.pushButton_8.clicked.connect(partial(self._on_data_changed, str(self.data_path)))  # 手动刷新时也重新扫描./data
+        self.pushButton_17.clicked.connect(lambda: self.shortcut_window.exec())  # 调用快捷指令的模态窗口
+        self.pushButton_20.clicked.connect(lambda: self.shortcut_window.exec())
         self.append_send_recv_info_signal.connect(self.append_send_recv_info)
+        self.action_record = QAction('记录会话', self)  # 记录收发的全部数据到./logs
+        self.action_record.setCheckable(True)
+        self.action_record.toggled.connect(self._toggle_recording)
+        self.menu_T.addAction(self.action_record)
 
         # <initial> 其他初始化
-        # 设置定时器，自动刷新后端数据，刷线显示信息
-        self._reload_timer = QTimer(self)
-        self._reload_timer.timeout.connect(self.reload_from_yaml)
-        # self._reload_timer.start(10000)  # 每隔1000ms刷新
+        # 监视./data和当前的yaml，外部修改时只重新加载变化的部分，不再定时刷新
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_data_changed)
+        self._watcher.fileChanged.connect(self._on_config_changed)
+        self._watcher.addPath(str(self.data_path))
+        self._watched_config: str = None  # 正在监视的yaml
+        self._data_changed = self._config_changed = False
+        self._watch_debounce = QTimer(self)
+        self._watch_debounce.setSingleShot(True)
+        self._watch_debounce.setInterval(WATCH_DEBOUNCE_MS)
+        self._watch_debounce.timeout.connect(self._apply_file_changes)
         self.reload_from_yaml()
 
-        # 接收串口信息
-        self._reader = QTimer(self)
-
-        def _read_serial():
-            if not self.console.serial.is_open:
-                return
-            bytes = self.console.serial.read_all()
-            if bytes:
-                text = bytes.decode(self.console.dct['read encoding'])
-                self.append_send_recv_info(text, 'recv')
-        self._reader.timeout.connect(_read_serial)
-        self._reader.start(100)  # 100ms读取一次
+        # 接收串口信息，由后台读取线程通知，在GUI线程中批量取走
+        self._reported_dropped = 0
+        self.console.reader.notify = self.serial_data_ready_signal.emit
+        self.serial_data_ready_signal.connect(self._read_serial)
 
         # disable
         self.comboBox_8.setEnabled(False)
@@ -292,12 +297,43 @@ class MainWindow(QMainWindow):
         self.pushButton_14.setEnabled(False)
         self.pushButton_15.setEnabled(False)
 
+    @property
+    def settingWindow(self) -> SettingWindow:
+        """ 设置窗口，第一次使用时创建 """
+        if self._setting_window is None:
+            self._setting_window = SettingWindow(self.console, self)
+        return self._setting_window
+
+    @property
+    def shortcut_window(self) -> ShortcutAndHistory:
+        """ 快捷指令和历史回顾的对话框，第一次使用时创建 """
+        if self._shortcut_window is None:
+            self._shortcut_window = ShortcutAndHistory(self.console, self)
+        return self._shortcut_window
+
+    @property
+    def code_preview(self) -> CodeWindow:
+        """ 代码预览的对话框，第一次使用时创建 """
+        if self._code_preview is None:
+            self._code_preview = CodeWindow('QDialog', self.console, self)
+        return self._code_preview
+
+    def _create_code_widget(self):
+        """ 第一次切换到[代码预览]页时创建代码显示 """
+        if self.code_widget is not None or self.tabWidget.currentWidget() is not self.tab_2:
+            return
+        self.code_widget = CodeWindow('QWidget', self.console, self)
+        self.code_widget.pushButton_2.setEnabled(False)
+        self.code_frame.layout().addWidget(self.code_widget)
+        self.code_widget.Update_Coding()
+
     def _serial_init(self):
         """  """
         self.ser_port: QComboBox  # 串口号下拉框
 
         def _wrap(this: QComboBox):
             """ 修饰后，展开自动检测可用值 """
+            import serial.tools.list_ports  # 只在展开时才需要
             this.clear()
             ports = serial.tools.list_ports.comports()
             if ports:
@@ -357,13 +393,13 @@ class MainWindow(QMainWindow):
     def open_close_serial(self):
         """ 开启或者关闭串口 """
         if self.console.serial.is_open:  # open -> close
-            self.console.serial.close()
+            self.console.close_serial()
             self.open_serial.setText('启用串口')
             self.open_serial.setStyleSheet(self.btn_default_style)
             self.subBubbleFrame.add_message(title='串口已关闭')
         else:  # close -> open
             try:
-                self.console.serial.open()
+                self.console.open_serial()
                 self.open_serial.setText('关闭串口')
                 self.open_serial.setStyleSheet("background-color: #1dd46c;")
                 self.subBubbleFrame.add_message(title='串口已打开')
@@ -371,6 +407,75 @@ class MainWindow(QMainWindow):
                 print(e.args)
                 self.subBubbleFrame.add_message(type_='warn', title='串口开启失败', info=e.args[0])
 
+    def closeEvent(self, event: QCloseEvent):
+        """ 关闭窗口时停止读取线程，并保存尚未写入的修改 """
+        self.console.close_serial()
+        self.console.stop_recording()
+        self.console.data.flush()
+        super().closeEvent(event)
+
+    def _toggle_recording(self, checked: bool):
+        """ 开始或者停止记录会话 """
+        if checked:
+            try:
+                path = self.console.start_recording()
+            except OSError as e:
+                self.subBubbleFrame.add_message(type_='warn', title='无法记录会话', info=str(e))
+                self.action_record.setChecked(False)
+                return
+            self.subBubbleFrame.add_message(title='开始记录会话', info=str(path))
+        else:
+            path = self.console.stop_recording()
+            if path is not None:
+                self.subBubbleFrame.add_message(title='会话记录已保存', info=str(path))
+
+    def _switch_group_event(self, index: QModelIndex):
+        """ 切换到双击的数值组，并一次性发送该组的全部参数 """
+        if index.parent().isValid():  # 只响应数值组节点
+            return
+        title = self.console.data['parameter', 'values', index.row(), 'title']
+        order, e = self.console.switch_group(index.row())
+        if e is None:
+            self.subBubbleFrame.add_message(title='切换数值组', info=f'{title}\n{order}')
+            self.append_send_recv_info(f'切换到{title}', 'tips')
+            self.append_send_recv_info_signal.emit(order, 'send')
+        elif isinstance(e, serial.PortNotOpenError):
+            self.subBubbleFrame.add_message(type_='warn', title='串口未打开')
+            self.append_send_recv_info(f'"<< {order}" 发送无效', 'tips')
+        self.reload_from_yaml()  # 刷新
+
+    def _param_written(self, row: int, order: str, e: Exception | None):
+        """ 参数列表写入后显示结果 """
+        if e is None:
+            self.subBubbleFrame.add_message(title='发送调参信息', info=f'{order}')
+            self.append_send_recv_info(f'设置{order}', 'tips')
+            self.append_send_recv_info_signal.emit(order, 'send')
+        elif isinstance(e, serial.PortNotOpenError):
+            self.subBubbleFrame.add_message(type_='warn', title='串口未打开')
+            self.append_send_recv_info(f'"<< {order}" 发送无效', 'tips')
+        self.reload_from_yaml()  # 刷新
+
+    def _read_serial(self):
+        """ 取走读取线程中积累的全部数据并显示 """
+        data = self.console.reader.drain()
+        if data:
+            frames = self.frame_parser.feed(data)
+            if self.telemetry is not None:
+                self.telemetry.feed(frames)
+                data = self._telemetry_frames.feed(data)  # 遥测帧只显示在曲线中
+            if data:
+                text = data.decode(self.console.dct['read encoding'], errors='replace')
+                self.append_send_recv_info(text, 'recv')
+            for frame in frames:
+                if frame.kind is FrameKind.WARNING:
+                    self.subBubbleFrame.add_message(
+                        type_='warn', title='MCU警告',
+                        info=frame.payload.decode(self.console.dct['read encoding'], errors='replace'))
+        dropped = self.console.reader.stats.dropped_bytes
+        if dropped != self._reported_dropped:
+            self.append_send_recv_info(f'接收缓冲溢出，共丢弃{dropped}字节', 'tips')
+            self._reported_dropped = dropped
+
     def _update_serial_config(self):
         """ 更改串口配置后触发，同步更新console配置 """
         self.console.set_serial({
@@ -397,85 +502,177 @@ class MainWindow(QMainWindow):
                 raise ValueError()
         if self._last_serial_type is None:
             prefix = prefix.lstrip()
-        self.hlter_text += f'{prefix}{info}'
-        self.serial_textBrowser.setText(self.hlter_text)
+        self.serial_log.append(f'{prefix}{info}')
 
         self._last_serial_type = type_
 
     def reload_from_yaml(self, yaml_path: str | pathlib.Path = None):
-        """ 重新加载相关数据，刷新显示的数据信息 """
+        """ 重新加载相关数据，刷新显示的数据信息
+
+        与上次显示的内容比较，只更新变化的控件，结构没有变化时不重新创建"""
         if yaml_path:
             if os.path.isfile(yaml_path):
                 self.console.load(yaml_path if isinstance(yaml_path, str) else yaml_path.absolute())
             else:
                 print(f'[警告]文件{yaml_path}不存在')
-        # 更新[项目浏览]按钮
+        self._watch_config()
+        rebuilt = self._refresh_projects()
+        self._refresh_parser()
+        self._refresh_telemetry()
+        rebuilt |= self._refresh_tree()
+        self._refresh_histories()
+        rebuilt |= self.param_model.refresh()
+        # TODO 更新参数轮盘
+        if rebuilt:
+            self.subBubbleFrame.add_message(type_='debug', title='更新数据显示', info=str(self.console.yaml_path))
+
+        if self.code_widget is not None:
+            self.code_widget.Update_Coding()  # 更新代码显示(内容未变时跳过)
+
+    def _watch_config(self):
+        """ 监视当前加载的yaml，切换文件时替换 """
+        path = os.path.abspath(self.console.yaml_path)
+        if self._watched_config is not None and self._watched_config != path:
+            self._watcher.removePath(self._watched_config)
+        if path not in self._watcher.files() and os.path.isfile(path):  # 文件被替换后需要重新添加
+            self._watcher.addPath(path)
+        self._watched_config = path
+
+    def _on_data_changed(self, path: str):
+        self._data_changed = True
+        self._watch_debounce.start()
+
+    def _on_config_changed(self, path: str):
+        self._config_changed = True
+        self._watch_debounce.start()
+
+    def _apply_file_changes(self):
+        """ 文件变化稳定后刷新，自己保存yaml引起的变化被忽略 """
+        data_changed, config_changed = self._data_changed, self._config_changed
+        self._data_changed = self._config_changed = False
+        if data_changed:
+            self._project_names = None
+        if config_changed:
+            self._watch_config()  # 编辑器和Config保存时都会替换文件，原来的监视已经失效
+            data = self.console.data
+            if data.is_changed_on_disk:
+                try:
+                    data.reload()
+                except (OSError, YamlStyleError) as e:
+                    self.subBubbleFrame.add_message(type_='warn', title='外部修改的yaml无法加载', info=str(e))
+                else:
+                    self.subBubbleFrame.add_message(title='yaml被外部修改，已重新加载', info=str(data.yaml_path))
+                    self.reload_from_yaml()
+                    return
+        if data_changed:
+            self._refresh_projects()
+
+    def _refresh_projects(self) -> bool:
+        """ 更新[项目浏览]按钮，只增删变化的文件，返回是否有变化 """
         layout = self.scroll_project_browsing.layout()
-        for btn in self.project_btns:
+        if self._project_names is None:  # 只在启动和目录变化后扫描
+            self._project_names = sorted(fn for fn in os.listdir(self.data_path) if fn.split('.')[-1] == 'yaml')
+        names = self._project_names
+        changed = False
+        for fn in [fn for fn in self.project_btns if fn not in names]:
+            btn = self.project_btns.pop(fn)
             layout.removeWidget(btn)
-            del btn
-        self.project_btns = []
-        for fn in [fn for fn in os.listdir(self.data_path) if fn.split('.')[-1] == 'yaml']:
+            btn.deleteLater()
+            changed = True
+        for fn in names:
+            if fn in self.project_btns:
+                continue
             btn = QPushButton(self)
             btn.clicked.connect(partial(self.reload_from_yaml, self.data_path / fn))
             btn.setIcon(QIcon('./assets/ico/v.png'))
             btn.setProperty('is_project_btn', True)
             btn.setText(fn)
-            # 高亮当前文件
-            if (self.data_path / fn).samefile(self.console.current_loading):
-                btn.setStyleSheet('''*{
-                    color: green;
-                    font-weight: bold;
-                    text-align: left;
-                }''')
-            self.project_btns.append(btn)
+            self.project_btns[fn] = btn
             layout.insertWidget(0, btn)
-
-        # 更新[查看大纲]树
-        # 创建根节点
+            changed = True
+
+        # 高亮当前文件，只解析一次当前路径，不再对每个文件调用samefile
+        current = pathlib.Path(self.console.current_loading).resolve()
+        current = current.name if current.parent == self.data_path.resolve() else None
+        if current != self._current_project or changed:
+            for fn, btn in self.project_btns.items():
+                btn.setStyleSheet(CURRENT_PROJECT_STYLE if fn == current else '')
+            self._current_project = current
+        return changed
+
+    def _refresh_parser(self):
+        """ 接收数据的帧头帧尾变化时重新创建解析器 """
+        parser = FrameParser.from_setting(self.console.data.get('setting'))
+        if self.frame_parser is None or (parser.head, parser.tail) != (self.frame_parser.head, self.frame_parser.tail):
+            self.frame_parser = parser
+            if self.telemetry is not None:
+                self._telemetry_frames = self.telemetry.frame_stripper(parser.head, parser.tail)
+
+    def _refresh_telemetry(self):
+        """ yaml中的遥测配置变化时重新创建遥测数据和[实时曲线]页 """
+        section = self.console.data.get('telemetry')
+        if section == self._telemetry_config:
+            return
+        self._telemetry_config = deepcopy(section)
+        if self.telemetry_plot is not None:
+            self.tabWidget.removeTab(self.tabWidget.indexOf(self.telemetry_plot))
+            self.telemetry_plot.deleteLater()
+            self.telemetry = self.telemetry_plot = None
+        if section and section.get('channels'):
+            from zyf.console.telemetry import Telemetry  # 用到时才加载numpy
+            from zyf.window.telemetry_plot import TelemetryPlot
+            self.telemetry = Telemetry.from_config(section)
+            self._telemetry_frames = self.telemetry.frame_stripper(self.frame_parser.head, self.frame_parser.tail)
+            self.telemetry_plot = TelemetryPlot(self.telemetry, self)
+            self.tabWidget.addTab(self.telemetry_plot, '实时曲线')
+
+    def _refresh_tree(self) -> bool:
+        """ 更新[查看大纲]树，结构相同时只改变化的单元格，返回是否重建 """
+        infos = self.console.data['parameter', 'infos']
+        snapshot = tuple(
+            (value['title'], tuple(f'{info["alias"]}\t{v}' for info, v in zip(infos, value['details'])))
+            for value in self.console.data['parameter', 'values'])
+        if snapshot == self._tree_snapshot:
+            return False
         root_item = self._tree_model.invisibleRootItem()
-        # 删除旧节点
-        for row in range(root_item.rowCount()):
-            root_item.removeRow(0)
-        # 添加子节点
+        old, self._tree_snapshot = self._tree_snapshot, snapshot
+        if len(old) == len(snapshot) and all(len(o[1]) == len(n[1]) for o, n in zip(old, snapshot)):
+            for row, ((old_title, old_cells), (title, cells)) in enumerate(zip(old, snapshot)):
+                value_item = root_item.child(row)
+                if title != old_title:
+                    value_item.setText(title)
+                for i, (old_text, text) in enumerate(zip(old_cells, cells)):
+                    if text != old_text:
+                        value_item.child(i).setText(text)
+            return False
+
+        root_item.removeRows(0, root_item.rowCount())
         font = QFont()
         font.setFamily("Consolas")
         font.setPointSize(10)
-        for value in self.console.data['parameter', 'values']:
-            value_item = QStandardItem(value['title'])
+        for title, cells in snapshot:
+            value_item = QStandardItem(title)
             root_item.appendRow(value_item)
-            for info, v in zip(self.console.data['parameter', 'infos'], value['details']):
-                v_item = QStandardItem(f'{info["alias"]}\t{v}')
+            for text in cells:
+                v_item = QStandardItem(text)
                 v_item.setFont(font)
                 value_item.appendRow(v_item)
         self.treeView.expandAll()
-        self.subBubbleFrame.add_message(type_='debug', title='更新数据显示', info=str(self.console.yaml_path))
+        return True
 
-        # 更新使用的yaml历史
-        for action in self.yaml_histories_menu.actions():
-            self.yaml_histories_menu.removeAction(action)
-        for yaml_path in self.console.loading_histories[::-1]:
+    def _refresh_histories(self):
+        """ 更新使用的yaml历史菜单，历史没有变化时跳过 """
+        snapshot = tuple(self.console.loading_histories[::-1])
+        if snapshot == self._histories_snapshot:
+            return
+        self._histories_snapshot = snapshot
+        self.yaml_histories_menu.clear()
+        for yaml_path in snapshot:
             action = QAction(self)
             action.setText(yaml_path)
             action.triggered.connect(partial(self.reload_from_yaml, yaml_path))
             self.yaml_histories_menu.addAction(action)
 
-        # <更新参数列表>
-        # 删除旧的字段
-        for w in self.param_adjust_list:
-            self.param_adjust_srocllWidget.layout().removeWidget(w)
-            del w
-        self.param_adjust_list = []
-        # 增加新的字段
-        for i in reversed(range(len(self.console.data['parameter', 'infos']))):
-            w = ParamUnit(self.console, i, self)
-            self.param_adjust_list.append(w)
-            self.param_adjust_srocllWidget.layout().insertWidget(1, w)
-
-        # TODO 更新参数轮盘
-
-        self.code_widget.Update_Coding()  # 更新代码显示
-
     def make_new_file(self):
         """ 新建文件 """
         folder = pathlib.Path('./data')
@@ -0,0 +1,185 @@
+""" 参数列表的表格模型
+
+参数列表使用`QTableView`+`ParamTableModel`显示，只绘制可见的行，
+参数再多也不会为每个参数创建控件。数值列由`ValueDelegate`编辑，
+写入列由`WriteButtonDelegate`绘制为按键，点击后通过`Console.post_param_order`放入发送队列，
+连续点击同一参数时只发送最新的数值。
+"""
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt6.QtGui import QColor, QDoubleValidator
+from PyQt6.QtWidgets import (QApplication, QStyledItemDelegate, QStyleOptionButton, QStyle,
+                             QLineEdit, QTableView, QHeaderView, QAbstractItemView)
+from zyf.console import Console
+
+TITLE, ALIAS, VALUE, WRITE = range(4)
+""" 表格的列 """
+
+HEADERS = ('| Title', '| Alias', '| Value', '| Write')
+PENDING_COLOR = QColor('#1d6ad4')  # 已编辑但未写入的数值的颜色
+
+
+class ParamTableModel(QAbstractTableModel):
+    """ 参数列表的数据模型
+
+    每行是一个参数，从左到右依次是 标题,化名,数值,写入 四列。
+    编辑数值列只会暂存，点击写入列后才发送并保存"""
+
+    written = pyqtSignal(int, str, object)  # (行, 命令文本, Exception或None)
+    _sent = pyqtSignal(int, int, float, str, object)  # 发送线程 -> GUI线程: (数值组, 行, 数值, 命令文本, Exception或None)
+
+    def __init__(self, console: Console, parent=None):
+        super().__init__(parent)
+        self.console = console
+        self._infos: list[tuple[str, str]] = []  # 每行的(标题, 化名)
+        self._values: list = []  # 当前数值组中每行的值
+        self._pending: dict[int, float] = {}  # 行 -> 编辑后尚未写入的值
+        self._group: int | None = None  # 显示的数值组，切换后暂存的值不再适用
+        self._sent.connect(self._on_sent, Qt.ConnectionType.QueuedConnection)
+
+    def refresh(self) -> bool:
+        """ 与yaml中的数据同步，参数定义不变时只通知数值变化的行，返回是否重置
+
+        切换数值组后丢弃暂存的值，它们是在另一组数值上编辑的"""
+        group = self.console.group_index
+        infos = [(info['title'], info['alias']) for info in self.console.data['parameter', 'infos']]
+        values = list(self.console.data['parameter', 'values', group, 'details'])
+        if infos != self._infos:
+            self.beginResetModel()
+            self._infos, self._values, self._group = infos, values, group
+            self._pending.clear()
+            self.endResetModel()
+            return True
+        changed = set(self._pending) if group != self._group else set()
+        if changed:
+            self._pending.clear()
+        self._group = group
+        for row, (old, new) in enumerate(zip(self._values, values)):
+            if old != new:
+                self._values[row] = new
+                changed.add(row)
+        for row in sorted(changed):
+            index = self.index(row, VALUE)
+            self.dataChanged.emit(index, index)
+        return False
+
+    def write(self, row: int):
+        """ 把该行的数值(有暂存的值时为暂存的值)放入发送队列，发送后发出`written` """
+        v, group = float(self._pending.get(row, self._values[row])), self._group
+        self.console.post_param_order(self._infos[row][1], v,
+                                      on_sent=lambda order, e: self._sent.emit(group, row, v, order, e))
+
+    def _on_sent(self, group: int, row: int, v: float, order: str, e: Exception | None):
+        if e is None and group == self._group and row < len(self._values):  # 发送期间切换了数值组时不更新
+            if self._pending.get(row) == v:  # 发送期间又编辑过的值继续暂存
+                self._pending.pop(row)
+            self._values[row] = v
+            index = self.index(row, VALUE)
+            self.dataChanged.emit(index, index)
+        self.written.emit(row, order, e)
+
+    def alias(self, row: int) -> str:
+        return self._infos[row][1]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._infos)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == VALUE:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        match role:
+            case Qt.ItemDataRole.DisplayRole | Qt.ItemDataRole.EditRole:
+                if column in (TITLE, ALIAS):
+                    return self._infos[row][column]
+                if column == VALUE:
+                    return str(self._pending.get(row, self._values[row]))
+                return '写入'
+            case Qt.ItemDataRole.ForegroundRole if column == VALUE and row in self._pending:
+                return PENDING_COLOR
+            case Qt.ItemDataRole.ToolTipRole if column == VALUE and row in self._pending:
+                return f'未写入，当前值为{self._values[row]}'
+        return None
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        """ 暂存编辑后的数值 """
+        if role != Qt.ItemDataRole.EditRole or index.column() != VALUE:
+            return False
+        try:
+            v = float(value)
+        except ValueError:
+            return False
+        if v == self._values[index.row()]:
+            self._pending.pop(index.row(), None)
+        else:
+            self._pending[index.row()] = v
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class ValueDelegate(QStyledItemDelegate):
+    """ 数值列的编辑器，只允许输入数字 """
+
+    def createEditor(self, parent, option, index: QModelIndex) -> QLineEdit:
+        editor = QLineEdit(parent)
+        validator = QDoubleValidator(editor)
+        validator.setNotation(QDoubleValidator.Notation.ScientificNotation)
+        editor.setValidator(validator)
+        return editor
+
+
+class WriteButtonDelegate(QStyledItemDelegate):
+    """ 把写入列绘制为按键，不为每行创建`QPushButton` """
+
+    clicked = pyqtSignal(int)  # 点击的行
+
+    def paint(self, painter, option, index: QModelIndex):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.StateFlag.State_Enabled
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            button.state |= QStyle.StateFlag.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event: QEvent, model, option, index: QModelIndex) -> bool:
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton \
+                and option.rect.contains(event.position().toPoint()):
+            self.clicked.emit(index.row())
+            return True
+        return False
+
+
+def setup_param_table(view: QTableView, model: ParamTableModel):
+    """ 在`view`上使用参数模型和对应的委托 """
+    view.setModel(model)
+    view.value_delegate = ValueDelegate(view)
+    view.write_delegate = WriteButtonDelegate(view)
+    view.write_delegate.clicked.connect(model.write)
+    view.setItemDelegateForColumn(VALUE, view.value_delegate)
+    view.setItemDelegateForColumn(WRITE, view.write_delegate)
+    view.setEditTriggers(QAbstractItemView.EditTrigger.DoubleClicked
+                         | QAbstractItemView.EditTrigger.EditKeyPressed
+                         | QAbstractItemView.EditTrigger.AnyKeyPressed)
+    view.setMouseTracking(True)  # 按键的悬停效果
+    header = view.horizontalHeader()
+    header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+    header.setSectionResizeMode(TITLE, QHeaderView.ResizeMode.Stretch)
+    header.setSectionResizeMode(WRITE, QHeaderView.ResizeMode.Fixed)
+    view.setColumnWidth(WRITE, 60)
+    view.verticalHeader().setDefaultSectionSize(view.fontMetrics().height() + 10)
@@ -1,17 +1,10 @@
-import os
-import attr
-import yaml
-import pathlib
-from icecream import ic
 from functools import partial
-from zyf.window.turntable import Turntable
 from zyf.console import Console
-from zyf.window.bubble import MessageBubbleFrame, MessageBubbleUnit
-from zyf.window.code_preview import CodeWindow
+from zyf.window.bubble import MessageBubbleFrame
+from zyf.window.forms import setup_ui
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
 from PyQt6.QtCore import *
-from PyQt6 import uic
 
 
 class ParamUnit(QWidget):
@@ -19,7 +12,7 @@ class ParamUnit(QWidget):
     def __init__(self, console: Console, parent=None, *args, **kwargs):
         self.console = console
         super().__init__(parent, *args, **kwargs)
-        uic.loadUi('./assets/ui/setting_param.ui', self)
+        setup_ui(self, './assets/ui/setting_param.ui')
         self.title: QLineEdit
         self.alias: QLineEdit
         self.extern_: QLineEdit
@@ -33,7 +26,7 @@ class SettingWindow(QDialog):
         self.console = console
         self.parent_bubble: MessageBubbleFrame = parent.subBubbleFrame  # 用于提示错误信息
         super().__init__(parent, *args, **kwargs)
-        uic.loadUi('./assets/ui/setting.ui', self)
+        setup_ui(self, './assets/ui/setting.ui')
         self.setWindowTitle('设置窗口')
         self.paramInfoList = []  # 子控件的引用，方便调用
         self.paramValueList = []
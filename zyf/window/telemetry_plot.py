@@ -0,0 +1,89 @@
+""" 遥测数据的实时曲线
+
+`TelemetryPlot`按`Telemetry.fps`定时检查，只有新样本到达时才重绘；
+每个像素列只画该列样本的最小值和最大值，绘制的点数与样本数无关。
+"""
+
+import numpy as np
+from PyQt6.QtCore import Qt, QTimer, QPointF, QRectF
+from PyQt6.QtGui import QPainter, QPen, QColor, QPolygonF
+from PyQt6.QtWidgets import QWidget
+from zyf.console.telemetry import Telemetry
+
+COLORS = ('#1d6ad4', '#e0452b', '#1dd46c', '#d4a11d', '#9b4fd4', '#1dc4d4', '#d41d8c', '#6b6b6b')
+""" 各通道曲线的颜色，超过后循环使用 """
+
+MARGIN = 8  # 曲线四周的留白(px)
+
+
+def decimate(values: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """ 把(样本数, 通道数)的数据压缩到`width`列，每列取最小值和最大值
+
+    返回(横坐标[0, 1], 数值)，样本数不多于2*width时原样返回"""
+    m = len(values)
+    if m <= 2 * width or width <= 0:
+        return np.linspace(0, 1, m) if m > 1 else np.zeros(m), values
+    step = m // width
+    cols = m // step
+    blocks = values[m - cols * step:].reshape(cols, step, -1)
+    lo, hi = np.nanmin(blocks, axis=1), np.nanmax(blocks, axis=1)
+    out = np.empty((cols * 2, values.shape[1]))
+    out[0::2], out[1::2] = lo, hi
+    return np.repeat(np.linspace(0, 1, cols), 2), out
+
+
+class TelemetryPlot(QWidget):
+    """ 遥测数据的曲线 """
+
+    def __init__(self, telemetry: Telemetry, parent=None) -> None:
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self._drawn_total = -1  # 上次绘制时的样本总数
+        self.setMinimumHeight(120)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start(max(1, int(1000 / max(telemetry.fps, 1))))
+
+    def _tick(self):
+        """ 有新样本且可见时才重绘 """
+        if self.telemetry.buffer.total != self._drawn_total and self.isVisible():
+            self.update()
+
+    def paintEvent(self, event):
+        self._drawn_total = self.telemetry.buffer.total
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('white'))
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+        _, values = self.telemetry.latest()
+        lo, hi = 0.0, 1.0
+        if len(values) and np.isfinite(values).any():
+            lo, hi = float(np.nanmin(values)), float(np.nanmax(values))
+        if hi == lo:
+            lo, hi = lo - 0.5, hi + 0.5
+        # 刻度
+        metrics = painter.fontMetrics()
+        labels = (f'{hi:.4g}', f'{lo:.4g}')
+        left = max(metrics.horizontalAdvance(t) for t in labels) + 2 * MARGIN
+        plot = QRectF(left, MARGIN, max(self.width() - left - MARGIN, 1), max(self.height() - 2 * MARGIN, 1))
+        painter.setPen(QPen(QColor('#c8c8c8')))
+        painter.drawRect(plot)
+        painter.setPen(QPen(QColor('#6b6b6b')))
+        for text, y in zip(labels, (plot.top(), plot.bottom())):
+            painter.drawText(QRectF(0, y - metrics.height() / 2, left - MARGIN, metrics.height()),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, text)
+        if len(values):
+            xs, ys = decimate(values, int(plot.width()))
+            # 曲线
+            px = plot.left() + xs * plot.width()
+            py = plot.bottom() - (ys - lo) / (hi - lo) * plot.height()
+            for i in range(ys.shape[1]):
+                painter.setPen(QPen(QColor(COLORS[i % len(COLORS)]), 1))
+                finite = np.isfinite(py[:, i])
+                painter.drawPolyline(QPolygonF(list(map(QPointF, px[finite].tolist(), py[finite, i].tolist()))))
+        # 图例
+        x = plot.left() + 6
+        for i, name in enumerate(self.telemetry.names):
+            painter.setPen(QPen(QColor(COLORS[i % len(COLORS)])))
+            painter.drawText(QPointF(x, plot.top() + metrics.height()), name)
+            x += metrics.horizontalAdvance(name) + 12
+        painter.end()